@@ -5,6 +5,7 @@ import { ArrowLeft } from "lucide-react";
 import NavBar from "../components/NavBar";
 import Footer from "../components/Footer";
 import Toast from "../components/ui/Toast";
+import { recognitionHeaders } from "../utills/recognitionClient";
 
 export default function EnrollFace() {
     const FLASK_API_URL = "http://localhost:5001";
@@ -195,7 +196,8 @@ export default function EnrollFace() {
             try {
                 const response = await axios.post(
                     `${FLASK_API_URL}/detect-face`,
-                    formData
+                    formData,
+                    { headers: recognitionHeaders() }
                 );
 
                 const bboxes = response.data?.bboxes;
@@ -418,9 +420,9 @@ export default function EnrollFace() {
             console.log(`Sending ${capturedImages.length} images for Roll No: ${formData.roll_no}...`);
 
             const response = await axios.post(`${FLASK_API_URL}/enroll`, data, {
-                headers: {
+                headers: recognitionHeaders({
                     "Content-Type": "multipart/form-data",
-                },
+                }),
             });
 
             if (response.data.status === "success") {
@@ -20,6 +20,7 @@ import Toast from "../components/ui/Toast";
 import { fetchAcademicClassById } from "../services/academicClass.service";
 import apiClient from "../utills/apiClient";
 import { getTodayKathmandu } from "../utils/timezoneHelper";
+import { recognitionHeaders } from "../utills/recognitionClient";
 
 export default function TakeAttendance() {
     const { id: classId } = useParams();
@@ -148,7 +149,9 @@ export default function TakeAttendance() {
                     formData.append("roll_nos", rollNos);
 
                     // 1. Recognize All Faces
-                    const recognizeRes = await axios.post(`${FLASK_API_URL}/recognize`, formData);
+                    const recognizeRes = await axios.post(`${FLASK_API_URL}/recognize`, formData, {
+                        headers: recognitionHeaders(),
+                    });
                     const { faces_detected, results } = recognizeRes.data;
 
                     // 2. Draw bboxes for all detected faces on overlay canvas
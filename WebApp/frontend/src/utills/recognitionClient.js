@@ -0,0 +1,16 @@
+/* ===== Per-tab id for the face recognition server =====
+ * Sent as X-Client-Id so the server keeps its frame cache and per-client
+ * rate limiting separate for every tab, even when several classrooms share
+ * one IP address. Created once per page load, so every tab gets its own.
+ */
+const createClientId = () => {
+  if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+};
+
+const RECOGNITION_CLIENT_ID = createClientId();
+
+export const recognitionHeaders = (headers = {}) => ({
+  ...headers,
+  "X-Client-Id": RECOGNITION_CLIENT_ID,
+});
@@ -1,9 +1,29 @@
+import time
+import threading
+
+_import_start = time.perf_counter()
+
 from flask import Flask
 from flask_cors import CORS
 
-from core.pipeline import RecognitionPipeline
-from config import DETECTOR_PATH, EMBEDDER_PATH
-from routes import detection_bp, enrollment_bp, recognition_bp
+from core.startup import ServiceStartup
+from core.motion_gate import MotionGate
+from core.profiling import RequestProfiler
+from core.admission import AdmissionController
+from core.ingestion import IngestionService
+from config import (
+    DETECTOR_PATH, EMBEDDER_PATH, DETECTOR_OPTIONS, MODEL_CACHE_DIR, WARMUP_BATCH_SIZES, STARTUP_WAIT_TIMEOUT,
+    MAX_UPLOAD_MB, MAX_CONTENT_LENGTH,
+    MOTION_GATE_ENABLED, MOTION_THRESHOLD, MOTION_MAX_CACHE_AGE, MOTION_THUMB_SIZE,
+    PROFILING_ADMIN_TOKEN, PROFILES_DIR,
+    ADMISSION_ENABLED, INFERENCE_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_DEADLINE,
+    INGESTION_CAMERAS, INGESTION_CAMERA_PRIORITIES, INGESTION_BATCH_SIZE, INGESTION_SCHEDULING,
+    INGESTION_GALLERY_REFRESH
+)
+from utils.image_store import get_image_store
+from db.operations import ping_db, count_enrolled_embeddings, ensure_indexes, load_all_enroll_embeddings
+from routes import detection_bp, enrollment_bp, recognition_bp, profiling_bp, ingestion_bp
+from routes.recognition import RECOGNITION_THRESHOLD
 
 # =========================================================
 # Flask App Initialization
@@ -14,28 +34,102 @@ CORS(app)
 # =========================================================
 # Pipeline Initialization
 # =========================================================
-# Initialize the recognition pipeline once and store in app config
-# This allows all blueprints to access the same pipeline instance
-pipe = RecognitionPipeline(
+# Build the recognition pipeline once, in the background, and store the
+# startup handle in app config so all blueprints share the same instance.
+# Both ONNX sessions load in parallel from the optimized-graph cache and
+# are warmed up before /ready reports the models as loaded.
+startup = ServiceStartup(
     detector_path=DETECTOR_PATH,
-    embedder_path=EMBEDDER_PATH
-)
+    embedder_path=EMBEDDER_PATH,
+    cache_dir=MODEL_CACHE_DIR,
+    warmup_batch_sizes=WARMUP_BATCH_SIZES,
+    detector_options=DETECTOR_OPTIONS
+).start()
+
+app.config['SERVICE_STARTUP'] = startup
+app.config['STARTUP_WAIT_TIMEOUT'] = STARTUP_WAIT_TIMEOUT
+# Oversized uploads are refused before they are read
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+# Make sure the lookup indexes exist without delaying startup
+threading.Thread(target=ensure_indexes, name="db-bootstrap", daemon=True).start()
+
+# Per-client motion gate shared by /detect-face and /recognize (None disables it)
+app.config['MOTION_GATE'] = MotionGate(
+    threshold=MOTION_THRESHOLD,
+    max_age=MOTION_MAX_CACHE_AGE,
+    thumb_size=MOTION_THUMB_SIZE
+) if MOTION_GATE_ENABLED else None
+
+# Admission control for inference routes (None admits everything)
+app.config['ADMISSION_CONTROLLER'] = AdmissionController(
+    max_concurrent=INFERENCE_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_deadline=ADMISSION_QUEUE_DEADLINE
+) if ADMISSION_ENABLED else None
+
+# Build the image store now so a bad IMAGE_STORE_* setting stops startup
+# instead of failing every enrollment image
+get_image_store()
 
-# Store pipeline in app config for blueprint access
-app.config['RECOGNITION_PIPELINE'] = pipe
+# Server-side camera ingestion (INGESTION_CAMERAS); starts once the models are loaded.
+# Matched faces are served by GET /ingestion/results
+ingestion = None
+if INGESTION_CAMERAS:
+    ingestion = IngestionService(
+        None,
+        batch_size=INGESTION_BATCH_SIZE,
+        scheduling=INGESTION_SCHEDULING,
+        gallery_loader=load_all_enroll_embeddings,
+        match_threshold=RECOGNITION_THRESHOLD,
+        gallery_refresh=INGESTION_GALLERY_REFRESH,
+        admission=app.config['ADMISSION_CONTROLLER']
+    )
+    for camera_id, source in INGESTION_CAMERAS:
+        ingestion.add_camera(camera_id, source, priority=INGESTION_CAMERA_PRIORITIES.get(camera_id, 1.0))
+    ingestion.start_when_ready(startup)
+app.config['INGESTION_SERVICE'] = ingestion
 
 # =========================================================
-# Health Check Endpoint
+# Health & Readiness Endpoints
 # =========================================================
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Simple health check endpoint for system status monitoring"""
+    """Liveness check: the process is up and serving HTTP"""
     return {
         "status": "online",
         "message": "AI Recognition Server is running",
         "service": "Face Recognition API"
     }, 200
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check: models loaded and warmed up, database and gallery reachable"""
+    models = startup.status()
+    db_ok = ping_db()
+    gallery_size = count_enrolled_embeddings() if db_ok else None
+
+    admission = app.config['ADMISSION_CONTROLLER']
+
+    ready = models["ready"] and db_ok
+    return {
+        "status": "ready" if ready else "not_ready",
+        "models": models,
+        "database": {"ready": db_ok},
+        "gallery": {"ready": gallery_size is not None, "embeddings": gallery_size},
+        "admission": admission.stats() if admission is not None else None,
+        "ingestion": ingestion.stats() if ingestion is not None else None,
+        "image_store": get_image_store().stats()
+    }, 200 if ready else 503
+
+# =========================================================
+# Error Handlers
+# =========================================================
+@app.errorhandler(413)
+def request_too_large(e):
+    """JSON body for uploads over MAX_CONTENT_LENGTH"""
+    return {"error": f"request body exceeds {MAX_UPLOAD_MB:g} MB"}, 413
+
 # =========================================================
 # Blueprint Registration
 # =========================================================
@@ -43,6 +137,16 @@ def health_check():
 app.register_blueprint(detection_bp)
 app.register_blueprint(enrollment_bp)
 app.register_blueprint(recognition_bp)
+app.register_blueprint(ingestion_bp)
+
+# On-demand profiling hooks are only installed when an admin token is configured
+if PROFILING_ADMIN_TOKEN:
+    app.config['PROFILING_ADMIN_TOKEN'] = PROFILING_ADMIN_TOKEN
+    app.config['REQUEST_PROFILER'] = RequestProfiler(PROFILES_DIR, warmup_batch_sizes=WARMUP_BATCH_SIZES)
+    app.register_blueprint(profiling_bp)
+
+print(f"Flask app initialized in {(time.perf_counter() - _import_start) * 1000:.1f} ms "
+      f"(models loading in background)")
 
 # =========================================================
 # Run Server
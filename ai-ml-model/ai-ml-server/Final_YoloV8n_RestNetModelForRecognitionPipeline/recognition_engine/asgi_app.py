@@ -0,0 +1,181 @@
+"""
+ASGI serving mode for the recognition engine.
+
+Serves /detect-face, /recognize, /find-student and /enroll (plus /health
+and /ready) with the same contracts as the Flask app in app.py, but on an
+event loop: uploads are read, MongoDB is queried (PyMongo's async client)
+and responses are written without holding a thread, while pipeline calls
+run on a bounded executor of ASYNC_INFERENCE_WORKERS threads behind the
+same admission control. /recognize-batch and on-demand profiling are only
+served by the Flask app.
+
+Requires quart, quart-cors and an ASGI server such as hypercorn:
+    hypercorn asgi_app:app --bind 0.0.0.0:5001
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_import_start = time.perf_counter()
+
+from quart import Quart
+from quart_cors import cors
+
+from core.startup import ServiceStartup
+from core.motion_gate import MotionGate
+from core.admission import AdmissionController
+from core.ingestion import IngestionService
+from config import (
+    DETECTOR_PATH, EMBEDDER_PATH, DETECTOR_OPTIONS, MODEL_CACHE_DIR, WARMUP_BATCH_SIZES, STARTUP_WAIT_TIMEOUT,
+    MAX_UPLOAD_MB, MAX_CONTENT_LENGTH,
+    MOTION_GATE_ENABLED, MOTION_THRESHOLD, MOTION_MAX_CACHE_AGE, MOTION_THUMB_SIZE,
+    ADMISSION_ENABLED, INFERENCE_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_DEADLINE,
+    ASYNC_INFERENCE_WORKERS,
+    INGESTION_CAMERAS, INGESTION_CAMERA_PRIORITIES, INGESTION_BATCH_SIZE, INGESTION_SCHEDULING,
+    INGESTION_GALLERY_REFRESH
+)
+from utils.image_store import get_image_store
+from db.operations import ensure_indexes, load_all_enroll_embeddings
+from db import async_operations
+from routes.asgi import asgi_bp
+from routes.recognition import RECOGNITION_THRESHOLD
+
+# =========================================================
+# Quart App Initialization
+# =========================================================
+app = cors(Quart(__name__))
+
+# =========================================================
+# Pipeline Initialization
+# =========================================================
+# Same background startup as app.py: both ONNX sessions load in parallel
+# and are warmed up before /ready reports the models as loaded
+startup = ServiceStartup(
+    detector_path=DETECTOR_PATH,
+    embedder_path=EMBEDDER_PATH,
+    cache_dir=MODEL_CACHE_DIR,
+    warmup_batch_sizes=WARMUP_BATCH_SIZES,
+    detector_options=DETECTOR_OPTIONS
+).start()
+
+app.config['SERVICE_STARTUP'] = startup
+app.config['STARTUP_WAIT_TIMEOUT'] = STARTUP_WAIT_TIMEOUT
+# Oversized uploads are refused before they are read
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+app.config['MOTION_GATE'] = MotionGate(
+    threshold=MOTION_THRESHOLD,
+    max_age=MOTION_MAX_CACHE_AGE,
+    thumb_size=MOTION_THUMB_SIZE
+) if MOTION_GATE_ENABLED else None
+
+app.config['ADMISSION_CONTROLLER'] = AdmissionController(
+    max_concurrent=INFERENCE_MAX_CONCURRENCY,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_deadline=ADMISSION_QUEUE_DEADLINE
+) if ADMISSION_ENABLED else None
+
+# Build the image store now so a bad IMAGE_STORE_* setting stops startup
+# instead of failing every enrollment image
+get_image_store()
+
+# Server-side camera ingestion (INGESTION_CAMERAS); runs on its own threads
+# with the blocking client and starts once the models are loaded.
+# Matched faces are served by GET /ingestion/results
+ingestion = None
+if INGESTION_CAMERAS:
+    ingestion = IngestionService(
+        None,
+        batch_size=INGESTION_BATCH_SIZE,
+        scheduling=INGESTION_SCHEDULING,
+        gallery_loader=load_all_enroll_embeddings,
+        match_threshold=RECOGNITION_THRESHOLD,
+        gallery_refresh=INGESTION_GALLERY_REFRESH,
+        admission=app.config['ADMISSION_CONTROLLER']
+    )
+    for camera_id, source in INGESTION_CAMERAS:
+        ingestion.add_camera(camera_id, source, priority=INGESTION_CAMERA_PRIORITIES.get(camera_id, 1.0))
+app.config['INGESTION_SERVICE'] = ingestion
+
+
+@app.before_serving
+async def open_resources():
+    # Only these threads ever run the models; the event loop never does
+    app.config['INFERENCE_EXECUTOR'] = ThreadPoolExecutor(
+        max_workers=ASYNC_INFERENCE_WORKERS,
+        thread_name_prefix="inference"
+    )
+    # The async client must be created on the serving event loop
+    async_operations.open_async_client()
+    # Index creation is one-off and uses the blocking client on its own thread
+    threading.Thread(target=ensure_indexes, name="db-bootstrap", daemon=True).start()
+    if ingestion is not None:
+        ingestion.start_when_ready(startup)
+
+
+@app.after_serving
+async def close_resources():
+    await async_operations.close_async_client()
+    if ingestion is not None:
+        ingestion.stop()
+    app.config['INFERENCE_EXECUTOR'].shutdown(wait=False)
+
+# =========================================================
+# Health & Readiness Endpoints
+# =========================================================
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Liveness check: the process is up and serving HTTP"""
+    return {
+        "status": "online",
+        "message": "AI Recognition Server is running",
+        "service": "Face Recognition API"
+    }, 200
+
+@app.route('/ready', methods=['GET'])
+async def readiness_check():
+    """Readiness check: models loaded and warmed up, database and gallery reachable"""
+    models = startup.status()
+    db_ok = await async_operations.ping_db()
+    gallery_size = await async_operations.count_enrolled_embeddings() if db_ok else None
+
+    admission = app.config['ADMISSION_CONTROLLER']
+
+    ready = models["ready"] and db_ok
+    return {
+        "status": "ready" if ready else "not_ready",
+        "models": models,
+        "database": {"ready": db_ok},
+        "gallery": {"ready": gallery_size is not None, "embeddings": gallery_size},
+        "admission": admission.stats() if admission is not None else None,
+        "ingestion": ingestion.stats() if ingestion is not None else None,
+        "image_store": get_image_store().stats()
+    }, 200 if ready else 503
+
+# =========================================================
+# Error Handlers
+# =========================================================
+@app.errorhandler(413)
+async def request_too_large(e):
+    """JSON body for uploads over MAX_CONTENT_LENGTH"""
+    return {"error": f"request body exceeds {MAX_UPLOAD_MB:g} MB"}, 413
+
+# =========================================================
+# Blueprint Registration
+# =========================================================
+app.register_blueprint(asgi_bp)
+
+print(f"ASGI app initialized in {(time.perf_counter() - _import_start) * 1000:.1f} ms "
+      f"(models loading in background)")
+
+# =========================================================
+# Run Server
+# =========================================================
+if __name__ == "__main__":
+    # Development server; use hypercorn (see above) for load
+    app.run(
+        host="0.0.0.0",
+        port=5001,
+        debug=True
+    )
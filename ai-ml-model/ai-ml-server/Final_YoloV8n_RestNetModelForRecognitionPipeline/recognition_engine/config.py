@@ -5,23 +5,235 @@ from dotenv import load_dotenv
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
+
+def _env_pair(name, default=""):
+    """
+    Read a "AxB" setting (e.g. "4x3", "3840x2160") as a tuple of two positive ints.
+
+    Returns None when the variable is unset or empty; raises ValueError with
+    the variable name on anything else that is not two positive integers.
+    """
+    raw = os.getenv(name, default).strip()
+    if not raw:
+        return None
+    parts = raw.lower().split("x")
+    try:
+        pair = tuple(int(p.strip()) for p in parts)
+    except ValueError:
+        pair = ()
+    if len(pair) != 2 or min(pair) < 1:
+        raise ValueError(f"Invalid {name}={raw!r}: expected two positive integers like \"4x3\"")
+    return pair
+
+
+def _env_fraction(name, default):
+    """
+    Read a setting that must be a fraction in [0, 1), e.g. a tile overlap.
+
+    Raises ValueError with the variable name on anything else.
+    """
+    raw = os.getenv(name, default).strip()
+    try:
+        value = float(raw)
+    except ValueError:
+        value = None
+    if value is None or not 0.0 <= value < 1.0:
+        raise ValueError(f"Invalid {name}={raw!r}: expected a number from 0 up to (not including) 1, like \"0.2\"")
+    return value
+
+
+def _env_cameras(name):
+    """
+    Read a camera list given as "camera_id=source" entries separated by ";".
+
+    Sources are camera URLs or local video files. Raises ValueError with the
+    variable name on an entry without an id or a source.
+    """
+    cameras = []
+    for entry in os.getenv(name, "").split(";"):
+        if not entry.strip():
+            continue
+        camera_id, sep, source = entry.partition("=")
+        if not sep or not camera_id.strip() or not source.strip():
+            raise ValueError(f"Invalid {name} entry {entry.strip()!r}: expected \"camera_id=source\"")
+        cameras.append((camera_id.strip(), source.strip()))
+    return cameras
+
+def _env_priorities(name, camera_ids):
+    """
+    Read per-camera priorities given as "camera_id=priority" entries separated by ",".
+
+    Raises ValueError with the variable name on an entry that is not an id
+    of camera_ids with a positive number.
+    """
+    priorities = {}
+    for entry in os.getenv(name, "").split(","):
+        if not entry.strip():
+            continue
+        camera_id, sep, raw = entry.partition("=")
+        camera_id = camera_id.strip()
+        try:
+            priority = float(raw) if sep else None
+        except ValueError:
+            priority = None
+        if not camera_id or priority is None or not priority > 0:
+            raise ValueError(f"Invalid {name} entry {entry.strip()!r}: expected \"camera_id=positive_number\"")
+        if camera_id not in camera_ids:
+            raise ValueError(f"Invalid {name} entry {entry.strip()!r}: no camera {camera_id!r} in INGESTION_CAMERAS")
+        priorities[camera_id] = priority
+    return priorities
+
 # =========================================================
 # MongoDB Configuration
 # =========================================================
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "project3"
+DB_NAME = os.getenv("DB_NAME", "project3")
 STUDENTS_COLLECTION = "students"
 EMBEDDINGS_COLLECTION = "studentembeddings"
 
+# Connection pool & timeouts
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "3000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000"))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred")
+
+# Commands slower than this are logged by the slow-query listener
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+
 # =========================================================
 # Paths & Storage
 # =========================================================
 DATA_DIR = os.path.join(BASE_DIR, "data")
-IMAGES_DIR = os.path.join(DATA_DIR, "images")
-os.makedirs(IMAGES_DIR, exist_ok=True)
+IMAGES_DIR = os.path.join(DATA_DIR, "images")  # created lazily by the image store
 
 # =========================================================
 # Model Paths
 # =========================================================
 DETECTOR_PATH = os.path.join(BASE_DIR, "../Detector/best.onnx")
 EMBEDDER_PATH = os.path.join(BASE_DIR, "../embedding/w600k_r50.onnx")
+
+# =========================================================
+# Tiled Detection
+# =========================================================
+# Frames whose long side exceeds DETECTOR_TILE_MIN_SIDE are split into
+# overlapping tiles (plus one full-frame view) detected as a single batch
+DETECTOR_TILING = os.getenv("DETECTOR_TILING", "false").lower() == "true"
+# "COLSxROWS" (e.g. "4x3"); empty derives the grid from the frame size
+DETECTOR_TILE_GRID = _env_pair("DETECTOR_TILE_GRID")
+DETECTOR_TILE_OVERLAP = _env_fraction("DETECTOR_TILE_OVERLAP", "0.2")
+DETECTOR_TILE_MIN_SIDE = int(os.getenv("DETECTOR_TILE_MIN_SIDE", "1280"))
+DETECTOR_NMS_THRESHOLD = float(os.getenv("DETECTOR_NMS_THRESHOLD", "0.45"))
+# Largest frame expected in tiled mode ("WIDTHxHEIGHT"); its tile batch is warmed up at startup
+# (empty disables the tile warm-up)
+DETECTOR_TILE_WARMUP_FRAME = _env_pair("DETECTOR_TILE_WARMUP_FRAME", "3840x2160")
+
+DETECTOR_OPTIONS = {
+    "tiling": DETECTOR_TILING,
+    "tile_grid": DETECTOR_TILE_GRID,
+    "tile_overlap": DETECTOR_TILE_OVERLAP,
+    "tile_min_side": DETECTOR_TILE_MIN_SIDE,
+    "nms_threshold": DETECTOR_NMS_THRESHOLD,
+    "tile_warmup_frame": DETECTOR_TILE_WARMUP_FRAME,
+}
+
+# =========================================================
+# Admission Control
+# =========================================================
+# Caps concurrent inference and rejects frames with 429 instead of letting
+# latency grow without bound under overload
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Inference slots; a frame takes one, a /recognize-batch call one per image (up to all of them)
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "2"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "8"))
+ADMISSION_QUEUE_DEADLINE = float(os.getenv("ADMISSION_QUEUE_DEADLINE_MS", "500")) / 1000.0
+
+# =========================================================
+# Async Serving (asgi_app.py)
+# =========================================================
+# Threads running RecognitionPipeline calls in the ASGI app; uploads,
+# MongoDB access and responses are handled on the event loop
+ASYNC_INFERENCE_WORKERS = int(os.getenv("ASYNC_INFERENCE_WORKERS", str(INFERENCE_MAX_CONCURRENCY)))
+
+# =========================================================
+# Batch Recognition
+# =========================================================
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "16"))
+# Largest request body accepted on any route (a full batch of camera frames
+# or enrollment photos fits comfortably); larger uploads get 413
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "64"))
+MAX_CONTENT_LENGTH = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+# =========================================================
+# Camera Ingestion
+# =========================================================
+# Max frames (one per camera) batched into one pipeline call
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "4"))
+INGESTION_SCHEDULING = os.getenv("INGESTION_SCHEDULING", "round_robin")  # or "priority"
+# Cameras ingested by the server itself, e.g.
+#   "gate=rtsp://10.0.0.5/stream;hall=/videos/hall.mp4"
+# Empty (the default) leaves ingestion off; both apps start it once the models are loaded
+INGESTION_CAMERAS = _env_cameras("INGESTION_CAMERAS")
+# Optional per-camera priorities for "priority" scheduling, e.g. "gate=2,hall=0.5"
+INGESTION_CAMERA_PRIORITIES = _env_priorities(
+    "INGESTION_CAMERA_PRIORITIES", {camera_id for camera_id, _ in INGESTION_CAMERAS}
+)
+# Seconds between gallery reloads for matching ingested faces
+INGESTION_GALLERY_REFRESH = float(os.getenv("INGESTION_GALLERY_REFRESH", "60"))
+
+# =========================================================
+# Profiling
+# =========================================================
+# On-demand request profiling is only enabled when an admin token is set
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILES_DIR = os.getenv("PROFILES_DIR", os.path.join(DATA_DIR, "profiles"))
+
+# =========================================================
+# Startup & Warm-up
+# =========================================================
+# Optimized ONNX graphs are cached here (outside the source tree) so
+# restarts skip graph optimization
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "recognition_engine", "model_cache"
+))
+# Batch sizes run once at startup so their first real request is not cold.
+# By default: single frames, a full ingestion batch and a full
+# /recognize-batch; in tiled mode the detector also warms up the tile batch
+# of a DETECTOR_TILE_WARMUP_FRAME-sized frame.
+WARMUP_BATCH_SIZES = [int(b) for b in os.getenv("WARMUP_BATCH_SIZES", "").split(",") if b.strip()] \
+    or sorted({1, INGESTION_BATCH_SIZE, BATCH_MAX_IMAGES})
+# How long a request waits for the models to finish loading before returning 503
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "30"))
+
+
+# =========================================================
+# Image Store
+# =========================================================
+# Enrollment crops are written by a background pool into a
+# hash-sharded tree under IMAGES_DIR (see utils/image_store.py)
+IMAGE_STORE_FORMAT = os.getenv("IMAGE_STORE_FORMAT", "jpg")  # "jpg" or "webp"
+IMAGE_STORE_QUALITY = int(os.getenv("IMAGE_STORE_QUALITY", "85"))
+IMAGE_STORE_WORKERS = int(os.getenv("IMAGE_STORE_WORKERS", "2"))
+IMAGE_STORE_QUEUE_SIZE = int(os.getenv("IMAGE_STORE_QUEUE_SIZE", "64"))
+# Seconds save() waits for room in a full queue before writing on the caller's thread
+IMAGE_STORE_QUEUE_TIMEOUT = float(os.getenv("IMAGE_STORE_QUEUE_TIMEOUT", "1.0"))
+IMAGE_RETENTION_DAYS = int(os.getenv("IMAGE_RETENTION_DAYS", "0"))  # 0 keeps images forever
+
+# =========================================================
+# Client Identity
+# =========================================================
+# Reverse proxies whose X-Forwarded-For header is trusted (comma-separated
+# addresses). Empty means the socket address is always used.
+TRUSTED_PROXIES = {p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()}
+
+# =========================================================
+# Motion Gate
+# =========================================================
+# Frames that barely differ from the client's previous frame reuse the
+# previous result instead of running detection again
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "true").lower() == "true"
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "3.0"))  # mean abs diff of the most changed block, 0-255
+MOTION_MAX_CACHE_AGE = float(os.getenv("MOTION_MAX_CACHE_AGE", "5.0"))  # seconds
+MOTION_THUMB_SIZE = (32, 24)
@@ -1,8 +1,11 @@
 """
 Core recognition logic package.
-Contains the main recognition pipeline.
+Contains the main recognition pipeline, the motion gate and camera ingestion.
 """
 
 from .pipeline import RecognitionPipeline
+from .motion_gate import MotionGate
+from .ingestion import CameraStream, IngestionService
+from .startup import ServiceStartup
 
-__all__ = ['RecognitionPipeline']
+__all__ = ['RecognitionPipeline', 'MotionGate', 'CameraStream', 'IngestionService', 'ServiceStartup']
@@ -0,0 +1,225 @@
+import math
+import asyncio
+import time
+import threading
+from collections import deque
+
+
+class Ticket:
+    """Outcome of an admission request"""
+
+    def __init__(self, client_key, admitted, reason=None, retry_after=0.0, weight=1):
+        self.client_key = client_key
+        self.admitted = admitted
+        self.reason = reason
+        self.retry_after = retry_after
+        self.weight = weight
+        self.granted_at = time.monotonic() if admitted else None
+
+
+class _Waiter:
+    """A queued request; wake() is called once it is granted or superseded"""
+
+    def __init__(self, client_key, weight, wake):
+        self.client_key = client_key
+        self.weight = weight
+        self.wake = wake
+        self.state = None  # "granted" or "superseded" once decided
+
+
+class AdmissionController:
+    """
+    Bounds concurrent inference and sheds load that would only arrive stale.
+
+    - Inference capacity is max_concurrent slots. A request takes one slot
+      per image it runs (a /recognize-batch call takes several), capped at
+      max_concurrent so a large batch waits for the whole capacity instead
+      of never fitting.
+    - Each client may have one frame running and one waiting. A newer frame
+      from the same client takes the waiting frame's place in the queue and
+      the older one is dropped as "superseded", so the frame that runs is the
+      freshest. A client's waiting frame is only granted once its running
+      frame is released, so one client cannot hold several slots at once.
+    - Requests that cannot start within queue_deadline seconds, or that find
+      max_queue requests already waiting, are rejected.
+    - Waiting requests are granted slots in arrival order, passing over
+      clients whose previous frame is still running. With one frame per
+      client this shares capacity evenly across clients.
+
+    Rejections carry a retry-after hint derived from the recent inference
+    time per slot and the slots already queued.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=8, queue_deadline=0.5):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_deadline = queue_deadline
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = deque()
+        self._queued = {}  # client_key -> its waiting _Waiter
+        self._running_keys = set()  # clients with a frame holding slots
+        # Exponential moving average of inference time per slot, seeds the retry-after hint
+        self._avg_service = 0.2
+
+        self.admitted_total = 0
+        self.rejected = {"superseded": 0, "queue_full": 0, "deadline": 0}
+
+    def weight_for(self, images):
+        """Slots taken by a request running `images` images"""
+        return max(1, min(int(images), self.max_concurrent))
+
+    def _retry_after(self, weight=1):
+        # Time for the queued slots plus this request to drain through the capacity
+        queued = sum(w.weight for w in self._waiting)
+        return self._avg_service * max(1.0, (queued + weight) / self.max_concurrent)
+
+    def _reject(self, client_key, reason, weight=1):
+        self.rejected[reason] += 1
+        return Ticket(client_key, False, reason, self._retry_after(weight), weight)
+
+    def _admit(self, client_key, weight):
+        self.admitted_total += 1
+        return Ticket(client_key, True, weight=weight)
+
+    # =========================================================
+    # Queue bookkeeping (called with the lock held)
+    # =========================================================
+    def _enter(self, client_key, weight, wake):
+        """
+        Admit, reject or queue a request.
+
+        Returns:
+            (ticket, None) when decided immediately, else (None, waiter)
+        """
+        with self._lock:
+            if (self._running + weight <= self.max_concurrent and not self._waiting
+                    and client_key not in self._running_keys):
+                self._running += weight
+                self._running_keys.add(client_key)
+                return self._admit(client_key, weight), None
+
+            waiter = _Waiter(client_key, weight, wake)
+            previous = self._queued.get(client_key)
+            if previous is not None:
+                # Newest frame takes the older frame's place in line
+                self._waiting[self._waiting.index(previous)] = waiter
+                previous.state = "superseded"
+                previous.wake()
+            elif len(self._waiting) >= self.max_queue:
+                return self._reject(client_key, "queue_full", weight), None
+            else:
+                self._waiting.append(waiter)
+            self._queued[client_key] = waiter
+            # Everyone ahead may be waiting on their own running frame
+            self._grant()
+            return None, waiter
+
+    def _leave(self, waiter):
+        """Ticket for a waiter whose wait ended (granted, superseded or timed out)"""
+        with self._lock:
+            if waiter.state == "granted":
+                return self._admit(waiter.client_key, waiter.weight)
+            if waiter.state == "superseded":
+                return self._reject(waiter.client_key, "superseded", waiter.weight)
+
+            self._waiting.remove(waiter)
+            if self._queued.get(waiter.client_key) is waiter:
+                del self._queued[waiter.client_key]
+            # A large request leaving the head may let smaller ones behind it start
+            self._grant()
+            return self._reject(waiter.client_key, "deadline", waiter.weight)
+
+    def _cancel(self, waiter):
+        """Withdraw a waiter whose caller went away, returning any slots it was granted"""
+        with self._lock:
+            if waiter.state == "granted":
+                self._running -= waiter.weight
+                self._running_keys.discard(waiter.client_key)
+            elif waiter.state is None:
+                self._waiting.remove(waiter)
+                if self._queued.get(waiter.client_key) is waiter:
+                    del self._queued[waiter.client_key]
+            self._grant()
+
+    def _grant(self):
+        """Hand free slots to waiters in arrival order, passing over clients with a frame still running"""
+        for waiter in list(self._waiting):
+            if waiter.client_key in self._running_keys:
+                continue
+            if self._running + waiter.weight > self.max_concurrent:
+                break
+            self._waiting.remove(waiter)
+            if self._queued.get(waiter.client_key) is waiter:
+                del self._queued[waiter.client_key]
+            self._running += waiter.weight
+            self._running_keys.add(waiter.client_key)
+            waiter.state = "granted"
+            waiter.wake()
+
+    # =========================================================
+    # Public API
+    # =========================================================
+    def acquire(self, client_key, weight=1):
+        """Try to obtain `weight` inference slots for this client, blocking up to the queue deadline"""
+        granted = threading.Event()
+        ticket, waiter = self._enter(client_key, weight, granted.set)
+        if ticket is not None:
+            return ticket
+        granted.wait(self.queue_deadline)
+        return self._leave(waiter)
+
+    async def acquire_async(self, client_key, weight=1):
+        """
+        acquire() for event-loop callers: waits on a future, not a thread.
+
+        A caller cancelled while waiting (e.g. the client disconnected) leaves
+        the queue, and slots granted in the meantime are handed on.
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            # Called under the lock, possibly from another thread
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket, waiter = self._enter(client_key, weight, wake)
+        if ticket is not None:
+            return ticket
+        try:
+            await asyncio.wait_for(granted, self.queue_deadline)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+        return self._leave(waiter)
+
+    def release(self, ticket):
+        """Return a ticket's slots and hand them to the oldest waiting requests"""
+        if not ticket.admitted:
+            return
+        with self._lock:
+            elapsed = time.monotonic() - ticket.granted_at
+            self._avg_service = 0.8 * self._avg_service + 0.2 * elapsed / ticket.weight
+            self._running -= ticket.weight
+            self._running_keys.discard(ticket.client_key)
+            self._grant()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._running,
+                "running_clients": len(self._running_keys),
+                "waiting": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+                "admitted": self.admitted_total,
+                "rejected": dict(self.rejected),
+                "avg_inference_ms": round(self._avg_service * 1000, 1)
+            }
+
+    @staticmethod
+    def retry_after_header(ticket):
+        """Retry-After is whole seconds; the JSON body carries the finer hint"""
+        return str(max(1, math.ceil(ticket.retry_after)))
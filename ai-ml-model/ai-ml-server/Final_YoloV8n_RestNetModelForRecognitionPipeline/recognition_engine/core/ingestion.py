@@ -0,0 +1,409 @@
+import os
+import time
+import threading
+
+import cv2
+
+from core.pipeline import RecognitionPipeline
+
+
+class CameraStream:
+    """
+    Grabber thread for one camera URL or local video file.
+
+    Only the most recent frame is kept, so a slow consumer never builds a
+    backlog; frames it did not get to are counted as dropped. Local files are
+    paced at their native frame rate so they behave like live cameras.
+
+    A source that fails to open, or opens but yields no frame, is retried
+    with exponential backoff from reconnect_delay up to max_reconnect_delay.
+    """
+
+    def __init__(self, camera_id, source, priority=1.0, loop=True, reconnect_delay=2.0, max_reconnect_delay=60.0):
+        self.camera_id = camera_id
+        self.source = source
+        self.priority = priority
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._failures = 0
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._frame = None
+        self._frame_time = 0.0
+        self._seq = 0
+        self.last_taken_seq = 0
+        self.last_processed = 0.0
+        # Stride-scheduling clock: advances by 1/priority per processed frame
+        self.virtual_time = 0.0
+
+        self.frames_grabbed = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.connected = False
+        # Set on every (re)connect; the scheduler clears it when it resyncs virtual_time
+        self._rejoined = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None, 0.0
+        if not self.is_file:
+            # Keep the driver-side buffer minimal as well
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0.0
+        return cap, (1.0 / fps if fps and fps > 0 else 0.0)
+
+    def _backoff(self):
+        """Wait before the next reconnect; doubles with every consecutive failure"""
+        delay = min(self.reconnect_delay * (2 ** self._failures), self.max_reconnect_delay)
+        self._failures += 1
+        self._stop.wait(delay)
+
+    def _run(self):
+        while not self._stop.is_set():
+            cap, frame_interval = self._open()
+            if cap is None:
+                print(f"[INGEST] Camera {self.camera_id}: could not open {self.source}, retrying")
+                self._backoff()
+                continue
+
+            with self._lock:
+                self.connected = True
+                self._rejoined = True
+            frames_read = 0
+            next_due = time.monotonic()
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames_read += 1
+                self._failures = 0
+                with self._lock:
+                    if self._frame is not None and self.last_taken_seq < self._seq:
+                        self.frames_dropped += 1
+                    self._frame = frame
+                    self._frame_time = time.time()
+                    self._seq += 1
+                    self.frames_grabbed += 1
+
+                if frame_interval:
+                    next_due += frame_interval
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    else:
+                        next_due = time.monotonic()
+
+            cap.release()
+            self.connected = False
+            if self.is_file and not self.loop:
+                print(f"[INGEST] Camera {self.camera_id}: end of file")
+                return
+            if frames_read == 0:
+                # Opens but yields nothing (unreadable file, dead stream): do not spin
+                print(f"[INGEST] Camera {self.camera_id}: no frames from {self.source}, retrying")
+                self._backoff()
+            elif not self.is_file:
+                print(f"[INGEST] Camera {self.camera_id}: stream lost, reconnecting")
+                self._backoff()
+
+    @property
+    def has_new_frame(self):
+        return self._seq > self.last_taken_seq
+
+    def take_rejoined(self):
+        """True once after each (re)connect"""
+        with self._lock:
+            rejoined, self._rejoined = self._rejoined, False
+            return rejoined
+
+    def take(self):
+        """Return (frame, capture_time) if a frame arrived since the last take, else None"""
+        with self._lock:
+            if self._frame is None or self._seq <= self.last_taken_seq:
+                return None
+            self.last_taken_seq = self._seq
+            return self._frame, self._frame_time
+
+    def stats(self, elapsed):
+        return {
+            "camera_id": self.camera_id,
+            "source": str(self.source),
+            "connected": self.connected,
+            "priority": self.priority,
+            "frames_grabbed": self.frames_grabbed,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": self.frames_dropped,
+            "processed_fps": round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+
+class IngestionService:
+    """
+    Server-side ingestion for many cameras sharing one inference loop.
+
+    Each camera has its own CameraStream; the loop picks up to batch_size
+    cameras that have a fresh frame and runs them through
+    RecognitionPipeline.process_batch together. As cameras are added, each
+    camera's processed frame rate degrades evenly instead of queues growing.
+
+    Scheduling:
+        - "round_robin": cameras take turns in a fixed rotation
+        - "priority": stride scheduling; a camera's share of inference is
+          proportional to its priority and no camera starves
+
+    With a gallery_loader (returning [(roll_no, embedding), ...]) every
+    detected face is matched against the gallery, which is reloaded every
+    gallery_refresh seconds; each face then carries roll_no, similarity
+    and match alongside its bbox.
+
+    With an admission controller (core.admission.AdmissionController) each
+    batch first takes its inference slots from it, so ingestion shares the
+    inference budget with the HTTP routes; a batch that is not admitted is
+    dropped and the cameras' next frames are taken instead.
+
+    Each camera's latest result is kept for latest_result()/latest_results()
+    (served by GET /ingestion/results); on_result(camera_id, frame,
+    captured_at, faces) additionally receives every result as it is produced.
+    """
+
+    def __init__(self, pipeline, batch_size=4, scheduling="round_robin", on_result=None, idle_sleep=0.005,
+                 gallery_loader=None, match_threshold=0.45, gallery_refresh=60.0, admission=None):
+        if scheduling not in ("round_robin", "priority"):
+            raise ValueError(f"Unknown scheduling policy: {scheduling}")
+
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.scheduling = scheduling
+        self.on_result = on_result
+        self.idle_sleep = idle_sleep
+        self.admission = admission
+
+        self.gallery_loader = gallery_loader
+        self.match_threshold = match_threshold
+        self.gallery_refresh = gallery_refresh
+        self._gallery = None
+        self._gallery_loaded_at = None
+
+        self.cameras = {}
+        self._order = []
+        self._cursor = 0
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_at = None
+        self.batches_run = 0
+        self.batches_shed = 0
+
+    def add_camera(self, camera_id, source, priority=1.0, loop=True):
+        if not priority > 0:
+            raise ValueError(f"Camera {camera_id} priority must be positive, got {priority}")
+        camera = CameraStream(camera_id, source, priority=priority, loop=loop)
+        with self._lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"Camera {camera_id} already registered")
+            # Join at the current clock so a new camera does not monopolize the loop
+            camera.virtual_time = min((c.virtual_time for c in self.cameras.values()), default=0.0)
+            self.cameras[camera_id] = camera
+            self._order.append(camera_id)
+        if self._thread is not None:
+            camera.start()
+        return camera
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            camera = self.cameras.pop(camera_id, None)
+            if camera_id in self._order:
+                self._order.remove(camera_id)
+            self._results.pop(camera_id, None)
+        if camera is not None:
+            camera.stop()
+
+    def start(self):
+        if self._thread is None:
+            self._started_at = time.monotonic()
+            for camera in list(self.cameras.values()):
+                camera.start()
+            self._thread = threading.Thread(target=self._run, name="ingestion-inference", daemon=True)
+            self._thread.start()
+        return self
+
+    def start_when_ready(self, startup):
+        """
+        Start once a ServiceStartup has its pipeline, without blocking the caller.
+
+        Used by the apps, which load the models in the background.
+        """
+        def wait_and_start():
+            pipeline = startup.wait()
+            if pipeline is None:
+                print("[INGEST] Models failed to load, camera ingestion not started")
+                return
+            if not self._stop.is_set():
+                self.pipeline = pipeline
+                self.start()
+                print(f"[INGEST] Started for {len(self.cameras)} camera(s)")
+
+        threading.Thread(target=wait_and_start, name="ingestion-startup", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        for camera in list(self.cameras.values()):
+            camera.stop()
+
+    def _current_gallery(self):
+        """Gallery for matching, reloaded every gallery_refresh seconds (None without a loader)"""
+        if self.gallery_loader is None:
+            return None
+        now = time.monotonic()
+        if self._gallery_loaded_at is None or now - self._gallery_loaded_at >= self.gallery_refresh:
+            try:
+                self._gallery = self.gallery_loader()
+            except Exception as e:
+                # Keep matching against the previous gallery
+                print(f"[INGEST] Gallery reload failed: {str(e)}")
+            self._gallery_loaded_at = now
+        return self._gallery or []
+
+    def _match(self, results, gallery):
+        """Annotate every face with its best gallery match, one matrix product per batch"""
+        faces = [face for frame_faces in results for face in frame_faces]
+        if not faces:
+            return
+        matches = RecognitionPipeline.match_gallery([face["embedding"] for face in faces], gallery)
+        for face, (roll_no, score) in zip(faces, matches):
+            matched = roll_no is not None and score >= self.match_threshold
+            face["roll_no"] = roll_no if matched else None
+            face["similarity"] = round(float(score), 4)
+            face["match"] = matched
+
+    @staticmethod
+    def _resync_rejoined(cameras):
+        """
+        A camera back from a disconnect resumes at the clock of the cameras
+        that kept running; with the virtual time it stopped at it would
+        monopolize the batches until it caught up.
+        """
+        for cam in cameras:
+            if not cam.take_rejoined():
+                continue
+            active = [c.virtual_time for c in cameras if c is not cam and c.connected]
+            if active:
+                cam.virtual_time = max(cam.virtual_time, min(active))
+
+    def _schedule(self):
+        """Pick up to batch_size cameras that have a fresh frame"""
+        with self._lock:
+            order = list(self._order)
+            cameras = dict(self.cameras)
+        if not order:
+            return []
+
+        if self.scheduling == "priority":
+            self._resync_rejoined([cameras[c] for c in order])
+            ready = [cameras[c] for c in order if cameras[c].has_new_frame]
+            ready.sort(key=lambda cam: cam.virtual_time)
+            return ready[:self.batch_size]
+
+        picked = []
+        n = len(order)
+        for step in range(n):
+            cam = cameras[order[(self._cursor + step) % n]]
+            if cam.has_new_frame:
+                picked.append(cam)
+                if len(picked) == self.batch_size:
+                    break
+        # Next round starts after the last camera served
+        if picked:
+            self._cursor = (order.index(picked[-1].camera_id) + 1) % n
+        return picked
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._process_next_batch():
+                self._stop.wait(self.idle_sleep)
+
+    def _process_next_batch(self):
+        """Schedule, run and record one batch; returns the number of frames processed"""
+        batch = []
+        for cam in self._schedule():
+            taken = cam.take()
+            if taken is not None:
+                batch.append((cam, taken[0], taken[1]))
+        if not batch:
+            return 0
+
+        ticket = None
+        if self.admission is not None:
+            ticket = self.admission.acquire(("ingestion", "batch"), self.admission.weight_for(len(batch)))
+            if not ticket.admitted:
+                self.batches_shed += 1
+                return 0
+        try:
+            results = self.pipeline.process_batch([frame for _, frame, _ in batch])
+            gallery = self._current_gallery()
+            if gallery is not None:
+                self._match(results, gallery)
+        except Exception as e:
+            print(f"[INGEST] Inference failed for batch of {len(batch)}: {str(e)}")
+            return 0
+        finally:
+            if ticket is not None:
+                self.admission.release(ticket)
+
+        now = time.monotonic()
+        self.batches_run += 1
+        for (cam, frame, captured_at), faces in zip(batch, results):
+            cam.frames_processed += 1
+            cam.last_processed = now
+            cam.virtual_time += 1.0 / cam.priority
+            with self._lock:
+                self._results[cam.camera_id] = {"captured_at": captured_at, "faces": faces}
+            if self.on_result is not None:
+                try:
+                    self.on_result(cam.camera_id, frame, captured_at, faces)
+                except Exception as e:
+                    print(f"[INGEST] Result handler failed for camera {cam.camera_id}: {str(e)}")
+        return len(batch)
+
+    def latest_result(self, camera_id):
+        with self._lock:
+            return self._results.get(camera_id)
+
+    def latest_results(self):
+        """Latest result of every camera that has one, by camera id"""
+        with self._lock:
+            return dict(self._results)
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "running": self._thread is not None and not self._stop.is_set(),
+            "uptime_s": round(elapsed, 1),
+            "batches_run": self.batches_run,
+            "batches_shed": self.batches_shed,
+            "scheduling": self.scheduling,
+            "gallery_size": len(self._gallery) if self._gallery is not None else None,
+            "cameras": [cam.stats(elapsed) for cam in list(self.cameras.values())]
+        }
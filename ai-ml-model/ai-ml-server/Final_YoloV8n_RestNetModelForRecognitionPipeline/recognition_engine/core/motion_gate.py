@@ -0,0 +1,78 @@
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+
+
+class MotionGate:
+    """
+    Per-client change detector placed in front of the detector.
+
+    Each frame is reduced to a tiny grayscale thumbnail and compared with the
+    previous thumbnail from the same client, block by block. When the mean
+    absolute difference of every block (block_size x block_size thumbnail
+    pixels) is below the threshold and the stored result is still fresh, the
+    previous result is reused and inference is skipped. Using the most
+    changed block rather than the whole-frame mean keeps localized motion,
+    such as one student walking in, from being averaged away.
+    """
+
+    def __init__(self, threshold=3.0, max_age=5.0, thumb_size=(32, 24), block_size=4, max_clients=256):
+        self.threshold = threshold
+        self.block_size = block_size
+        self.max_age = max_age
+        self.thumb_size = thumb_size
+        self.max_clients = max_clients
+
+        # key -> (source shape, thumbnail, result, timestamp)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def thumbnail(self, image):
+        """Downscale first, then convert, so the cost is independent of frame size"""
+        small = cv2.resize(image, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def lookup(self, key, image_shape, thumb):
+        """
+        Return (result, age_seconds) for an unchanged scene, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            shape, prev_thumb, result, stamp = entry
+
+        age = time.monotonic() - stamp
+        if shape != image_shape or age > self.max_age:
+            return None
+
+        if self.change(thumb, prev_thumb) >= self.threshold:
+            return None
+        return result, age
+
+    def change(self, thumb, prev_thumb):
+        """Largest per-block mean absolute difference between two thumbnails"""
+        diff = cv2.absdiff(thumb, prev_thumb)
+        h, w = diff.shape
+        blocks = cv2.resize(
+            diff, (max(1, w // self.block_size), max(1, h // self.block_size)),
+            interpolation=cv2.INTER_AREA
+        )
+        return float(blocks.max())
+
+    def update(self, key, image_shape, thumb, result):
+        """Store the freshly computed result for this client"""
+        with self._lock:
+            self._entries[key] = (image_shape, thumb, result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_clients:
+                self._entries.popitem(last=False)
+
+    def clear(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
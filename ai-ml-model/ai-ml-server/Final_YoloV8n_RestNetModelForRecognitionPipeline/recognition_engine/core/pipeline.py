@@ -1,11 +1,29 @@
+import copy
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from models.detector import FaceDetector
 from models.embedder import FaceEmbedder
 
 class RecognitionPipeline:
-    def __init__(self, detector_path, embedder_path):
-        self.detector = FaceDetector(detector_path)
-        self.embedder = FaceEmbedder(embedder_path)
+    def __init__(self, detector_path, embedder_path, cache_dir=None, detector_options=None):
+        # Build both sessions in parallel; ONNX Runtime releases the GIL while loading
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            detector = pool.submit(FaceDetector, detector_path, cache_dir=cache_dir, **(detector_options or {}))
+            embedder = pool.submit(FaceEmbedder, embedder_path, cache_dir=cache_dir)
+            self.detector = detector.result()
+            self.embedder = embedder.result()
+
+    def profiling_clone(self, profile_prefix):
+        """Copy of this pipeline whose detector and embedder sessions record ONNX Runtime profiles"""
+        clone = copy.copy(self)
+        clone.detector = self.detector.profiling_clone(f"{profile_prefix}_detector")
+        clone.embedder = self.embedder.profiling_clone(f"{profile_prefix}_embedder")
+        return clone
+
+    def warmup(self, batch_sizes=(1,)):
+        """Warm up both models at the given batch sizes"""
+        self.detector.warmup(batch_sizes)
+        self.embedder.warmup(batch_sizes)
 
     def process_all_faces(self, image):
         """
@@ -31,6 +49,38 @@ class RecognitionPipeline:
             })
         return results
 
+    def process_batch(self, images):
+        """
+        Batched version of process_all_faces for several frames.
+
+        Detection runs as one batched call over all frames and every face crop
+        goes through the embedder in one batch.
+        Returns: One list per image, same format as process_all_faces
+        """
+        if not images:
+            return []
+
+        detections = self.detector.detect_batch(images)
+
+        crops, owners = [], []
+        for idx, (image, faces) in enumerate(zip(images, detections)):
+            for face in faces:
+                x1, y1, x2, y2 = face['bbox']
+                face_crop = image[y1:y2, x1:x2]
+                if face_crop.size == 0:
+                    continue
+                crops.append(face_crop)
+                owners.append((idx, [int(x1), int(y1), int(x2), int(y2)]))
+
+        results = [[] for _ in images]
+        embeddings = self.embedder.get_embeddings(crops)
+        for embedding, (idx, bbox) in zip(embeddings, owners):
+            results[idx].append({
+                "embedding": embedding,
+                "bbox": bbox
+            })
+        return results
+
     def process_image(self, image):
         """Processes only the first detected face (kept for backward compatibility)"""
         results = self.process_all_faces(image)
@@ -38,6 +88,27 @@ class RecognitionPipeline:
             return None, None
         return results[0]['embedding'], results[0]['bbox']
 
+    @staticmethod
+    def match_gallery(embeddings, gallery):
+        """
+        Match many query embeddings against a gallery in one matrix product.
+
+        Args:
+            embeddings: List/array of L2-normalized query embeddings
+            gallery: List of (roll_no, embedding) tuples
+        Returns: List of (best_roll_no, best_score), (None, -1.0) when the gallery is empty
+        """
+        if len(embeddings) == 0:
+            return []
+        if len(gallery) == 0:
+            return [(None, -1.0)] * len(embeddings)
+
+        queries = np.stack([np.asarray(e, dtype=np.float32).flatten() for e in embeddings])
+        refs = np.stack([ref.flatten() for _, ref in gallery])
+        scores = queries @ refs.T
+        best = np.argmax(scores, axis=1)
+        return [(gallery[j][0], float(scores[i, j])) for i, j in enumerate(best)]
+
     @staticmethod
     def compute_similarity(feat1, feat2):
         # Dot product of L2 normalized vectors
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+
+
+class RequestProfiler:
+    """
+    Opt-in deep profiling of single requests.
+
+    Inference requests run on a separate copy of the pipeline whose ONNX
+    Runtime sessions have profiling enabled, and every profiled handler runs
+    under cProfile. Both are saved together as one JSON file: operator-level
+    ONNX events in Chrome trace format ("traceEvents", viewable in
+    chrome://tracing or Perfetto) plus the Python call statistics
+    ("pythonProfile").
+
+    Nothing here runs unless profiling is requested. The profiling copy is
+    built and warmed up on a background thread, never on a request thread,
+    and its trace is cut to the request's own time window, so session
+    creation and warm-up never show up in a profile or in request latency.
+    ONNX Runtime stops recording once a session's profile is collected, so
+    each copy serves one request and is then released; the next one is
+    prepared only while more requests are armed.
+
+    Armed inference requests are only counted once the copy is ready. A
+    one-off flagged request that finds no copy ready is profiled with
+    cProfile only, and starts building a copy for the next flagged request.
+
+    One request is profiled at a time; others that ask for profiling while
+    one is in progress run unprofiled.
+    """
+
+    # Chrome trace process ids for the two models
+    TRACE_PIDS = {"detector": 1, "embedder": 2}
+
+    def __init__(self, output_dir, top_n=60, warmup_batch_sizes=(1,)):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.warmup_batch_sizes = warmup_batch_sizes
+        self._remaining = 0
+        self._lock = threading.Lock()
+
+        # Held for the whole of a profiled request
+        self._active = threading.Lock()
+        # Warmed profiling copy of the pipeline, and the thread building it
+        self._profiled = None
+        self._builder = None
+        self._build_lock = threading.Lock()
+
+    # =========================================================
+    # Arming
+    # =========================================================
+    def arm(self, count, pipeline=None):
+        """
+        Profile the next `count` requests regardless of flags.
+
+        With the serving pipeline given, its profiling copy is prepared right
+        away; arming 0 releases a copy that is no longer needed.
+        """
+        with self._lock:
+            self._remaining = max(0, int(count))
+            remaining = self._remaining
+        if remaining:
+            self.prepare(pipeline)
+        else:
+            with self._build_lock:
+                self._profiled = None
+        return remaining
+
+    @property
+    def remaining(self):
+        return self._remaining
+
+    def take_armed(self):
+        """Consume one armed slot; True if this request should be profiled"""
+        if self._remaining <= 0:
+            return False
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    # =========================================================
+    # Profiling pipeline
+    # =========================================================
+    def prepare(self, pipeline):
+        """Build and warm up the profiling copy of `pipeline` in the background (no-op if present)"""
+        if pipeline is None:
+            return
+        with self._build_lock:
+            if self._profiled is not None or self._builder is not None:
+                return
+            self._builder = threading.Thread(
+                target=self._build, args=(pipeline,), name="profiling-warmup", daemon=True
+            )
+            self._builder.start()
+
+    def _build(self, pipeline):
+        profiled = None
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            prefix = os.path.join(self.output_dir, f"onnx_{uuid.uuid4().hex[:8]}")
+            profiled = pipeline.profiling_clone(prefix)
+            profiled.warmup(self.warmup_batch_sizes)
+        except Exception as e:
+            print(f"[PROFILE] Could not build the profiling pipeline: {str(e)}")
+            profiled = None
+        finally:
+            with self._build_lock:
+                self._profiled = profiled
+                self._builder = None
+
+    @property
+    def is_prepared(self):
+        return self._profiled is not None
+
+    def _take_profiled(self, pipeline):
+        """Hand out the warmed profiling copy; if none is ready, start building one and return None"""
+        with self._build_lock:
+            profiled, self._profiled = self._profiled, None
+        if profiled is None:
+            self.prepare(pipeline)
+        return profiled
+
+    # =========================================================
+    # Per-request profiling
+    # =========================================================
+    @staticmethod
+    def _clock_now():
+        return {"monotonic": time.monotonic_ns(), "wall": time.time_ns()}
+
+    def begin(self, pipeline, inference=True, consume_armed=False):
+        """
+        Start profiling a request.
+
+        Args:
+            pipeline: The serving pipeline (None while models are loading)
+            inference: Whether the route runs the models; only then is the
+                ONNX profiling copy used
+            consume_armed: Take one armed slot; the request is not profiled
+                when none is left, or when it is an inference request and
+                the profiling copy is still being built
+
+        Returns:
+            dict: Profile state holding the profiled pipeline (None when no
+            ONNX trace is recorded) and the running cProfile, or None if the
+            request is not profiled
+        """
+        if not self._active.acquire(blocking=False):
+            print("[PROFILE] Another request is being profiled, this one runs unprofiled")
+            return None
+        try:
+            use_onnx = inference and pipeline is not None
+            if consume_armed and use_onnx and not self.is_prepared:
+                # Leave the slot for a request that can get the warmed copy
+                self.prepare(pipeline)
+                self._active.release()
+                return None
+            if consume_armed and not self.take_armed():
+                self._active.release()
+                return None
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiled = self._take_profiled(pipeline) if use_onnx else None
+            if profiled is not None:
+                onnx_trace = "recorded"
+            elif use_onnx:
+                onnx_trace = "preparing"
+                print("[PROFILE] Profiling pipeline not ready yet, ONNX trace skipped for this request")
+            else:
+                onnx_trace = "none"
+
+            python = cProfile.Profile()
+            try:
+                python.enable()
+            except ValueError as e:
+                # Another profiler (sys.monitoring tool) owns the interpreter
+                print(f"[PROFILE] Python profiling unavailable: {str(e)}")
+                python = None
+        except BaseException:
+            self._active.release()
+            raise
+
+        return {
+            "id": f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+            "pipeline": profiled,
+            "onnx_trace": onnx_trace,
+            "source": pipeline,
+            "started": time.perf_counter(),
+            "window_start": self._clock_now(),
+            "python": python
+        }
+
+    def end(self, state, request_info):
+        """
+        Stop profiling and write the combined trace.
+
+        Returns:
+            str: Path of the saved profile
+        """
+        try:
+            if state["python"] is not None:
+                state["python"].disable()
+            window = (state["window_start"], self._clock_now())
+            duration_ms = (time.perf_counter() - state["started"]) * 1000
+
+            trace_events = []
+            pipeline = state["pipeline"]
+            if pipeline is not None:
+                for name, model in (("detector", pipeline.detector), ("embedder", pipeline.embedder)):
+                    trace_events.extend(self._collect_onnx_events(name, model.session, window))
+
+            profile = {
+                "id": state["id"],
+                "request": {**request_info, "duration_ms": round(duration_ms, 2)},
+                # "preparing": no warmed profiling copy was ready; retry once it is
+                "onnxTrace": state["onnx_trace"],
+                "traceEvents": trace_events,
+                "pythonProfile": self._python_stats(state["python"]) if state["python"] is not None else []
+            }
+
+            path = os.path.join(self.output_dir, f"profile_{state['id']}.json")
+            with open(path, "w") as f:
+                json.dump(profile, f)
+            print(f"[PROFILE] {request_info.get('method')} {request_info.get('path')} "
+                  f"profiled in {duration_ms:.1f} ms -> {path}")
+            return path
+        finally:
+            self._active.release()
+            # The used copy has stopped recording; get the next one ready while armed
+            if state["pipeline"] is not None and self._remaining > 0:
+                self.prepare(state["source"])
+
+    def _collect_onnx_events(self, name, session, window):
+        """
+        End ONNX Runtime profiling on a session and return the events inside
+        the request window, tagged by model and timed from the request start.
+        """
+        pid = self.TRACE_PIDS[name]
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"onnx {name}"}}]
+        try:
+            onnx_file = session.end_profiling()
+            with open(onnx_file) as f:
+                raw = json.load(f)
+            os.remove(onnx_file)
+            profile_start_ns = session.get_profiling_start_time_ns()
+        except Exception as e:
+            print(f"[PROFILE] Could not read ONNX profile for {name}: {str(e)}")
+            return events
+
+        # Event "ts" is in microseconds since profile_start_ns, which is
+        # documented as monotonic but is the system clock on some builds
+        window_start, window_end = window
+        clock = min(window_end, key=lambda c: abs(window_end[c] - profile_start_ns))
+        begin_us = (window_start[clock] - profile_start_ns) / 1000
+        end_us = (window_end[clock] - profile_start_ns) / 1000
+
+        for event in raw:
+            ts = event.get("ts")
+            if ts is None or not begin_us <= ts <= end_us:
+                continue
+            event["pid"] = pid
+            event["ts"] = round(ts - begin_us, 3)
+            events.append(event)
+        return events
+
+    def _python_stats(self, profiler):
+        """Top functions by cumulative time, with their direct callers"""
+        stats = pstats.Stats(profiler)
+        rows = []
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+            rows.append({
+                "function": pstats.func_std_string(func),
+                "primitive_calls": cc,
+                "calls": nc,
+                "self_ms": round(tt * 1000, 3),
+                "cumulative_ms": round(ct * 1000, 3),
+                "callers": [pstats.func_std_string(c) for c in callers]
+            })
+        rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+        return rows[:self.top_n]
+
+    def list_profiles(self):
+        if not os.path.isdir(self.output_dir):
+            return []
+        names = [n for n in os.listdir(self.output_dir) if n.startswith("profile_") and n.endswith(".json")]
+        return sorted(names, reverse=True)
@@ -0,0 +1,89 @@
+import time
+import threading
+
+from core.pipeline import RecognitionPipeline
+
+
+class ServiceStartup:
+    """
+    Builds the recognition pipeline in the background.
+
+    The Flask app can start accepting connections immediately; /health reports
+    liveness straight away while /ready reports whether the models are loaded
+    and warmed up. Requests that need the pipeline wait for it with a timeout.
+    """
+
+    def __init__(self, detector_path, embedder_path, cache_dir=None, warmup_batch_sizes=(1,),
+                 detector_options=None):
+        self.detector_path = detector_path
+        self.embedder_path = embedder_path
+        self.cache_dir = cache_dir
+        self.detector_options = detector_options
+        self.warmup_batch_sizes = warmup_batch_sizes
+
+        self.pipeline = None
+        self.error = None
+        self.timings = {}
+        self._created = time.perf_counter()
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start loading in a background thread (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="model-startup", daemon=True)
+            self._thread.start()
+        return self
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            pipeline = RecognitionPipeline(
+                self.detector_path,
+                self.embedder_path,
+                cache_dir=self.cache_dir,
+                detector_options=self.detector_options
+            )
+            self.timings["models_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            pipeline.warmup(self.warmup_batch_sizes)
+            self.timings["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            self.pipeline = pipeline
+        except Exception as e:
+            self.error = str(e)
+            print(f"Model startup failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            self.timings["total_ms"] = round((time.perf_counter() - self._created) * 1000, 1)
+            if self.pipeline is not None:
+                print(f"Recognition pipeline ready in {self.timings['total_ms']} ms "
+                      f"(models: {self.timings['models_ms']} ms, warm-up: {self.timings['warmup_ms']} ms, "
+                      f"batch sizes: {list(self.warmup_batch_sizes)})")
+            self._done.set()
+
+    @property
+    def is_ready(self):
+        return self.pipeline is not None
+
+    def wait(self, timeout=None):
+        """Block until loading finishes; returns the pipeline or None"""
+        self._done.wait(timeout)
+        return self.pipeline
+
+    def status(self):
+        status = {
+            "ready": self.is_ready,
+            "loading": not self._done.is_set(),
+            "error": self.error,
+            "timings": dict(self.timings)
+        }
+        if self.pipeline is not None:
+            # False when warm-up found the model only accepts batch size 1
+            status["batched"] = {
+                "detector": self.pipeline.detector.batched,
+                "embedder": self.pipeline.embedder.batched
+            }
+        return status
@@ -6,11 +6,17 @@ Contains MongoDB operations for students and embeddings.
 from .operations import (
     get_student_by_roll_no,
     save_embedding_to_db,
-    load_all_enroll_embeddings
+    load_all_enroll_embeddings,
+    check_student_enrollment,
+    ensure_indexes,
+    set_mongo_client
 )
 
 __all__ = [
     'get_student_by_roll_no',
     'save_embedding_to_db',
-    'load_all_enroll_embeddings'
+    'load_all_enroll_embeddings',
+    'check_student_enrollment',
+    'ensure_indexes',
+    'set_mongo_client'
 ]
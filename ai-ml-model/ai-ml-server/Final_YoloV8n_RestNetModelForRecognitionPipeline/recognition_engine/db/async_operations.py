@@ -0,0 +1,150 @@
+"""
+Non-blocking counterparts of db/operations.py for the ASGI app (asgi_app.py).
+
+Uses PyMongo's native asyncio client (pymongo>=4.9) with the same pool,
+timeout, read preference and slow-query settings as the blocking client,
+and the same projections, so both apps read and write identical documents.
+"""
+
+import numpy as np
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+from config import (
+    MONGO_URI, DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_READ_PREFERENCE
+)
+from db.operations import STUDENT_PROJECTION, EMBEDDING_PROJECTION, slow_query_logger, embedding_document
+
+# The async client is bound to the event loop it is first used on, so it
+# is created by the app's startup hook rather than at import time
+_async_client = None
+
+
+def create_async_mongo_client(uri=MONGO_URI):
+    """Build an AsyncMongoClient with pool, timeout and read preference settings from config"""
+    return AsyncMongoClient(
+        uri,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        readPreference=MONGO_READ_PREFERENCE,
+        event_listeners=[slow_query_logger]
+    )
+
+
+def open_async_client(uri=MONGO_URI):
+    """Create the shared async client on the running event loop"""
+    global _async_client
+    if _async_client is None:
+        _async_client = create_async_mongo_client(uri)
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def get_async_db():
+    return open_async_client()[DB_NAME]
+
+
+async def ping_db():
+    """Check that MongoDB is reachable"""
+    try:
+        await get_async_db().command("ping")
+        return True
+    except Exception as e:
+        print(f"MongoDB ping failed: {str(e)}")
+        return False
+
+
+async def count_enrolled_embeddings():
+    """Approximate number of enrolled embeddings (uses collection metadata, no scan)"""
+    try:
+        return await get_async_db()[EMBEDDINGS_COLLECTION].estimated_document_count()
+    except Exception as e:
+        print(f"Error counting embeddings: {str(e)}")
+        return None
+
+
+async def get_student_by_roll_no(roll_no, projection=STUDENT_PROJECTION):
+    """Fetch student from MongoDB by roll number (only the projected fields)"""
+    try:
+        return await get_async_db()[STUDENTS_COLLECTION].find_one({"RollNo": int(roll_no)}, projection)
+    except Exception as e:
+        print(f"Error fetching student: {str(e)}")
+        return None
+
+
+async def save_embedding_to_db(student_id, roll_no, embedding, images_processed, images_failed):
+    """Save or update embedding in MongoDB"""
+    try:
+        embedding_doc = embedding_document(student_id, roll_no, embedding, images_processed, images_failed)
+
+        result = await get_async_db()[EMBEDDINGS_COLLECTION].update_one(
+            {"RollNo": int(roll_no)},
+            {"$set": embedding_doc},
+            upsert=True
+        )
+        return result.acknowledged
+    except Exception as e:
+        print(f"Error saving embedding to database: {str(e)}")
+        return False
+
+
+async def load_all_enroll_embeddings(roll_nos=None):
+    """
+    Load embeddings from MongoDB.
+    Args:
+        roll_nos: Optional list of roll numbers to filter by.
+    """
+    gallery = []
+
+    try:
+        query = {}
+        if roll_nos:
+            roll_nos_ints = []
+            for r in roll_nos:
+                try:
+                    roll_nos_ints.append(int(r))
+                except (ValueError, TypeError):
+                    print(f"Warning: Skipping invalid roll number filter: {r}")
+
+            if roll_nos_ints:
+                query = {"RollNo": {"$in": roll_nos_ints}}
+
+        async for emb_doc in get_async_db()[EMBEDDINGS_COLLECTION].find(query, EMBEDDING_PROJECTION):
+            gallery.append((emb_doc["RollNo"], np.array(emb_doc["Embedding"], dtype=np.float32)))
+
+        print(f"Loaded {len(gallery)} embeddings from database (filtered: {roll_nos is not None})")
+        return gallery
+    except Exception as e:
+        print(f"Error loading embeddings: {str(e)}")
+        return []
+
+
+async def check_student_enrollment(student_id):
+    """
+    Check if a student is already enrolled (has an embedding).
+
+    Returns:
+        bool: True if enrolled, False otherwise
+    """
+    try:
+        if isinstance(student_id, str):
+            student_id = ObjectId(student_id)
+
+        # Indexed existence check; never loads the embedding itself
+        count = await get_async_db()[EMBEDDINGS_COLLECTION].count_documents({"StudentId": student_id}, limit=1)
+        return count > 0
+    except Exception as e:
+        print(f"Error checking enrollment: {str(e)}")
+        return False
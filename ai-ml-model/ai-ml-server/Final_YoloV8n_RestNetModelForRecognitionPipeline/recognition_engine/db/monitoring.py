@@ -0,0 +1,48 @@
+import threading
+from pymongo import monitoring
+
+
+class SlowQueryLogger(monitoring.CommandListener):
+    """
+    Command listener that logs every MongoDB command slower than a threshold.
+
+    Attached to the MongoClient, so it covers every call made through the
+    driver without wrapping individual queries.
+    """
+
+    # Commands that carry no query and would only add noise
+    IGNORED_COMMANDS = {"hello", "isMaster", "ismaster", "ping", "endSessions", "saslStart", "saslContinue"}
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+        self.slow_count = 0
+        self._lock = threading.Lock()
+        # (connection, request_id) -> collection name, filled in started()
+        self._targets = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        with self._lock:
+            self._targets[(event.connection_id, event.request_id)] = target if isinstance(target, str) else None
+
+    def succeeded(self, event):
+        self._check(event, "ok")
+
+    def failed(self, event):
+        self._check(event, f"failed: {event.failure}")
+
+    def _check(self, event, outcome):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        with self._lock:
+            collection = self._targets.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000.0
+        if duration_ms < self.threshold_ms:
+            return
+        with self._lock:
+            self.slow_count += 1
+        namespace = f"{event.database_name}.{collection}" if collection else event.database_name
+        print(f"[SLOW QUERY] {event.command_name} on {namespace} took {duration_ms:.1f} ms "
+              f"(threshold {self.threshold_ms:.0f} ms, request_id {event.request_id}, {outcome})")
@@ -1,44 +1,145 @@
+import threading
 import numpy as np
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import OperationFailure
 from bson import ObjectId
-from config import MONGO_URI, DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION
+from config import (
+    MONGO_URI, DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_READ_PREFERENCE, MONGO_SLOW_QUERY_MS
+)
+from db.monitoring import SlowQueryLogger
 
-# Initialize MongoDB Client
-mongo_client = MongoClient(MONGO_URI)
-db = mongo_client[DB_NAME]
+# Fields each caller actually reads; everything else stays on the server
+STUDENT_PROJECTION = {"FullName": 1, "Email": 1, "Department": 1, "Faculty": 1}
+EMBEDDING_PROJECTION = {"_id": 0, "RollNo": 1, "Embedding": 1}
 
-students_collection = db[STUDENTS_COLLECTION]
-embeddings_collection = db[EMBEDDINGS_COLLECTION]
+# Indexes the lookups below rely on. The Node backend declares the same
+# unique indexes in its Mongoose schemas; creating them here is a no-op
+# when they already exist and covers databases it has not touched yet.
+REQUIRED_INDEXES = {
+    STUDENTS_COLLECTION: [("RollNo", True)],
+    EMBEDDINGS_COLLECTION: [("RollNo", True), ("StudentId", True)],
+}
 
-def get_student_by_roll_no(roll_no):
-    """Fetch student from MongoDB by roll number"""
+# MongoDB client is created on first use so importing this module stays cheap
+_mongo_client = None
+_client_lock = threading.Lock()
+slow_query_logger = SlowQueryLogger(MONGO_SLOW_QUERY_MS)
+
+def create_mongo_client(uri=MONGO_URI):
+    """Build a MongoClient with pool, timeout and read preference settings from config"""
+    return MongoClient(
+        uri,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        readPreference=MONGO_READ_PREFERENCE,
+        event_listeners=[slow_query_logger]
+    )
+
+def set_mongo_client(client):
+    """Replace the shared client (e.g. with a local or in-memory stand-in)"""
+    global _mongo_client
+    with _client_lock:
+        _mongo_client = client
+
+def get_db():
+    """Return the database handle, creating the client on first use"""
+    global _mongo_client
+    if _mongo_client is None:
+        with _client_lock:
+            if _mongo_client is None:
+                _mongo_client = create_mongo_client()
+    return _mongo_client[DB_NAME]
+
+def ensure_indexes():
+    """
+    Create the indexes required by the queries in this module.
+
+    Returns:
+        bool: True if every index exists, False otherwise
+    """
+    db = get_db()
+    ok = True
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        for field, unique in indexes:
+            try:
+                db[collection_name].create_index([(field, ASCENDING)], unique=unique)
+            except OperationFailure as e:
+                # Existing index with other options (or duplicate data) still serves the lookup
+                print(f"Index {collection_name}.{field} not created: {str(e)}")
+                ok = ok and _has_index_on(db[collection_name], field)
+            except Exception as e:
+                print(f"Error ensuring index {collection_name}.{field}: {str(e)}")
+                ok = False
+    print(f"MongoDB indexes ensured: {ok}")
+    return ok
+
+def _has_index_on(collection, field):
+    try:
+        return any(list(info["key"])[0][0] == field for info in collection.index_information().values())
+    except Exception:
+        return False
+
+def get_students_collection():
+    return get_db()[STUDENTS_COLLECTION]
+
+def get_embeddings_collection():
+    return get_db()[EMBEDDINGS_COLLECTION]
+
+def ping_db():
+    """Check that MongoDB is reachable"""
     try:
-        student = students_collection.find_one({"RollNo": int(roll_no)})
+        get_db().command("ping")
+        return True
+    except Exception as e:
+        print(f"MongoDB ping failed: {str(e)}")
+        return False
+
+def count_enrolled_embeddings():
+    """Approximate number of enrolled embeddings (uses collection metadata, no scan)"""
+    try:
+        return get_embeddings_collection().estimated_document_count()
+    except Exception as e:
+        print(f"Error counting embeddings: {str(e)}")
+        return None
+
+def get_student_by_roll_no(roll_no, projection=STUDENT_PROJECTION):
+    """Fetch student from MongoDB by roll number (only the projected fields)"""
+    try:
+        student = get_students_collection().find_one({"RollNo": int(roll_no)}, projection)
         return student
     except Exception as e:
         print(f"Error fetching student: {str(e)}")
         return None
 
+def embedding_document(student_id, roll_no, embedding, images_processed, images_failed):
+    """Enrolled-embedding document as stored in the embeddings collection"""
+    return {
+        "StudentId": ObjectId(student_id),
+        "RollNo": int(roll_no),
+        "Embedding": embedding.tolist(),  # Convert numpy array to list
+        "EmbeddingMetadata": {
+            "ImagesProcessed": images_processed,
+            "ImagesFailed": images_failed,
+            "EnrollmentDate": datetime.utcnow()
+        },
+        "LastUpdated": datetime.utcnow()
+    }
+
 def save_embedding_to_db(student_id, roll_no, embedding, images_processed, images_failed):
     """Save or update embedding in MongoDB"""
     try:
-        embedding_list = embedding.tolist()  # Convert numpy array to list
-        
-        embedding_doc = {
-            "StudentId": ObjectId(student_id),
-            "RollNo": int(roll_no),
-            "Embedding": embedding_list,
-            "EmbeddingMetadata": {
-                "ImagesProcessed": images_processed,
-                "ImagesFailed": images_failed,
-                "EnrollmentDate": datetime.utcnow()
-            },
-            "LastUpdated": datetime.utcnow()
-        }
-        
+        embedding_doc = embedding_document(student_id, roll_no, embedding, images_processed, images_failed)
+
         # Update if exists, insert if not
-        result = embeddings_collection.update_one(
+        result = get_embeddings_collection().update_one(
             {"RollNo": int(roll_no)},
             {"$set": embedding_doc},
             upsert=True
@@ -73,7 +174,7 @@ def load_all_enroll_embeddings(roll_nos=None):
             if roll_nos_ints:
                 query = {"RollNo": {"$in": roll_nos_ints}}
             
-        embeddings = embeddings_collection.find(query)
+        embeddings = get_embeddings_collection().find(query, EMBEDDING_PROJECTION)
         
         for emb_doc in embeddings:
             roll_no = emb_doc["RollNo"]
@@ -101,16 +202,17 @@ def check_student_enrollment(student_id):
         if isinstance(student_id, str):
             student_id = ObjectId(student_id)
         
-        # Check if embedding exists for this student
+        # Indexed existence check; never loads the embedding itself
         # Use the correct field name: "StudentId" (capital S)
-        existing = embeddings_collection.find_one({"StudentId": student_id})
+        enrolled = get_embeddings_collection().count_documents({"StudentId": student_id}, limit=1) > 0
         
         print(f"Checking enrollment for StudentId: {student_id}")
-        print(f"Found existing embedding: {existing is not None}")
+        print(f"Found existing embedding: {enrolled}")
         
-        return existing is not None
+        return enrolled
         
     except Exception as e:
         print(f"Error checking enrollment: {str(e)}")
         import traceback
-        traceback.print_exc()   
\ No newline at end of file
+        traceback.print_exc()
+        return False
@@ -1,9 +1,16 @@
+import copy
 import cv2
 import numpy as np
 import onnxruntime as ort
+from models.session import create_session, run_batch
 
 class FaceDetector:
-    def __init__(self, model_path, input_size=(512, 512), conf_threshold=0.5):
+    def __init__(self, model_path, input_size=(512, 512), conf_threshold=0.5, cache_dir=None,
+                 tiling=False, tile_grid=None, tile_overlap=0.2, tile_min_side=1280, nms_threshold=0.45,
+                 tile_warmup_frame=(3840, 2160)):
+        if not 0.0 <= tile_overlap < 1.0:
+            raise ValueError(f"tile_overlap must be in [0, 1), got {tile_overlap}")
+
         # Configure GPU Providers
         providers = [
             ('CUDAExecutionProvider', {
@@ -20,10 +27,59 @@ class FaceDetector:
         options = ort.SessionOptions()
         options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
         
-        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.session = create_session(model_path, providers, options=options, cache_dir=cache_dir)
+        self.model_path = model_path
+        self.providers = providers
+        self.cache_dir = cache_dir
         self.input_size = input_size
         self.conf_threshold = conf_threshold
         self.input_name = self.session.get_inputs()[0].name
+        # Cleared by warmup() when the model rejects batches; batches then run one view at a time
+        self.batched = True
+
+        # Tiled mode for high-resolution frames (see detect_tiled)
+        self.tiling = tiling
+        self.tile_grid = tile_grid  # (cols, rows) or None to derive from frame size
+        self.tile_overlap = tile_overlap
+        self.tile_min_side = tile_min_side
+        self.nms_threshold = nms_threshold
+        self.tile_warmup_frame = tile_warmup_frame  # (w, h) whose tile batch is warmed up
+
+    def profiling_clone(self, profile_prefix):
+        """Copy of this detector backed by a fresh session with ONNX Runtime profiling enabled"""
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.enable_profiling = True
+        options.profile_file_prefix = profile_prefix
+
+        clone = copy.copy(self)
+        clone.session = create_session(self.model_path, self.providers, options=options, cache_dir=self.cache_dir)
+        return clone
+
+    def warmup(self, batch_sizes=(1,)):
+        """
+        Run dummy inferences so kernel selection and arena growth happen before the first request.
+
+        In tiled mode the tile batch of a tile_warmup_frame-sized frame (tiles
+        plus the full view) is warmed up as well. A model that rejects a
+        batch size (exported with a fixed batch dimension) is switched to
+        running batches one view at a time; failing at batch size 1 fails
+        startup.
+        """
+        batch_sizes = {1, *batch_sizes}
+        if self.tiling and self.tile_warmup_frame:
+            batch_sizes.add(len(self.make_tiles(*self.tile_warmup_frame)) + 1)
+        for batch_size in sorted(batch_sizes):
+            blob = np.zeros((batch_size, 3, self.input_size[1], self.input_size[0]), dtype=np.float32)
+            try:
+                self.session.run(None, {self.input_name: blob})
+            except Exception as e:
+                if batch_size == 1:
+                    raise
+                print(f"[WARMUP] Detector rejected batch size {batch_size}, "
+                      f"running batches one view at a time: {str(e)}")
+                self.batched = False
+                break
 
     def preprocess(self, img):
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -32,7 +88,31 @@ class FaceDetector:
         img_data = np.transpose(img_data, (2, 0, 1))
         return np.expand_dims(img_data, axis=0)
 
+    def letterbox(self, img):
+        """
+        Resize keeping the aspect ratio and pad to the detector input size.
+
+        Returns:
+            (blob, (scale, pad_x, pad_y)) where a model-space point p maps
+            back to window pixels as (p - pad) / scale
+        """
+        in_w, in_h = self.input_size
+        h, w = img.shape[:2]
+        scale = min(in_w / w, in_h / h)
+        new_w, new_h = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+        pad_x, pad_y = (in_w - new_w) // 2, (in_h - new_h) // 2
+
+        canvas = np.full((in_h, in_w, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(img, (new_w, new_h))
+        return self.preprocess(canvas), (scale, pad_x, pad_y)
+
     def detect(self, image):
+        h, w = image.shape[:2]
+        if self.tiling and max(h, w) > self.tile_min_side:
+            return self.detect_tiled(image)
+        return self.detect_single(image)
+
+    def detect_single(self, image):
         h, w = image.shape[:2]
         blob = self.preprocess(image)
         outputs = self.session.run(None, {self.input_name: blob})
@@ -53,4 +133,168 @@ class FaceDetector:
                 
                 faces.append({'bbox': [max(0, x1), max(0, y1), min(w, x2), min(h, y2)], 'conf': float(conf)})
         
-        return sorted(faces, key=lambda x: x['conf'], reverse=True)
\ No newline at end of file
+        return sorted(faces, key=lambda x: x['conf'], reverse=True)
+
+    def detect_batch(self, images):
+        """
+        Detect faces in several frames with one batched session call.
+
+        Frames that qualify for tiled detection are handled one by one since
+        they already expand to a batch of their own.
+        """
+        results = [None] * len(images)
+        batch_idx = []
+        for i, image in enumerate(images):
+            h, w = image.shape[:2]
+            if self.tiling and max(h, w) > self.tile_min_side:
+                results[i] = self.detect_tiled(image)
+            else:
+                batch_idx.append(i)
+
+        if batch_idx:
+            blob = np.concatenate([self.preprocess(images[i]) for i in batch_idx], axis=0)
+            outputs = run_batch(self.session, self.input_name, blob, self.batched)[0]
+            for out, i in zip(outputs, batch_idx):
+                h, w = images[i].shape[:2]
+                boxes, scores = self._decode(out, (0, 0, w, h), w, h)
+                faces = [
+                    {'bbox': [int(v) for v in box], 'conf': float(score)}
+                    for box, score in zip(boxes, scores)
+                ]
+                results[i] = sorted(faces, key=lambda x: x['conf'], reverse=True)
+        return results
+
+    # =========================================================
+    # Tiled detection
+    # =========================================================
+    def _tile_axis(self, length, count, tile_len):
+        """Evenly spread `count` windows of `tile_len` over `length`, first and last flush with the edges"""
+        if count <= 1 or tile_len >= length:
+            return [0]
+        step = (length - tile_len) / (count - 1)
+        return [int(round(i * step)) for i in range(count)]
+
+    def make_tiles(self, w, h):
+        """
+        Split a w x h frame into overlapping tiles.
+
+        Without an explicit grid, tiles match the detector input size so faces
+        are not downscaled; with a grid, tiles are sized to cover the frame and
+        letterboxed into the detector input.
+
+        Returns:
+            List of (x, y, tile_w, tile_h)
+        """
+        in_w, in_h = self.input_size
+        overlap = self.tile_overlap
+
+        if self.tile_grid:
+            cols, rows = self.tile_grid
+            tile_w = int(np.ceil(w / (cols - (cols - 1) * overlap)))
+            tile_h = int(np.ceil(h / (rows - (rows - 1) * overlap)))
+        else:
+            tile_w, tile_h = in_w, in_h
+            cols = int(np.ceil((w - tile_w * overlap) / (tile_w * (1 - overlap))))
+            rows = int(np.ceil((h - tile_h * overlap) / (tile_h * (1 - overlap))))
+
+        tile_w, tile_h = min(tile_w, w), min(tile_h, h)
+        return [
+            (x, y, tile_w, tile_h)
+            for y in self._tile_axis(h, max(rows, 1), tile_h)
+            for x in self._tile_axis(w, max(cols, 1), tile_w)
+        ]
+
+    def _decode(self, output, window, frame_w, frame_h, letterbox=None):
+        """
+        Vectorized decode of one (5, N) output into frame-space boxes and scores.
+
+        letterbox is the (scale, pad_x, pad_y) returned by letterbox() when the
+        window was padded instead of stretched to the input size.
+        """
+        x, y, win_w, win_h = window
+        preds = output.T
+        preds = preds[preds[:, 4] > self.conf_threshold]
+        if preds.size == 0:
+            return np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=np.float32)
+
+        if letterbox is None:
+            sx = win_w / self.input_size[0]
+            sy = win_h / self.input_size[1]
+            pad_x = pad_y = 0
+        else:
+            scale, pad_x, pad_y = letterbox
+            sx = sy = 1.0 / scale
+        cx, cy, bw, bh = preds[:, 0] - pad_x, preds[:, 1] - pad_y, preds[:, 2], preds[:, 3]
+        boxes = np.stack([
+            (cx - bw / 2) * sx + x,
+            (cy - bh / 2) * sy + y,
+            (cx + bw / 2) * sx + x,
+            (cy + bh / 2) * sy + y,
+        ], axis=1)
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, frame_w)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, frame_h)
+        return boxes, preds[:, 4]
+
+    @staticmethod
+    def _cut_by_tile_edge(boxes, window, frame_w, frame_h, margin=2):
+        """Mask of boxes touching an inner tile edge; the overlapping neighbour sees them whole"""
+        x, y, win_w, win_h = window
+        cut = np.zeros(len(boxes), dtype=bool)
+        if x > 0:
+            cut |= boxes[:, 0] <= x + margin
+        if y > 0:
+            cut |= boxes[:, 1] <= y + margin
+        if x + win_w < frame_w:
+            cut |= boxes[:, 2] >= x + win_w - margin
+        if y + win_h < frame_h:
+            cut |= boxes[:, 3] >= y + win_h - margin
+        return cut
+
+    def detect_tiled(self, image):
+        """
+        Detect faces on overlapping tiles plus one downscaled full-frame view.
+
+        Tiles are letterboxed so faces keep their aspect ratio whatever the
+        tile shape (explicit grids give non-square tiles); the full-frame view
+        is preprocessed exactly as in detect_single so it finds the same faces.
+        All views go through the detector as a single batch. Boxes are mapped
+        back to frame coordinates, boxes clipped by an inner tile edge are
+        dropped, and the rest are merged with cross-tile NMS.
+        """
+        h, w = image.shape[:2]
+        tiles = self.make_tiles(w, h)
+        # Full-frame view catches faces larger than a tile
+        windows = tiles + [(0, 0, w, h)]
+
+        blobs, letterboxes = [], []
+        for x, y, tw, th in tiles:
+            blob, lb = self.letterbox(image[y:y + th, x:x + tw])
+            blobs.append(blob)
+            letterboxes.append(lb)
+        blobs.append(self.preprocess(image))
+        letterboxes.append(None)
+        outputs = run_batch(self.session, self.input_name, np.concatenate(blobs, axis=0), self.batched)[0]
+
+        all_boxes, all_scores = [], []
+        for i, window in enumerate(windows):
+            boxes, scores = self._decode(outputs[i], window, w, h, letterboxes[i])
+            if i < len(tiles) and len(boxes):
+                keep = ~self._cut_by_tile_edge(boxes, window, w, h)
+                boxes, scores = boxes[keep], scores[keep]
+            all_boxes.append(boxes)
+            all_scores.append(scores)
+
+        boxes = np.concatenate(all_boxes)
+        scores = np.concatenate(all_scores)
+        if len(boxes) == 0:
+            return []
+
+        xywh = [[float(b[0]), float(b[1]), float(b[2] - b[0]), float(b[3] - b[1])] for b in boxes]
+        keep = cv2.dnn.NMSBoxes(xywh, scores.tolist(), self.conf_threshold, self.nms_threshold)
+        keep = np.array(keep).flatten()
+
+        faces = [
+            {'bbox': [int(v) for v in boxes[k]], 'conf': float(scores[k])}
+            for k in keep
+        ]
+        return sorted(faces, key=lambda x: x['conf'], reverse=True)
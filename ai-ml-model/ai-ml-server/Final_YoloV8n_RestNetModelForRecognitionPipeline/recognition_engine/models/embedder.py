@@ -1,15 +1,52 @@
+import copy
 import cv2
 import numpy as np
 import onnxruntime as ort
+from models.session import create_session, run_batch
 
 class FaceEmbedder:
-    def __init__(self, model_path):
+    def __init__(self, model_path, cache_dir=None):
         # Enable CUDA
         providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
         
-        self.session = ort.InferenceSession(model_path, providers=providers)
+        self.session = create_session(model_path, providers, cache_dir=cache_dir)
+        self.model_path = model_path
+        self.providers = providers
+        self.cache_dir = cache_dir
         self.input_name = self.session.get_inputs()[0].name
         self.input_shape = (112, 112)
+        # Cleared by warmup() when the model rejects batches; batches then run one crop at a time
+        self.batched = True
+
+    def profiling_clone(self, profile_prefix):
+        """Copy of this embedder backed by a fresh session with ONNX Runtime profiling enabled"""
+        options = ort.SessionOptions()
+        options.enable_profiling = True
+        options.profile_file_prefix = profile_prefix
+
+        clone = copy.copy(self)
+        clone.session = create_session(self.model_path, self.providers, options=options, cache_dir=self.cache_dir)
+        return clone
+
+    def warmup(self, batch_sizes=(1,)):
+        """
+        Run dummy inferences so kernel selection and arena growth happen before the first request.
+
+        A model that rejects a batch size (exported with a fixed batch
+        dimension) is switched to embedding crops one at a time; failing at
+        batch size 1 fails startup.
+        """
+        for batch_size in sorted({1, *batch_sizes}):
+            blob = np.zeros((batch_size, 3, self.input_shape[1], self.input_shape[0]), dtype=np.float32)
+            try:
+                self.session.run(None, {self.input_name: blob})
+            except Exception as e:
+                if batch_size == 1:
+                    raise
+                print(f"[WARMUP] Embedder rejected batch size {batch_size}, "
+                      f"running batches one crop at a time: {str(e)}")
+                self.batched = False
+                break
 
     def preprocess(self, face_crop):
         face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
@@ -19,6 +56,17 @@ class FaceEmbedder:
         img_data = np.transpose(img_data, (2, 0, 1))
         return np.expand_dims(img_data, axis=0)
 
+    def get_embeddings(self, face_crops):
+        """Embed several face crops with one batched session call; returns (N, 512) L2-normalized"""
+        if not face_crops:
+            return np.empty((0, 512), dtype=np.float32)
+        blob = np.concatenate([self.preprocess(crop) for crop in face_crops], axis=0)
+        outputs = run_batch(self.session, self.input_name, blob, self.batched)
+
+        embeddings = outputs[0].reshape(len(face_crops), -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return np.where(norms > 1e-6, embeddings / np.maximum(norms, 1e-6), embeddings)
+
     def get_embedding(self, face_crop):
         blob = self.preprocess(face_crop)
         outputs = self.session.run(None, {self.input_name: blob})
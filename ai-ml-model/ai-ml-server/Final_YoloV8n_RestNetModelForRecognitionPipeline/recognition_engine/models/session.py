@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+
+import numpy as np
+import onnxruntime as ort
+
+
+def _provider_tag(providers):
+    names = [p[0] if isinstance(p, tuple) else p for p in providers]
+    available = set(ort.get_available_providers())
+    return "-".join(n.replace("ExecutionProvider", "").lower() for n in names if n in available)
+
+
+def _cache_path(model_path, providers, cache_dir):
+    base = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{base}.ort{ort.__version__}.{_provider_tag(providers)}.opt.onnx")
+
+
+def _write_cache(model_path, providers, options, cached_path):
+    """
+    Save the graph optimized up to ORT_ENABLE_EXTENDED.
+
+    Extended optimizations depend only on the model and the execution
+    providers; the layout passes of ORT_ENABLE_ALL depend on the exact
+    hardware, so they are left to each process loading the cache. The file
+    is written under a temporary name and moved into place, so workers
+    starting together never read a partial graph.
+
+    Returns:
+        The session that wrote the graph (built with the caller's options at
+        the extended level), or None if it could not be built
+    """
+    os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+    tmp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    level = options.graph_optimization_level
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = tmp_path
+    session = None
+    try:
+        session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        os.replace(tmp_path, cached_path)
+    except Exception as e:
+        print(f"Could not cache optimized graph for {os.path.basename(model_path)}: {str(e)}")
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+    finally:
+        # The session has consumed the options; restore them for the caller
+        options.graph_optimization_level = level
+        options.optimized_model_filepath = ""
+    return session
+
+
+def create_session(model_path, providers, options=None, cache_dir=None):
+    """
+    Build an ONNX Runtime session, reusing a cached optimized graph when possible.
+
+    The first run writes the graph with the hardware-independent
+    optimizations applied (see _write_cache) and serves with the session
+    that wrote it, so a cold start optimizes the model once. Later runs load
+    that graph, so only the cheap hardware-specific passes run at startup.
+    The cache file name includes the runtime version and the active
+    providers, and a cache older than the source model is ignored.
+    """
+    options = options or ort.SessionOptions()
+    if options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_DISABLE_ALL:
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    start = time.perf_counter()
+    source = "source"
+    path = model_path
+
+    if cache_dir:
+        cached_path = _cache_path(model_path, providers, cache_dir)
+        fresh = os.path.exists(cached_path) and os.path.getmtime(cached_path) >= os.path.getmtime(model_path)
+        if not fresh:
+            session = _write_cache(model_path, providers, options, cached_path)
+            if session is not None:
+                _log_loaded(model_path, "source, cache written", start, session)
+                return session
+        if os.path.exists(cached_path):
+            path = cached_path
+            source = "cache"
+
+    try:
+        session = ort.InferenceSession(path, sess_options=options, providers=providers)
+    except Exception as e:
+        if path == model_path:
+            raise
+        # A stale or corrupt cache must never keep the server from starting
+        print(f"Cached graph {path} failed to load ({str(e)}), loading from source")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker already removed it
+        return create_session(model_path, providers, options=options)
+
+    _log_loaded(model_path, source, start, session)
+    return session
+
+
+def _log_loaded(model_path, source, start, session):
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Loaded {os.path.basename(model_path)} from {source} in {elapsed:.1f} ms "
+          f"(providers: {session.get_providers()})")
+
+
+def run_batch(session, input_name, blob, batched=True):
+    """
+    session.run over a batch blob.
+
+    With batched False (a model that only accepts batch 1, see the warmup()
+    methods) the rows are run one at a time and the outputs concatenated.
+    """
+    if batched or len(blob) <= 1:
+        return session.run(None, {input_name: blob})
+    runs = [session.run(None, {input_name: blob[i:i + 1]}) for i in range(len(blob))]
+    return [np.concatenate(parts, axis=0) for parts in zip(*runs)]
@@ -6,5 +6,7 @@ Contains all API endpoints organized by functionality.
 from .detection import detection_bp
 from .enrollment import enrollment_bp
 from .recognition import recognition_bp
+from .profiling import profiling_bp
+from .ingestion import ingestion_bp
 
-__all__ = ['detection_bp', 'enrollment_bp', 'recognition_bp']
+__all__ = ['detection_bp', 'enrollment_bp', 'recognition_bp', 'profiling_bp', 'ingestion_bp']
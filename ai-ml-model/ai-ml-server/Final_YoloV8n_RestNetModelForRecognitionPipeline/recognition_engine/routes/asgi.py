@@ -0,0 +1,361 @@
+"""
+Async Routes
+/detect-face, /recognize, /find-student, /enroll and /ingestion/results for the ASGI app
+(asgi_app.py), with the same request and response contracts as the Flask
+blueprints.
+
+Upload parsing, MongoDB access and response writing stay on the event
+loop; image decoding and matching run on helper threads and pipeline
+calls on the bounded inference executor, so a slow database or a slow
+upload never holds an inference thread.
+"""
+
+import asyncio
+import traceback
+from quart import Blueprint, request, jsonify, current_app
+from utils.image import decode_image_bytes, save_image, confirm_saved_images
+from utils.async_request import get_client_id, get_pipeline, run_inference, rejection_response
+from routes.recognition import parse_roll_nos, best_matches, build_match_results, student_summary
+from routes.enrollment import extract_enrollment_face, average_embedding, find_student_response
+from routes.ingestion import ingestion_results
+from db import async_operations as db
+
+asgi_bp = Blueprint('asgi', __name__)
+
+
+async def _decode_upload(file_storage, gate):
+    """Decode an uploaded frame off the loop; also returns its motion-gate thumbnail"""
+    data = file_storage.read()
+
+    def decode():
+        img = decode_image_bytes(data)
+        return img, gate.thumbnail(img) if gate is not None else None
+
+    return await asyncio.to_thread(decode)
+
+
+def _gate_hit(gate, gate_key, img, thumb):
+    if gate is None:
+        return None
+    hit = gate.lookup(gate_key, img.shape, thumb)
+    if hit is None:
+        return None
+    cached, age = hit
+    return jsonify({**cached, "cached": True, "cache_age_ms": round(age * 1000, 1)})
+
+
+@asgi_bp.route("/detect-face", methods=["POST"])
+async def detect_face():
+    """Same contract as routes/detection.py"""
+    files = await request.files
+    if "image" not in files:
+        return jsonify({"error": "image required"}), 400
+
+    form = await request.form
+    client_id = get_client_id(form)
+    gate = current_app.config.get('MOTION_GATE')
+    img, thumb = await _decode_upload(files["image"], gate)
+
+    gate_key = (client_id, "detect")
+    cached = _gate_hit(gate, gate_key, img, thumb)
+    if cached is not None:
+        return cached
+
+    pipe = await get_pipeline()
+    if pipe is None:
+        return jsonify({"error": "recognition models are not ready"}), 503
+
+    ticket, results = await run_inference((client_id, "detect"), pipe.process_all_faces, img)
+    if not ticket.admitted:
+        return rejection_response(ticket)
+
+    bboxes = [face['bbox'] for face in results]
+
+    response = {
+        "faces_detected": len(bboxes),
+        "bboxes": bboxes
+    }
+    if gate is not None:
+        gate.update(gate_key, img.shape, thumb, response)
+
+    return jsonify({**response, "cached": False})
+
+
+async def match_faces(detected_faces, gallery):
+    """Async match_faces: one matrix product, then matched students fetched concurrently"""
+    matches = await asyncio.to_thread(best_matches, detected_faces, gallery)
+    roll_nos = list({roll_no for roll_no, _, matched in matches if matched})
+    students = await asyncio.gather(*(db.get_student_by_roll_no(roll_no) for roll_no in roll_nos))
+    student_cache = {roll_no: student_summary(roll_no, student) for roll_no, student in zip(roll_nos, students)}
+    return build_match_results(detected_faces, matches, student_cache)
+
+
+@asgi_bp.route("/recognize", methods=["POST"])
+async def recognize():
+    """Same contract as routes/recognition.py"""
+    files = await request.files
+    if "image" not in files:
+        return jsonify({"error": "image required"}), 400
+
+    form = await request.form
+    client_id = get_client_id(form)
+    roll_nos = parse_roll_nos(form.getlist("roll_nos"))
+    gate = current_app.config.get('MOTION_GATE')
+    img, thumb = await _decode_upload(files["image"], gate)
+
+    # The roster is part of the key since it changes the match result
+    gate_key = (client_id, "recognize", tuple(sorted(roll_nos)))
+    cached = _gate_hit(gate, gate_key, img, thumb)
+    if cached is not None:
+        return cached
+
+    pipe = await get_pipeline()
+    if pipe is None:
+        return jsonify({"error": "recognition models are not ready"}), 503
+
+    # Start loading the roster's gallery while inference runs
+    gallery_task = asyncio.ensure_future(db.load_all_enroll_embeddings(roll_nos=roll_nos if roll_nos else None))
+    try:
+        ticket, detected_faces = await run_inference((client_id, "recognize"), pipe.process_all_faces, img)
+    except BaseException:
+        gallery_task.cancel()
+        raise
+    if not ticket.admitted:
+        gallery_task.cancel()
+        return rejection_response(ticket)
+
+    if not detected_faces:
+        gallery_task.cancel()
+        response = {
+            "faces_detected": 0,
+            "results": []
+        }
+    else:
+        response = {
+            "faces_detected": len(detected_faces),
+            "results": await match_faces(detected_faces, await gallery_task)
+        }
+
+    if gate is not None:
+        gate.update(gate_key, img.shape, thumb, response)
+
+    return jsonify({**response, "cached": False})
+
+
+@asgi_bp.route("/find-student", methods=["POST"])
+async def find_student():
+    """Same contract as routes/enrollment.py"""
+    try:
+        data = await request.get_json()
+
+        if not data or "roll_no" not in data:
+            return jsonify({
+                "status": "error",
+                "message": "roll_no is required",
+                "data": []
+            }), 400
+
+        roll_no = data["roll_no"]
+        student = await db.get_student_by_roll_no(roll_no)
+
+        if not student:
+            return jsonify({
+                "status": "error",
+                "message": f"Student with Roll No {roll_no} not found in database",
+                "data": []
+            }), 404
+
+        is_enrolled = await db.check_student_enrollment(str(student["_id"]))
+        return jsonify(find_student_response(roll_no, student, is_enrolled)), 200
+
+    except Exception as e:
+        print(f"Find student error: {str(e)}")
+        traceback.print_exc()
+
+        return jsonify({
+            "status": "error",
+            "message": f"Failed to find student: {str(e)}",
+            "data": []
+        }), 500
+
+
+def _enroll_images(pipe, images):
+    """
+    Decode each enrollment image and extract its face (runs on the inference executor).
+
+    Returns one (face, reason) per image, as extract_enrollment_face; an image
+    that raises gets (None, error).
+    """
+    extracted = []
+    for idx, data in enumerate(images):
+        try:
+            extracted.append(extract_enrollment_face(pipe, decode_image_bytes(data)))
+        except Exception as e:
+            print(f"Error processing image {idx + 1}: {str(e)}")
+            extracted.append((None, str(e)))
+    return extracted
+
+
+@asgi_bp.route("/enroll", methods=["POST"])
+async def enroll():
+    """Same contract as routes/enrollment.py"""
+    try:
+        form = await request.form
+        if "roll_no" not in form:
+            return jsonify({
+                "status": "error",
+                "message": "roll_no is required",
+                "data": []
+            }), 400
+
+        roll_no = form["roll_no"]
+        student = await db.get_student_by_roll_no(roll_no)
+
+        if not student:
+            return jsonify({
+                "status": "error",
+                "message": f"Student with Roll No {roll_no} not found in database",
+                "data": []
+            }), 404
+
+        student_id = str(student["_id"])
+        student_name = student["FullName"]
+
+        if await db.check_student_enrollment(student_id):
+            return jsonify({
+                "status": "error",
+                "message": f"Student {student_name} (Roll No: {roll_no}) is already enrolled",
+                "data": [{
+                    "student_id": student_id,
+                    "roll_no": roll_no,
+                    "student_name": student_name,
+                    "is_enrolled": True
+                }]
+            }), 409
+
+        print(f"Processing enrollment for: {student_name} (Roll No: {roll_no}, ID: {student_id})")
+
+        files = await request.files
+        image_files = files.getlist("images")
+        if not image_files:
+            return jsonify({
+                "status": "error",
+                "message": "At least one image is required",
+                "data": []
+            }), 400
+
+        pipe = await get_pipeline()
+        if pipe is None:
+            return jsonify({
+                "status": "error",
+                "message": "Recognition models are not ready, please retry shortly",
+                "data": []
+            }), 503
+
+        embeddings = []
+        saved_images = []
+        failed_images = []
+
+        # Enrollment runs the models too, so it shares the inference budget
+        ticket, extracted = await run_inference(
+            (get_client_id(form), "enroll"), _enroll_images, pipe, [f.read() for f in image_files],
+            images=len(image_files)
+        )
+        if not ticket.admitted:
+            return rejection_response(ticket)
+
+        for idx, (face, reason) in enumerate(extracted):
+            try:
+                if face is None:
+                    failed_images.append({
+                        "index": idx + 1,
+                        "reason": reason
+                    })
+                    continue
+
+                face_crop_resized, bbox, embedding = face
+
+                # Hashing the crop is CPU work; the write itself is queued
+                image_path = await asyncio.to_thread(save_image, face_crop_resized, roll_no, "enroll", idx + 1)
+                embeddings.append(embedding)
+                saved_images.append({
+                    "index": idx + 1,
+                    "path": image_path,
+                    "bbox": bbox
+                })
+
+            except Exception as e:
+                print(f"Error processing image {idx + 1}: {str(e)}")
+                failed_images.append({
+                    "index": idx + 1,
+                    "reason": str(e)
+                })
+
+        if len(embeddings) == 0:
+            return jsonify({
+                "status": "error",
+                "message": "No valid faces detected in any image",
+                "data": [{"failed_images": failed_images}]
+            }), 422
+
+        # Make sure the crops reached disk before their paths are reported
+        await asyncio.to_thread(confirm_saved_images, saved_images)
+
+        avg_embedding = average_embedding(embeddings)
+
+        db_saved = await db.save_embedding_to_db(
+            student_id=student_id,
+            roll_no=roll_no,
+            embedding=avg_embedding,
+            images_processed=len(embeddings),
+            images_failed=len(failed_images)
+        )
+
+        if not db_saved:
+            return jsonify({
+                "status": "error",
+                "message": "Failed to save embedding to database",
+                "data": []
+            }), 500
+
+        print(f"Embedding saved to database for Roll No: {roll_no}")
+
+        return jsonify({
+            "status": "success",
+            "message": f"Student enrolled successfully with {len(embeddings)} image(s)",
+            "data": [
+                {
+                    "student_id": student_id,
+                    "roll_no": roll_no,
+                    "student_name": student_name,
+                    "images_processed": len(embeddings),
+                    "images_failed": len(failed_images),
+                    "saved_images": saved_images,
+                    "failed_images": failed_images if failed_images else []
+                }
+            ]
+        }), 200
+
+    except Exception as e:
+        print(f"Enrollment error: {str(e)}")
+        traceback.print_exc()
+
+        return jsonify({
+            "status": "error",
+            "message": f"Enrollment failed: {str(e)}",
+            "data": []
+        }), 500
+
+
+@asgi_bp.route("/ingestion/results", methods=["GET"])
+async def all_ingestion_results():
+    """Same contract as routes/ingestion.py"""
+    body, status = ingestion_results(current_app.config.get('INGESTION_SERVICE'))
+    return jsonify(body), status
+
+
+@asgi_bp.route("/ingestion/results/<camera_id>", methods=["GET"])
+async def camera_ingestion_results(camera_id):
+    """Same contract as routes/ingestion.py"""
+    body, status = ingestion_results(current_app.config.get('INGESTION_SERVICE'), camera_id)
+    return jsonify(body), status
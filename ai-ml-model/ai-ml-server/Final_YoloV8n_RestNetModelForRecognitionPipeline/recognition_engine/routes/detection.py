@@ -5,6 +5,7 @@ Handles face detection endpoints for bounding box streaming.
 
 from flask import Blueprint, request, jsonify, current_app
 from utils.image import decode_image
+from utils.request import get_client_id, get_pipeline, inference_slot, rejection_response
 
 detection_bp = Blueprint('detection', __name__)
 
@@ -19,19 +20,41 @@ def detect_face():
     
     Returns:
         - bboxes: List of [x1, y1, x2, y2] coordinates
+        - cached: True if the scene was unchanged and the previous result was reused
     """
     if "image" not in request.files:
         return jsonify({"error": "image required"}), 400
 
     img = decode_image(request.files["image"])
+
+    # Skip inference when the scene has not changed since the last frame
+    gate = current_app.config.get('MOTION_GATE')
+    if gate is not None:
+        gate_key = (get_client_id(), "detect")
+        thumb = gate.thumbnail(img)
+        hit = gate.lookup(gate_key, img.shape, thumb)
+        if hit is not None:
+            cached, age = hit
+            return jsonify({**cached, "cached": True, "cache_age_ms": round(age * 1000, 1)})
     
-    # Get pipeline from app config
-    pipe = current_app.config['RECOGNITION_PIPELINE']
-    results = pipe.process_all_faces(img)
+    # Get pipeline (waits while models are still loading)
+    pipe = get_pipeline()
+    if pipe is None:
+        return jsonify({"error": "recognition models are not ready"}), 503
+
+    # Bounded inference; stale frames are dropped with 429 under overload
+    with inference_slot("detect") as ticket:
+        if not ticket.admitted:
+            return rejection_response(ticket)
+        results = pipe.process_all_faces(img)
 
     bboxes = [face['bbox'] for face in results]
 
-    return jsonify({
+    response = {
         "faces_detected": len(bboxes),
         "bboxes": bboxes
-    })
+    }
+    if gate is not None:
+        gate.update(gate_key, img.shape, thumb, response)
+
+    return jsonify({**response, "cached": False})
@@ -5,13 +5,84 @@ Handles student enrollment with face cropping and embedding extraction.
 
 import cv2
 import numpy as np
-from flask import Blueprint, request, jsonify, current_app
-from utils.image import decode_image, save_image
+from flask import Blueprint, request, jsonify
+from utils.image import decode_image, save_image, confirm_saved_images
+from utils.request import get_pipeline, inference_slot, rejection_response
 from db.operations import get_student_by_roll_no, save_embedding_to_db, check_student_enrollment
 
 enrollment_bp = Blueprint('enrollment', __name__)
 
 
+def extract_enrollment_face(pipe, img):
+    """
+    Detect, crop and embed the face in one enrollment image.
+
+    Returns:
+        tuple: ((face_crop_112, bbox, embedding), None) on success,
+               (None, reason) when the image cannot be used
+    """
+    # Detect face using YOLO
+    _, bbox = pipe.process_image(img)
+
+    if bbox is None:
+        return None, "No face detected"
+
+    x1, y1, x2, y2 = map(int, bbox)
+
+    # Clamp coordinates to image size
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(img.shape[1], x2), min(img.shape[0], y2)
+
+    # Crop face
+    face_crop = img[y1:y2, x1:x2]
+
+    if face_crop.size == 0:
+        return None, "Invalid crop"
+
+    # Resize to 112x112
+    face_crop_resized = cv2.resize(face_crop, (112, 112))
+
+    # Compute embedding directly from the resized crop
+    embedding = pipe.embedder.get_embedding(face_crop_resized)
+
+    if embedding is None:
+        return None, "Embedding extraction failed"
+
+    return (face_crop_resized, [x1, y1, x2, y2], embedding), None
+
+
+def average_embedding(embeddings):
+    """Mean of the per-image embeddings, L2-normalized"""
+    avg_embedding = np.mean(embeddings, axis=0)
+
+    norm = np.linalg.norm(avg_embedding)
+    if norm > 0:
+        avg_embedding = avg_embedding / norm
+    return avg_embedding
+
+
+def find_student_response(roll_no, student, is_enrolled):
+    """Success body for /find-student"""
+    student_data = {
+        "student_id": str(student["_id"]),
+        "roll_no": roll_no,
+        "full_name": student.get("FullName", "N/A"),
+        "email": student.get("Email", "N/A"),
+        "department": student.get("Department", "N/A"),
+        "is_enrolled": is_enrolled  # NEW: enrollment status
+    }
+
+    message = "Student found successfully"
+    if is_enrolled:
+        message = f"Student {student.get('FullName')} is already enrolled in the system"
+
+    return {
+        "status": "success",
+        "message": message,
+        "data": [student_data]
+    }
+
+
 @enrollment_bp.route("/find-student", methods=["POST"])
 def find_student():
     """
@@ -54,24 +125,7 @@ def find_student():
         is_enrolled = check_student_enrollment(student_id)
 
         # Return student details
-        student_data = {
-            "student_id": student_id,
-            "roll_no": roll_no,
-            "full_name": student.get("FullName", "N/A"),
-            "email": student.get("Email", "N/A"),
-            "department": student.get("Department", "N/A"),
-            "is_enrolled": is_enrolled  # NEW: enrollment status
-        }
-
-        message = "Student found successfully"
-        if is_enrolled:
-            message = f"Student {student.get('FullName')} is already enrolled in the system"
-
-        return jsonify({
-            "status": "success",
-            "message": message,
-            "data": [student_data]
-        }), 200
+        return jsonify(find_student_response(roll_no, student, is_enrolled)), 200
 
     except Exception as e:
         print(f"Find student error: {str(e)}")
@@ -149,74 +203,56 @@ def enroll():
                 "data": []
             }), 400
 
-        # Get pipeline from app config
-        pipe = current_app.config['RECOGNITION_PIPELINE']
+        # Get pipeline (waits while models are still loading)
+        pipe = get_pipeline()
+        if pipe is None:
+            return jsonify({
+                "status": "error",
+                "message": "Recognition models are not ready, please retry shortly",
+                "data": []
+            }), 503
         
         embeddings = []
         saved_images = []
         failed_images = []
 
-        for idx, image_file in enumerate(image_files):
-            try:
-                img = decode_image(image_file)
-                
-                # Detect face using YOLO
-                _, bbox = pipe.process_image(img)
-
-                if bbox is None:
-                    failed_images.append({
-                        "index": idx + 1,
-                        "reason": "No face detected"
-                    })
-                    continue
-
-                x1, y1, x2, y2 = map(int, bbox)
+        # Enrollment runs the models too, so it shares the inference budget
+        with inference_slot("enroll", images=len(image_files)) as ticket:
+            if not ticket.admitted:
+                return rejection_response(ticket)
 
-                # Clamp coordinates to image size
-                x1, y1 = max(0, x1), max(0, y1)
-                x2, y2 = min(img.shape[1], x2), min(img.shape[0], y2)
-
-                # Crop face
-                face_crop = img[y1:y2, x1:x2]
-
-                if face_crop.size == 0:
-                    failed_images.append({
+            for idx, image_file in enumerate(image_files):
+                try:
+                    img = decode_image(image_file)
+                
+                    face, reason = extract_enrollment_face(pipe, img)
+                    if face is None:
+                        failed_images.append({
+                            "index": idx + 1,
+                            "reason": reason
+                        })
+                        continue
+
+                    face_crop_resized, bbox, embedding = face
+
+                    # Queue cropped image for background write; the image only
+                    # counts as processed once the store has accepted it
+                    image_path = save_image(face_crop_resized, roll_no, "enroll", index=idx + 1)
+                    embeddings.append(embedding)
+                    saved_images.append({
                         "index": idx + 1,
-                        "reason": "Invalid crop"
+                        "path": image_path,
+                        "bbox": bbox
                     })
-                    continue
-
-                # Resize to 112x112
-                face_crop_resized = cv2.resize(face_crop, (112, 112))
 
-                # Compute embedding directly from the resized crop
-                embedding = pipe.embedder.get_embedding(face_crop_resized)
+                    print(f"Image {idx + 1} processed successfully")
 
-                if embedding is None:
+                except Exception as e:
+                    print(f"Error processing image {idx + 1}: {str(e)}")
                     failed_images.append({
                         "index": idx + 1,
-                        "reason": "Embedding extraction failed"
+                        "reason": str(e)
                     })
-                    continue
-
-                embeddings.append(embedding)
-
-                # Save cropped image
-                image_path = save_image(face_crop_resized, roll_no, "enroll", index=idx + 1)
-                saved_images.append({
-                    "index": idx + 1,
-                    "path": image_path,
-                    "bbox": bbox.tolist()
-                })
-
-                print(f"Image {idx + 1} processed successfully")
-
-            except Exception as e:
-                print(f"Error processing image {idx + 1}: {str(e)}")
-                failed_images.append({
-                    "index": idx + 1,
-                    "reason": str(e)
-                })
 
         if len(embeddings) == 0:
             return jsonify({
@@ -227,13 +263,11 @@ def enroll():
 
         print(f"Successfully processed {len(embeddings)} images")
 
-        # Calculate average embedding
-        avg_embedding = np.mean(embeddings, axis=0)
-        
-        # Normalize the average embedding
-        norm = np.linalg.norm(avg_embedding)
-        if norm > 0:
-            avg_embedding = avg_embedding / norm
+        # Make sure the crops reached disk before their paths are reported
+        confirm_saved_images(saved_images)
+
+        # Average and re-normalize the per-image embeddings
+        avg_embedding = average_embedding(embeddings)
 
         print(f"Average embedding calculated. Shape: {avg_embedding.shape}")
 
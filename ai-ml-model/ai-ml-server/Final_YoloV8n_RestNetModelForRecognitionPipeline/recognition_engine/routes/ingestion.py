@@ -0,0 +1,61 @@
+"""
+Ingestion Routes
+Latest recognition results of the server-side camera ingestion (INGESTION_CAMERAS).
+"""
+
+import time
+from flask import Blueprint, jsonify, current_app
+
+ingestion_bp = Blueprint('ingestion', __name__)
+
+
+def result_summary(camera_id, result):
+    """JSON view of one camera's latest result (embeddings are left out)"""
+    if result is None:
+        return {"camera_id": camera_id, "captured_at": None, "age_ms": None, "faces_detected": 0, "results": []}
+    faces = [
+        {
+            "bbox": face["bbox"],
+            "roll_no": face.get("roll_no"),
+            "similarity": face.get("similarity"),
+            "match": face.get("match", False)
+        }
+        for face in result["faces"]
+    ]
+    return {
+        "camera_id": camera_id,
+        "captured_at": result["captured_at"],
+        "age_ms": round((time.time() - result["captured_at"]) * 1000, 1),
+        "faces_detected": len(faces),
+        "results": faces
+    }
+
+
+def ingestion_results(service, camera_id=None):
+    """
+    (body, status) for GET /ingestion/results[/<camera_id>]; shared with the ASGI app.
+
+    A camera that has not produced a result yet is listed with empty results.
+    """
+    if service is None:
+        return {"error": "camera ingestion is not enabled"}, 404
+    if camera_id is None:
+        latest = service.latest_results()
+        return {"cameras": [result_summary(c, latest.get(c)) for c in list(service.cameras)]}, 200
+    if camera_id not in service.cameras:
+        return {"error": f"unknown camera {camera_id}"}, 404
+    return result_summary(camera_id, service.latest_result(camera_id)), 200
+
+
+@ingestion_bp.route("/ingestion/results", methods=["GET"])
+def all_results():
+    """Latest matched faces of every ingested camera"""
+    body, status = ingestion_results(current_app.config.get('INGESTION_SERVICE'))
+    return jsonify(body), status
+
+
+@ingestion_bp.route("/ingestion/results/<camera_id>", methods=["GET"])
+def camera_results(camera_id):
+    """Latest matched faces of one ingested camera"""
+    body, status = ingestion_results(current_app.config.get('INGESTION_SERVICE'), camera_id)
+    return jsonify(body), status
@@ -0,0 +1,126 @@
+"""
+Profiling Routes
+Admin-only, on-demand deep profiling of inference and request handling.
+
+Only registered when PROFILING_ADMIN_TOKEN is configured, so the request
+hooks below do not exist at all when profiling is off.
+"""
+
+import hmac
+from flask import Blueprint, request, jsonify, current_app, g, send_from_directory
+
+profiling_bp = Blueprint('profiling', __name__)
+
+
+def _is_admin():
+    token = current_app.config.get('PROFILING_ADMIN_TOKEN')
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+def _profile_requested():
+    flag = request.headers.get("X-Profile") or request.args.get("profile")
+    return flag in ("1", "true", "yes")
+
+
+# Routes that run the models; other routes are profiled with cProfile only
+INFERENCE_PATHS = ("/detect-face", "/recognize", "/recognize-batch", "/enroll")
+
+
+@profiling_bp.before_app_request
+def start_profiling():
+    if request.path.startswith("/admin/profiling") or request.path in ("/health", "/ready") \
+            or request.method == "OPTIONS":
+        return None
+
+    profiler = current_app.config['REQUEST_PROFILER']
+    requested = _profile_requested() and _is_admin()
+    if not requested and profiler.remaining <= 0:
+        return None
+
+    state = profiler.begin(
+        current_app.config['SERVICE_STARTUP'].pipeline,
+        inference=request.path in INFERENCE_PATHS,
+        consume_armed=not requested
+    )
+    if state is None:
+        return None
+    g.profile_state = state
+    # get_pipeline() hands the profiling copy to the route instead of the shared pipeline
+    if state["pipeline"] is not None:
+        g.profiling_pipeline = state["pipeline"]
+    return None
+
+
+def _finish(status):
+    state = g.pop('profile_state', None)
+    if state is None:
+        return None
+    g.pop('profiling_pipeline', None)
+    return current_app.config['REQUEST_PROFILER'].end(state, {
+        "method": request.method,
+        "path": request.path,
+        "status": status
+    })
+
+
+@profiling_bp.after_app_request
+def stop_profiling(response):
+    if 'profile_state' in g:
+        profile_id = g.profile_state["id"]
+        # "preparing" tells the caller to retry for an ONNX trace
+        onnx_trace = g.profile_state["onnx_trace"]
+        _finish(response.status_code)
+        response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Profile-Onnx"] = onnx_trace
+    return response
+
+
+@profiling_bp.teardown_app_request
+def abort_profiling(exc):
+    # Handler raised before a response was built
+    if 'profile_state' in g:
+        _finish(500)
+
+
+@profiling_bp.route("/admin/profiling", methods=["GET", "POST"])
+def profiling_control():
+    """
+    Arm profiling for the next N requests (POST) or list saved profiles (GET).
+
+    Expected input (POST, JSON):
+        - requests: Number of upcoming requests to profile (0 disarms)
+
+    Requires the X-Admin-Token header.
+    """
+    if not _is_admin():
+        return jsonify({"error": "admin token required"}), 403
+
+    profiler = current_app.config['REQUEST_PROFILER']
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            count = int(data.get("requests", 1))
+        except (TypeError, ValueError):
+            return jsonify({"error": "requests must be an integer"}), 400
+        profiler.arm(count, current_app.config['SERVICE_STARTUP'].pipeline)
+
+    return jsonify({
+        "armed_requests": profiler.remaining,
+        "profiles": profiler.list_profiles()
+    })
+
+
+@profiling_bp.route("/admin/profiling/<profile_name>", methods=["GET"])
+def download_profile(profile_name):
+    """Download a saved profile by file name or id. Requires the X-Admin-Token header."""
+    if not _is_admin():
+        return jsonify({"error": "admin token required"}), 403
+
+    profiler = current_app.config['REQUEST_PROFILER']
+    if not profile_name.startswith("profile_"):
+        profile_name = f"profile_{profile_name}.json"
+    if profile_name not in profiler.list_profiles():
+        return jsonify({"error": "profile not found"}), 404
+
+    return send_from_directory(profiler.output_dir, profile_name, as_attachment=True)
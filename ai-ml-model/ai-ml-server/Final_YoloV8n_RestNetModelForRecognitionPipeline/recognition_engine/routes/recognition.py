@@ -3,12 +3,79 @@ Recognition Routes
 Handles face recognition and attendance marking.
 """
 
+import math
 from flask import Blueprint, request, jsonify, current_app
-from utils.image import decode_image
+from utils.image import decode_image, decode_image_bytes, unpack_images
+from utils.request import get_client_id, get_pipeline, inference_slot, rejection_response
+from core.pipeline import RecognitionPipeline
 from db.operations import get_student_by_roll_no, load_all_enroll_embeddings
+from config import BATCH_MAX_IMAGES
 
 recognition_bp = Blueprint('recognition', __name__)
 
+RECOGNITION_THRESHOLD = 0.45
+
+
+def parse_roll_nos(raw_roll_nos):
+    """Flatten roll_nos given as repeated values and/or comma-separated strings"""
+    roll_nos = []
+    for item in raw_roll_nos:
+        # Split by comma if it's a comma-separated string
+        if "," in item:
+            roll_nos.extend([r.strip() for r in item.split(",") if r.strip()])
+        elif item.strip():
+            roll_nos.append(item.strip())
+    return roll_nos
+
+
+def student_summary(roll_no, student):
+    """Student details returned with a match (None if the student record is missing)"""
+    if not student:
+        return None
+    return {
+        "roll_no": roll_no,
+        "name": student["FullName"],
+        "faculty": str(student["Faculty"]),
+        "email": student["Email"]
+    }
+
+
+def best_matches(detected_faces, gallery):
+    """Best gallery entry per face as (roll_no, score, matched), in one pass"""
+    matches = RecognitionPipeline.match_gallery([face['embedding'] for face in detected_faces], gallery)
+    return [
+        (roll_no, score, score >= RECOGNITION_THRESHOLD if roll_no else False)
+        for roll_no, score in matches
+    ]
+
+
+def build_match_results(detected_faces, matches, student_cache):
+    """Per-face result objects; student_cache must hold every matched roll_no"""
+    recognition_results = []
+    for face, (best_roll_no, best_score, matched) in zip(detected_faces, matches):
+        recognition_results.append({
+            "match": matched,
+            "student": student_cache[best_roll_no] if matched else None,
+            "similarity": round(float(best_score), 4),
+            "bbox": face['bbox'],
+            "threshold": RECOGNITION_THRESHOLD
+        })
+    return recognition_results
+
+
+def match_faces(detected_faces, gallery, student_cache):
+    """
+    Match detected faces against the gallery in one pass.
+
+    student_cache maps roll_no -> student details so each matched student is
+    fetched from the database once per request.
+    """
+    matches = best_matches(detected_faces, gallery)
+    for roll_no, _, matched in matches:
+        if matched and roll_no not in student_cache:
+            student_cache[roll_no] = student_summary(roll_no, get_student_by_roll_no(roll_no))
+    return build_match_results(detected_faces, matches, student_cache)
+
 
 @recognition_bp.route("/recognize", methods=["POST"])
 def recognize():
@@ -25,6 +92,7 @@ def recognize():
             - student: Student details if matched
             - similarity: Similarity score
             - bbox: Bounding box coordinates
+        - cached: True if the scene was unchanged and the previous result was reused
     """
     if "image" not in request.files:
         return jsonify({"error": "image required"}), 400
@@ -32,69 +100,175 @@ def recognize():
     img = decode_image(request.files["image"])
     
     # Extract roll_nos from form data if present
-    raw_roll_nos = request.form.getlist("roll_nos")
-    roll_nos = []
-    for item in raw_roll_nos:
-        # Split by comma if it's a comma-separated string
-        if "," in item:
-            roll_nos.extend([r.strip() for r in item.split(",") if r.strip()])
-        elif item.strip():
-            roll_nos.append(item.strip())
+    roll_nos = parse_roll_nos(request.form.getlist("roll_nos"))
 
-    # Get pipeline from app config
-    pipe = current_app.config['RECOGNITION_PIPELINE']
+    # Skip inference when the scene has not changed since the last frame.
+    # The roster is part of the key since it changes the match result.
+    gate = current_app.config.get('MOTION_GATE')
+    if gate is not None:
+        gate_key = (get_client_id(), "recognize", tuple(sorted(roll_nos)))
+        thumb = gate.thumbnail(img)
+        hit = gate.lookup(gate_key, img.shape, thumb)
+        if hit is not None:
+            cached, age = hit
+            return jsonify({**cached, "cached": True, "cache_age_ms": round(age * 1000, 1)})
+
+    # Get pipeline (waits while models are still loading)
+    pipe = get_pipeline()
+    if pipe is None:
+        return jsonify({"error": "recognition models are not ready"}), 503
     
-    # Process all faces in the image
-    detected_faces = pipe.process_all_faces(img)
+    # Process all faces in the image (bounded; stale frames are dropped with 429 under overload)
+    with inference_slot("recognize") as ticket:
+        if not ticket.admitted:
+            return rejection_response(ticket)
+        detected_faces = pipe.process_all_faces(img)
     
     if not detected_faces:
-        return jsonify({
+        response = {
             "faces_detected": 0,
             "results": []
-        })
+        }
+        if gate is not None:
+            gate.update(gate_key, img.shape, thumb, response)
+        return jsonify({**response, "cached": False})
 
     # Load gallery (filtered if roll_nos provided)
     gallery = load_all_enroll_embeddings(roll_nos=roll_nos if roll_nos else None)
     
-    threshold = 0.45
-    recognition_results = []
+    recognition_results = match_faces(detected_faces, gallery, {})
 
-    for face in detected_faces:
-        query_embedding = face['embedding']
-        bbox = face['bbox']
-        
-        best_roll_no = None
-        best_score = -1.0
-
-        if len(gallery) > 0:
-            for roll_no, ref_emb in gallery:
-                score = pipe.compute_similarity(query_embedding, ref_emb)
-                if score > best_score:
-                    best_score = score
-                    best_roll_no = roll_no
-
-        matched = best_score >= threshold if best_roll_no else False
-        
-        student_details = None
-        if matched:
-            student = get_student_by_roll_no(best_roll_no)
-            if student:
-                student_details = {
-                    "roll_no": best_roll_no,
-                    "name": student["FullName"],
-                    "faculty": str(student["Faculty"]),
-                    "email": student["Email"]
-                }
+    response = {
+        "faces_detected": len(detected_faces),
+        "results": recognition_results
+    }
+    if gate is not None:
+        gate.update(gate_key, img.shape, thumb, response)
 
-        recognition_results.append({
-            "match": matched,
-            "student": student_details,
-            "similarity": round(float(best_score), 4),
-            "bbox": bbox,
-            "threshold": threshold
+    return jsonify({**response, "cached": False})
+
+
+@recognition_bp.route("/recognize-batch", methods=["POST"])
+def recognize_batch():
+    """
+    Recognize faces across several images (e.g. multiple cameras or a short burst).
+    
+    Expected input, either:
+        - images: Multiple image files (multipart/form-data)
+        - roll_nos: Roster filter (optional, form field, comma-separated or multiple values)
+        - vote: "1" to add a per-student vote across images (optional, form field)
+    or:
+        - Body of Content-Type application/octet-stream with images packed as
+          repeated [4-byte big-endian length][encoded image]
+        - roll_nos / vote / min_votes as query parameters
+    
+    Returns:
+        - images: One entry per input image, same shape as /recognize
+        - votes: Per matched student, number of images they were recognized in
+                 and whether that reaches min_votes (default: half the images, rounded up)
+    """
+    # The request body is capped by MAX_CONTENT_LENGTH before it is read.
+    # Multipart uploads are already parsed (and spooled) by the time the
+    # image count is checked, so the count only bounds decoding and inference
+    if request.mimetype == "application/octet-stream":
+        try:
+            encoded = unpack_images(request.get_data())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        params = request.args
+    else:
+        encoded = request.files.getlist("images")
+        params = request.form
+
+    if not encoded:
+        return jsonify({"error": "images required"}), 400
+    if len(encoded) > BATCH_MAX_IMAGES:
+        return jsonify({"error": f"at most {BATCH_MAX_IMAGES} images per request"}), 413
+
+    vote = params.get("vote") in ("1", "true", "yes")
+    if vote:
+        try:
+            min_votes = int(params.get("min_votes", math.ceil(len(encoded) / 2)))
+        except ValueError:
+            return jsonify({"error": "min_votes must be an integer"}), 400
+        if not 1 <= min_votes <= len(encoded):
+            return jsonify({"error": f"min_votes must be between 1 and {len(encoded)}"}), 400
+
+    if request.mimetype != "application/octet-stream":
+        encoded = [f.read() for f in encoded]
+
+    images = []
+    for idx, data in enumerate(encoded):
+        try:
+            images.append(decode_image_bytes(data))
+        except ValueError:
+            return jsonify({"error": f"image {idx + 1} could not be decoded"}), 400
+
+    roll_nos = parse_roll_nos(params.getlist("roll_nos"))
+
+    # Get pipeline (waits while models are still loading)
+    pipe = get_pipeline()
+    if pipe is None:
+        return jsonify({"error": "recognition models are not ready"}), 503
+
+    # One batched detection call and one embedder batch for all images
+    with inference_slot("recognize-batch", images=len(images)) as ticket:
+        if not ticket.admitted:
+            return rejection_response(ticket)
+        per_image_faces = pipe.process_batch(images)
+    all_faces = [face for faces in per_image_faces for face in faces]
+
+    # Roster and gallery are loaded once for the whole batch
+    gallery = load_all_enroll_embeddings(roll_nos=roll_nos if roll_nos else None) if all_faces else []
+    all_results = match_faces(all_faces, gallery, {})
+
+    image_results = []
+    offset = 0
+    for idx, faces in enumerate(per_image_faces):
+        results = all_results[offset:offset + len(faces)]
+        offset += len(faces)
+        image_results.append({
+            "index": idx + 1,
+            "faces_detected": len(faces),
+            "results": results
         })
 
-    return jsonify({
-        "faces_detected": len(detected_faces),
-        "results": recognition_results
-    })
+    response = {
+        "images_processed": len(images),
+        "faces_detected": len(all_faces),
+        "images": image_results
+    }
+
+    if vote:
+        response["votes"] = vote_across_images(image_results, min_votes)
+
+    return jsonify(response)
+
+
+def vote_across_images(image_results, min_votes):
+    """Count in how many images each student was matched (one vote per image)"""
+    tally = {}
+    for image in image_results:
+        best_in_image = {}
+        for result in image["results"]:
+            if not result["match"] or result["student"] is None:
+                continue
+            roll_no = result["student"]["roll_no"]
+            if result["similarity"] > best_in_image.get(roll_no, (None, -1.0))[1]:
+                best_in_image[roll_no] = (result["student"], result["similarity"])
+
+        for roll_no, (student, similarity) in best_in_image.items():
+            entry = tally.setdefault(roll_no, {"student": student, "similarities": []})
+            entry["similarities"].append(similarity)
+
+    votes = []
+    for entry in tally.values():
+        similarities = entry["similarities"]
+        votes.append({
+            "student": entry["student"],
+            "images_matched": len(similarities),
+            "best_similarity": max(similarities),
+            "mean_similarity": round(sum(similarities) / len(similarities), 4),
+            "present": len(similarities) >= min_votes
+        })
+    return sorted(votes, key=lambda v: v["images_matched"], reverse=True)
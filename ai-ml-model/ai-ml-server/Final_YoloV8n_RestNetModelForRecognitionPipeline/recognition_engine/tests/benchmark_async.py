@@ -0,0 +1,243 @@
+"""
+Benchmark: Flask (app.py) vs ASGI (asgi_app.py) serving under many open connections.
+
+Each simulated client holds one connection busy at a time: it uploads a
+frame to /recognize, trickling the body over --upload-ms like a slow
+classroom uplink, waits for the response, pauses for --think-ms and
+repeats. The number of clients is ramped for both servers, and the report
+gives the most concurrent connections each server sustained with p99
+latency at or under --p99-ms and at most --max-error-rate of requests
+failed (errors and timeouts; 429/503 admission rejections are reported in
+their own column and do not count as failures).
+
+Both servers must already be running against the same MongoDB, e.g.
+    python app.py                                    (Flask, port 5001)
+    hypercorn asgi_app:app --bind 0.0.0.0:5002       (ASGI)
+Serve the Flask app the way it is deployed (e.g. a fixed number of
+gunicorn workers/threads) for the comparison to be meaningful.
+
+Both servers share the same admission limits, which caps what either can
+accept. To compare how many connections each can hold open, start both
+with ADMISSION_ENABLED=false and pass --no-admission; the benchmark then
+checks via /ready that admission control is really off.
+
+Usage:
+    python -m tests.benchmark_async --sync-url http://127.0.0.1:5001 --async-url http://127.0.0.1:5002 \
+        --frames recorded_frames/ --connections 16,32,64,128,256 --upload-ms 300 --output async_vs_sync.json
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from config import DB_NAME
+from tests.load_generator import load_frames, encode_multipart, seed_remote, cleanup_seed
+
+
+# =========================================================
+# Clients
+# =========================================================
+class ConnectionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.ok = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def record(self, latency_ms, status):
+        with self.lock:
+            if status == 200:
+                self.ok += 1
+                self.latencies.append(latency_ms)
+            elif status in (429, 503):
+                self.rejected += 1
+            else:
+                self.errors += 1
+
+
+def send_frame(url, body, content_type, client_id, upload_s, chunks, timeout):
+    """POST one frame with the body trickled out over upload_s; returns (status, latency_ms)"""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    start = time.perf_counter()
+    try:
+        conn.putrequest("POST", "/recognize")
+        conn.putheader("Content-Type", content_type)
+        conn.putheader("Content-Length", str(len(body)))
+        conn.putheader("X-Client-Id", client_id)
+        conn.endheaders()
+
+        step = max(1, len(body) // chunks)
+        for offset in range(0, len(body), step):
+            conn.send(body[offset:offset + step])
+            if upload_s > 0:
+                time.sleep(upload_s / chunks)
+
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status, (time.perf_counter() - start) * 1000
+    except Exception:
+        return None, (time.perf_counter() - start) * 1000
+    finally:
+        conn.close()
+
+
+def client_loop(url, frames, roster, client_id, stop_at, stats, args):
+    idx = random.randrange(len(frames))
+    # Spread the first requests out so clients do not fire in lockstep
+    time.sleep(random.uniform(0, (args.upload_ms + args.think_ms) / 1000.0))
+    while time.monotonic() < stop_at:
+        body, content_type = encode_multipart({"roll_nos": roster}, {"image": ("frame.jpg", frames[idx % len(frames)])})
+        idx += 1
+        status, latency_ms = send_frame(url, body, content_type, client_id,
+                                        args.upload_ms / 1000.0, args.upload_chunks, args.timeout)
+        stats.record(latency_ms, status)
+        if args.think_ms > 0:
+            time.sleep(args.think_ms / 1000.0)
+
+
+def run_step(url, frames, roll_nos, connections, args):
+    stats = ConnectionStats()
+    stop_at = time.monotonic() + args.duration
+    threads = []
+    for i in range(connections):
+        roster = ",".join(str(r) for r in random.sample(roll_nos, min(args.roster_size, len(roll_nos))))
+        t = threading.Thread(target=client_loop, daemon=True,
+                             args=(url, frames, roster, f"bench-conn-{i}", stop_at, stats, args))
+        threads.append(t)
+        t.start()
+    for t in threads:
+        t.join()
+
+    lat = np.array(stats.latencies) if stats.latencies else np.array([np.nan])
+    completed = stats.ok + stats.rejected + stats.errors
+    step = {
+        "connections": connections,
+        "requests": completed,
+        "ok": stats.ok,
+        "rejected": stats.rejected,
+        "errors": stats.errors,
+        "throughput_rps": round(stats.ok / args.duration, 2),
+        # Failures only; admission rejections are load shedding, reported apart
+        "error_rate": round(stats.errors / completed, 4) if completed else 1.0,
+        "rejection_rate": round(stats.rejected / completed, 4) if completed else 0.0,
+        "p50_ms": round(float(np.nanpercentile(lat, 50)), 1),
+        "p99_ms": round(float(np.nanpercentile(lat, 99)), 1),
+    }
+    step["sustained"] = bool(step["p99_ms"] <= args.p99_ms and step["error_rate"] <= args.max_error_rate)
+    return step
+
+
+def admission_state(url):
+    """The server's admission stats from /ready, or None when admission control is off"""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    try:
+        conn.request("GET", "/ready")
+        # /ready answers 503 with the same body while not ready
+        return json.loads(conn.getresponse().read() or b"{}").get("admission")
+    finally:
+        conn.close()
+
+
+def run_server(label, url, frames, roll_nos, connection_counts, args):
+    print(f"\n[INFO] {label} server at {url}")
+    admission = admission_state(url)
+    if args.no_admission and admission is not None:
+        raise SystemExit(f"{label} server at {url} has admission control on; "
+                         f"restart it with ADMISSION_ENABLED=false or drop --no-admission")
+
+    steps = []
+    for connections in connection_counts:
+        step = run_step(url, frames, roll_nos, connections, args)
+        steps.append(step)
+        print(f"       {connections:>4} conns: {step['throughput_rps']:.1f} req/s, p99 {step['p99_ms']:.1f} ms, "
+              f"errors {step['error_rate'] * 100:.2f}%, rejected {step['rejection_rate'] * 100:.2f}%"
+              f"{'' if step['sustained'] else ' (over target)'}")
+        if not step["sustained"] and args.stop_when_over:
+            break
+        # Let the server drain before the next step
+        time.sleep(1.0)
+
+    sustained = [s["connections"] for s in steps if s["sustained"]]
+    return {
+        "label": label,
+        "url": url,
+        "admission_enabled": admission is not None,
+        "steps": steps,
+        "max_connections": max(sustained) if sustained else 0
+    }
+
+
+def print_summary(results, args):
+    print(f"\nMax concurrent connections at p99 <= {args.p99_ms:.0f} ms "
+          f"and errors <= {args.max_error_rate * 100:.1f}%:")
+    for r in results:
+        at_max = next((s for s in r["steps"] if s["connections"] == r["max_connections"]), None)
+        shed = f", {at_max['rejection_rate'] * 100:.1f}% rejected there" if at_max and at_max["rejected"] else ""
+        print(f"  {r['label']:>6}: {r['max_connections']} "
+              f"(admission {'on' if r['admission_enabled'] else 'off'}{shed})")
+    if len(results) == 2 and results[0]["max_connections"]:
+        ratio = results[1]["max_connections"] / results[0]["max_connections"]
+        print(f"  {results[1]['label']} / {results[0]['label']}: {ratio:.2f}x")
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Compare concurrent connections sustained by the Flask and ASGI servers")
+    parser.add_argument("--sync-url", required=True, help="Running Flask server (app.py)")
+    parser.add_argument("--async-url", required=True, help="Running ASGI server (asgi_app.py)")
+    parser.add_argument("--frames", help="Folder of recorded frames or a video file")
+    parser.add_argument("--seed-mongo-uri", help="Seed synthetic students into the servers' MongoDB first")
+    parser.add_argument("--seed-db", default=f"{DB_NAME}_loadtest",
+                        help="Database to seed (both servers must use the same DB_NAME)")
+    parser.add_argument("--keep-seed", action="store_true", help="Leave the seeded data in place after the run")
+    parser.add_argument("--no-admission", action="store_true",
+                        help="Require both servers to run with ADMISSION_ENABLED=false")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--roster-size", type=int, default=60)
+    parser.add_argument("--connections", default="8,16,32,64,128,256", help="Comma-separated connection counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per step")
+    parser.add_argument("--upload-ms", type=float, default=300.0, help="Time each client takes to upload a frame")
+    parser.add_argument("--upload-chunks", type=int, default=10)
+    parser.add_argument("--think-ms", type=float, default=1000.0, help="Pause between a response and the next frame")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--p99-ms", type=float, default=1500.0, help="p99 latency target (includes the upload)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--stop-when-over", action="store_true", help="Stop ramping a server once it misses the target")
+    parser.add_argument("--output", default=None, help="Where to save results JSON")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames)
+    print(f"[INFO] {len(frames)} frame(s) to replay")
+
+    seed_client = None
+    if args.seed_mongo_uri:
+        seed_client, roll_nos, _ = seed_remote(frames, args.seed_mongo_uri, args.seed_db, args.students)
+    else:
+        roll_nos = list(range(1, args.students + 1))
+
+    connection_counts = [int(v) for v in args.connections.split(",")]
+    try:
+        results = [
+            run_server("flask", args.sync_url.rstrip("/"), frames, roll_nos, connection_counts, args),
+            run_server("asgi", args.async_url.rstrip("/"), frames, roll_nos, connection_counts, args),
+        ]
+    finally:
+        if seed_client is not None and not args.keep_seed:
+            cleanup_seed(seed_client, args.seed_db, roll_nos)
+    print_summary(results, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "servers": results}, f, indent=2)
+        print(f"[INFO] Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
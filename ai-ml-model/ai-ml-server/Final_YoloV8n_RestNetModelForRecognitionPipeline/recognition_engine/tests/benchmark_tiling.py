@@ -0,0 +1,137 @@
+"""
+Single-pass vs tiled detection benchmark.
+
+Runs FaceDetector in both modes over a local folder of high-resolution
+images and reports recall and latency. Ground truth is read from YOLO-format
+label files next to each image (same stem, ".txt", one "class cx cy w h"
+line per face, normalized), as used for detector training. Images without a
+label file still count towards latency and detected faces.
+
+Usage:
+    python -m tests.benchmark_tiling --images /path/to/lecture_hall_frames
+"""
+import os
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from config import DETECTOR_PATH, DETECTOR_TILE_GRID, DETECTOR_TILE_OVERLAP
+from models.detector import FaceDetector
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def load_labels(image_path, w, h):
+    label_path = os.path.splitext(image_path)[0] + ".txt"
+    if not os.path.exists(label_path):
+        return None
+    boxes = []
+    with open(label_path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            cx, cy, bw, bh = (float(v) for v in parts[1:5])
+            boxes.append([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h])
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def iou_matrix(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def count_hits(gt, faces, iou_threshold):
+    """Greedy one-to-one matching of ground-truth boxes to detections"""
+    if len(gt) == 0 or not faces:
+        return 0
+    pred = np.array([f['bbox'] for f in faces], dtype=np.float32)
+    ious = iou_matrix(gt, pred)
+    hits = 0
+    used = set()
+    for g in np.argsort(-ious.max(axis=1)):
+        for p in np.argsort(-ious[g]):
+            if ious[g, p] < iou_threshold:
+                break
+            if p not in used:
+                used.add(p)
+                hits += 1
+                break
+    return hits
+
+
+def run_mode(detect_fn, images, iou_threshold, repeats):
+    latencies, detected, hits, total_gt = [], 0, 0, 0
+    for _, img, gt in images:
+        detect_fn(img)  # warm the arena for this frame size
+        for _ in range(repeats):
+            start = time.perf_counter()
+            faces = detect_fn(img)
+            latencies.append((time.perf_counter() - start) * 1000)
+        detected += len(faces)
+        if gt is not None:
+            total_gt += len(gt)
+            hits += count_hits(gt, faces, iou_threshold)
+
+    return {
+        "recall": hits / total_gt if total_gt else None,
+        "faces": detected,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(np.mean(latencies)),
+    }
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description="Compare single-pass and tiled face detection")
+    parser.add_argument("--images", required=True, help="Folder of high-resolution frames")
+    parser.add_argument("--model", default=DETECTOR_PATH)
+    parser.add_argument("--grid", default=None, help="Tile grid COLSxROWS (default: derived)")
+    parser.add_argument("--overlap", type=float, default=DETECTOR_TILE_OVERLAP)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a ground-truth hit")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    grid = tuple(int(v) for v in args.grid.lower().split("x")) if args.grid else DETECTOR_TILE_GRID
+    detector = FaceDetector(args.model, tiling=True, tile_grid=grid, tile_overlap=args.overlap)
+
+    images = []
+    for name in sorted(os.listdir(args.images)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(args.images, name)
+        img = cv2.imread(path)
+        if img is None:
+            print(f"[WARN] Could not read {path}")
+            continue
+        images.append((path, img, load_labels(path, img.shape[1], img.shape[0])))
+
+    if not images:
+        print(f"[ERROR] No images found in {args.images}")
+        return
+
+    h, w = images[0][1].shape[:2]
+    print(f"[INFO] {len(images)} image(s), first is {w}x{h}, "
+          f"{len(detector.make_tiles(w, h))} tile(s) + full view per frame")
+
+    results = {
+        "single": run_mode(detector.detect_single, images, args.iou, args.repeats),
+        "tiled": run_mode(detector.detect_tiled, images, args.iou, args.repeats),
+    }
+
+    print(f"\n{'mode':<8}{'recall':>10}{'faces':>8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for mode, r in results.items():
+        recall = f"{r['recall']:.3f}" if r['recall'] is not None else "n/a"
+        print(f"{mode:<8}{recall:>10}{r['faces']:>8}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['mean_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,485 @@
+"""
+End-to-end load generator: many virtual classroom cameras against the server.
+
+Each virtual camera replays recorded frames to /recognize at its own frame
+rate with its own roster, open-loop like the browser's setInterval loop
+(a slow response does not delay the next frame). The load is ramped over
+several camera counts to find the saturation point.
+
+By default everything runs offline in one process: the Flask app is served
+on a local port with MongoDB replaced by an in-memory mongomock instance
+seeded with synthetic students and embeddings in the same shape
+db/operations.py writes. Use --url to target an already running server
+build instead, seeding a throwaway database with --seed-mongo-uri: it goes
+to --seed-db (start the server with DB_NAME set to the same name), is
+upserted so reruns work, and is dropped after the run unless --keep-seed.
+Without seeding, --url requires --existing-students, which states that the
+server's database already holds roll numbers 1..--students.
+
+Latency is measured from each frame's scheduled send time, so time a frame
+waits for a free sender thread at saturation is included in p99.
+
+The gallery is seeded from the faces in the replayed frames (embedded with
+the local models), and those students are on every camera's roster, so
+requests exercise real matches; remaining students get random embeddings.
+
+Results are saved as JSON so runs against different server builds can be
+compared with --compare.
+
+Usage:
+    python -m tests.load_generator --frames recorded_frames/ --cameras 5,10,25,50 --fps 2
+    python -m tests.load_generator --frames clip.mp4 --cameras 10,20 --output build_a.json
+    python -m tests.load_generator --frames clip.mp4 --cameras 10,20 --compare build_a.json
+"""
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from bson import ObjectId
+
+from config import DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+# =========================================================
+# Frames & synthetic data
+# =========================================================
+def load_frames(source, max_frames=200):
+    """Load JPEG-encoded frames from a folder of images or a video file"""
+    frames = []
+    if source and os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                img = cv2.imread(os.path.join(source, name))
+                if img is not None:
+                    frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+            if len(frames) >= max_frames:
+                break
+    elif source and os.path.isfile(source):
+        cap = cv2.VideoCapture(source)
+        while len(frames) < max_frames:
+            ret, img = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+        cap.release()
+
+    if not frames:
+        print("[WARN] No recorded frames given, using synthetic 1280x720 frames")
+        for _ in range(20):
+            img = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+            frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return frames
+
+
+def face_identities(frames, pipeline, threshold):
+    """
+    Distinct faces in the replayed frames, as one L2-normalized embedding per person.
+
+    Faces are grouped greedily: a face joins the first identity it matches
+    at the recognition threshold, otherwise it starts a new one.
+    """
+    from utils.image import decode_image_bytes
+
+    sums = []
+    for data in frames:
+        for face in pipeline.process_all_faces(decode_image_bytes(data)):
+            embedding = np.asarray(face["embedding"], dtype=np.float32).flatten()
+            for total in sums:
+                if float(np.dot(total / np.linalg.norm(total), embedding)) >= threshold:
+                    total += embedding
+                    break
+            else:
+                sums.append(embedding.copy())
+    identities = [total / np.linalg.norm(total) for total in sums]
+    print(f"[INFO] {len(identities)} distinct face(s) found in the replayed frames")
+    return identities
+
+
+def seed_database(db, num_students, identities=(), embedding_dim=512, first_roll_no=1):
+    """
+    Upsert synthetic students and enrolled embeddings into `db`.
+
+    The first students get the embeddings in `identities` (faces seen in the
+    replayed frames), the rest random ones. Upserts keyed on RollNo keep the
+    unique indexes happy when a database is seeded again.
+
+    Returns:
+        (roll_nos, present_roll_nos): all seeded roll numbers, and those of
+        the students whose faces appear in the frames
+    """
+    from db.operations import embedding_document
+
+    num_students = max(num_students, len(identities))
+    roll_nos = list(range(first_roll_no, first_roll_no + num_students))
+    faculty_id = ObjectId()
+    # One upsert per document: mongomock (in-process mode) has no working bulk_write
+    for roll_no in roll_nos:
+        db[STUDENTS_COLLECTION].update_one({"RollNo": roll_no}, {"$set": {
+            "RollNo": roll_no,
+            "FullName": f"Load Test Student {roll_no}",
+            "Email": f"loadtest{roll_no}@example.com",
+            "Faculty": faculty_id,
+            "Department": "Load Testing"
+        }}, upsert=True)
+    student_ids = {
+        doc["RollNo"]: doc["_id"]
+        for doc in db[STUDENTS_COLLECTION].find({"RollNo": {"$in": roll_nos}}, {"RollNo": 1})
+    }
+
+    rng = np.random.default_rng(0)
+    embeddings = list(identities)
+    for _ in range(num_students - len(embeddings)):
+        embedding = rng.standard_normal(embedding_dim).astype(np.float32)
+        embeddings.append(embedding / np.linalg.norm(embedding))
+
+    for roll_no, embedding in zip(roll_nos, embeddings):
+        db[EMBEDDINGS_COLLECTION].update_one({"RollNo": roll_no}, {
+            "$set": embedding_document(student_ids[roll_no], roll_no, embedding, images_processed=5, images_failed=0)
+        }, upsert=True)
+
+    present = roll_nos[:len(identities)]
+    print(f"[INFO] Seeded {num_students} synthetic students into {db.name} "
+          f"({len(present)} with faces from the frames)")
+    return roll_nos, present
+
+
+def cleanup_seed(client, db_name, roll_nos):
+    """Drop a dedicated seed database, or delete only the seeded students from a shared one"""
+    if db_name != DB_NAME:
+        client.drop_database(db_name)
+        print(f"[INFO] Dropped seed database {db_name}")
+        return
+    db = client[db_name]
+    db[STUDENTS_COLLECTION].delete_many({"RollNo": {"$in": roll_nos}})
+    db[EMBEDDINGS_COLLECTION].delete_many({"RollNo": {"$in": roll_nos}})
+    print(f"[INFO] Removed {len(roll_nos)} seeded students from {db_name}")
+
+
+def start_local_server(frames, num_students, disable_motion_gate):
+    """Serve the Flask app in-process on a free port with an in-memory MongoDB"""
+    import mongomock
+    from werkzeug.serving import make_server
+    from db.operations import set_mongo_client
+
+    client = mongomock.MongoClient()
+    set_mongo_client(client)
+
+    from app import app, startup
+    from routes.recognition import RECOGNITION_THRESHOLD
+    if disable_motion_gate:
+        app.config['MOTION_GATE'] = None
+
+    print("[INFO] Waiting for models to load...")
+    if startup.wait() is None:
+        raise RuntimeError(f"Model startup failed: {startup.error}")
+
+    identities = face_identities(frames, startup.pipeline, RECOGNITION_THRESHOLD)
+    roll_nos, present = seed_database(client[DB_NAME], num_students, identities)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    print(f"[INFO] Local server at {url}")
+    return url, roll_nos, present, server
+
+
+def seed_remote(frames, mongo_uri, db_name, num_students):
+    """Seed a database for an already running server, embedding the frames with the local models"""
+    from pymongo import MongoClient
+    from config import DETECTOR_PATH, EMBEDDER_PATH, DETECTOR_OPTIONS, MODEL_CACHE_DIR
+    from core.pipeline import RecognitionPipeline
+    from routes.recognition import RECOGNITION_THRESHOLD
+
+    print("[INFO] Loading models to embed the replayed frames...")
+    pipeline = RecognitionPipeline(DETECTOR_PATH, EMBEDDER_PATH, cache_dir=MODEL_CACHE_DIR,
+                                   detector_options=DETECTOR_OPTIONS)
+    identities = face_identities(frames, pipeline, RECOGNITION_THRESHOLD)
+    del pipeline
+
+    client = MongoClient(mongo_uri)
+    roll_nos, present = seed_database(client[db_name], num_students, identities, first_roll_no=900000)
+    if db_name != DB_NAME:
+        print(f"[INFO] The server under test must run with DB_NAME={db_name}")
+    return client, roll_nos, present
+
+
+# =========================================================
+# Virtual cameras
+# =========================================================
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class StepStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.sent = 0
+        self.ok = 0
+        self.rejected = 0
+        self.errors = 0
+        self.cached = 0
+        self.matched = 0
+
+    def record(self, latency_ms, status, cached=False, matched=0):
+        with self.lock:
+            if status == 200:
+                self.ok += 1
+                self.latencies.append(latency_ms)
+                self.cached += int(cached)
+                self.matched += matched
+            elif status in (429, 503):
+                self.rejected += 1
+            else:
+                self.errors += 1
+
+
+class VirtualCamera:
+    """Open-loop frame sender for one simulated classroom"""
+
+    def __init__(self, camera_id, url, frames, roster, fps, pool, stats, timeout):
+        self.camera_id = camera_id
+        self.url = url
+        self.frames = frames
+        self.roster = ",".join(str(r) for r in roster)
+        self.interval = 1.0 / fps
+        self.pool = pool
+        self.stats = stats
+        self.timeout = timeout
+        self.frame_idx = random.randrange(len(frames))
+
+    def run(self, stop_at):
+        # Random phase so cameras do not fire in lockstep
+        next_due = time.monotonic() + random.uniform(0, self.interval)
+        while True:
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if time.monotonic() >= stop_at:
+                return
+            frame = self.frames[self.frame_idx % len(self.frames)]
+            self.frame_idx += 1
+            with self.stats.lock:
+                self.stats.sent += 1
+            # Latency counts from the scheduled send time, so time spent queued
+            # for a free sender thread is measured rather than omitted
+            self.pool.submit(self._send, frame, next_due)
+            next_due += self.interval
+
+    def _send(self, frame, scheduled_at):
+        """POST one frame; latency is measured from scheduled_at (time.monotonic())"""
+        body, content_type = encode_multipart({"roll_nos": self.roster}, {"image": ("frame.jpg", frame)})
+        req = urllib.request.Request(
+            f"{self.url}/recognize", data=body, method="POST",
+            headers={"Content-Type": content_type, "X-Client-Id": self.camera_id}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                payload = json.loads(resp.read() or b"{}")
+                matched = sum(1 for r in payload.get("results", []) if r.get("match"))
+                self.stats.record((time.monotonic() - scheduled_at) * 1000, resp.status,
+                                  payload.get("cached", False), matched)
+        except urllib.error.HTTPError as e:
+            self.stats.record((time.monotonic() - scheduled_at) * 1000, e.code)
+        except Exception:
+            self.stats.record((time.monotonic() - scheduled_at) * 1000, None)
+
+
+def run_step(url, frames, roll_nos, present_roll_nos, num_cameras, fps_options, roster_sizes, duration, timeout):
+    stats = StepStats()
+    cameras_fps = [fps_options[i % len(fps_options)] for i in range(num_cameras)]
+    target_fps = sum(cameras_fps)
+
+    with ThreadPoolExecutor(max_workers=max(8, int(target_fps * 4))) as pool:
+        cameras = []
+        present = set(present_roll_nos)
+        others = [r for r in roll_nos if r not in present]
+        for i in range(num_cameras):
+            # Students seen in the frames are on every roster so their faces match
+            roster_size = min(max(roster_sizes[i % len(roster_sizes)] - len(present_roll_nos), 0), len(others))
+            roster = list(present_roll_nos) + random.sample(others, roster_size)
+            cameras.append(VirtualCamera(f"loadtest-cam-{i}", url, frames, roster, cameras_fps[i], pool, stats, timeout))
+
+        stop_at = time.monotonic() + duration
+        threads = [threading.Thread(target=cam.run, args=(stop_at,), daemon=True) for cam in cameras]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Leaving the with-block waits for in-flight requests
+
+    lat = np.array(stats.latencies) if stats.latencies else np.array([np.nan])
+    completed = stats.ok + stats.rejected + stats.errors
+    return {
+        "cameras": num_cameras,
+        "target_fps": round(target_fps, 2),
+        "achieved_fps": round(stats.ok / duration, 2),
+        "sent": stats.sent,
+        "ok": stats.ok,
+        "rejected": stats.rejected,
+        "errors": stats.errors,
+        "cached": stats.cached,
+        "matched_faces": stats.matched,
+        "error_rate": round((stats.errors + stats.rejected) / completed, 4) if completed else 0.0,
+        "p50_ms": round(float(np.nanpercentile(lat, 50)), 1),
+        "p99_ms": round(float(np.nanpercentile(lat, 99)), 1),
+    }
+
+
+def is_saturated(step, slo_ms, max_error_rate):
+    return (
+        step["achieved_fps"] < 0.9 * step["target_fps"]
+        or step["error_rate"] > max_error_rate
+        or step["p99_ms"] > slo_ms
+    )
+
+
+# =========================================================
+# Reporting
+# =========================================================
+def print_steps(steps):
+    print(f"\n{'cams':>5}{'target':>9}{'fps':>9}{'p50 ms':>9}{'p99 ms':>9}{'err %':>8}{'429/503':>9}{'cached':>8}  state")
+    for s in steps:
+        print(f"{s['cameras']:>5}{s['target_fps']:>9.1f}{s['achieved_fps']:>9.1f}{s['p50_ms']:>9.1f}"
+              f"{s['p99_ms']:>9.1f}{s['error_rate'] * 100:>8.2f}{s['rejected']:>9}{s['cached']:>8}  "
+              f"{'SATURATED' if s['saturated'] else 'ok'}")
+
+
+def print_comparison(current, baseline):
+    print(f"\nComparison with {baseline.get('label', 'baseline')}:")
+    base_steps = {s["cameras"]: s for s in baseline["steps"]}
+    for s in current["steps"]:
+        b = base_steps.get(s["cameras"])
+        if b is None:
+            continue
+        print(f"  {s['cameras']:>4} cams: fps {b['achieved_fps']:.1f} -> {s['achieved_fps']:.1f}, "
+              f"p99 {b['p99_ms']:.1f} -> {s['p99_ms']:.1f} ms, "
+              f"errors {b['error_rate'] * 100:.2f}% -> {s['error_rate'] * 100:.2f}%")
+    print(f"  saturation: {baseline.get('saturation_cameras')} -> {current.get('saturation_cameras')} cameras")
+
+
+def run_load_test():
+    parser = argparse.ArgumentParser(description="Simulate many classroom cameras against the recognition server")
+    parser.add_argument("--frames", help="Folder of recorded frames or a video file")
+    parser.add_argument("--url", help="Target a running server instead of an in-process one")
+    parser.add_argument("--seed-mongo-uri", help="Seed synthetic students into this MongoDB (with --url)")
+    parser.add_argument("--seed-db", default=f"{DB_NAME}_loadtest",
+                        help="Database to seed (the server must use the same DB_NAME)")
+    parser.add_argument("--keep-seed", action="store_true", help="Leave the seeded data in place after the run")
+    parser.add_argument("--existing-students", action="store_true",
+                        help="With --url and no seeding: the server's database already holds roll numbers 1..--students")
+    parser.add_argument("--cameras", default="5,10,20,50", help="Comma-separated camera counts to ramp through")
+    parser.add_argument("--fps", default="2", help="Per-camera frame rates, cycled across cameras")
+    parser.add_argument("--roster-sizes", default="40,60,120", help="Per-camera roster sizes, cycled across cameras")
+    parser.add_argument("--students", type=int, default=500, help="Synthetic students to seed")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per step")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p99 latency above this counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-motion-gate", action="store_true", help="Leave the motion gate on (in-process mode)")
+    parser.add_argument("--stop-at-saturation", action="store_true")
+    parser.add_argument("--label", default=None, help="Name of this server build in the results")
+    parser.add_argument("--output", default=None, help="Where to save results JSON")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+    if args.url and not args.seed_mongo_uri and not args.existing_students:
+        # Rosters would name students the server does not have, so nothing could match
+        parser.error("--url needs --seed-mongo-uri, or --existing-students if the server's "
+                     "database already holds roll numbers 1..--students")
+
+    frames = load_frames(args.frames)
+    print(f"[INFO] {len(frames)} frame(s) to replay")
+
+    seed_client = None
+    if args.url:
+        url = args.url.rstrip("/")
+        if args.seed_mongo_uri:
+            seed_client, roll_nos, present = seed_remote(frames, args.seed_mongo_uri, args.seed_db, args.students)
+        else:
+            roll_nos, present = list(range(1, args.students + 1)), []
+    else:
+        url, roll_nos, present, _ = start_local_server(frames, args.students,
+                                                       disable_motion_gate=not args.keep_motion_gate)
+
+    try:
+        run_steps(args, url, frames, roll_nos, present)
+    finally:
+        if seed_client is not None and not args.keep_seed:
+            cleanup_seed(seed_client, args.seed_db, roll_nos)
+
+
+def run_steps(args, url, frames, roll_nos, present):
+    """Ramp through the camera counts, then report and save the results"""
+    fps_options = [float(v) for v in args.fps.split(",")]
+    roster_sizes = [int(v) for v in args.roster_sizes.split(",")]
+
+    steps = []
+    for num_cameras in [int(v) for v in args.cameras.split(",")]:
+        print(f"[INFO] Running {num_cameras} camera(s) for {args.duration:.0f}s...")
+        step = run_step(url, frames, roll_nos, present, num_cameras, fps_options, roster_sizes,
+                        args.duration, args.timeout)
+        step["saturated"] = is_saturated(step, args.slo_ms, args.max_error_rate)
+        steps.append(step)
+        print(f"       {step['achieved_fps']:.1f}/{step['target_fps']:.1f} fps, p99 {step['p99_ms']:.1f} ms"
+              f"{' (saturated)' if step['saturated'] else ''}")
+        if step["saturated"] and args.stop_at_saturation:
+            break
+
+    first_saturated = next((s for s in steps if s["saturated"]), None)
+    sustainable = [s for s in steps if not s["saturated"]]
+    results = {
+        "label": args.label or time.strftime("%Y%m%d_%H%M%S"),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "url": args.url or "in-process",
+            "fps": fps_options,
+            "roster_sizes": roster_sizes,
+            "duration_s": args.duration,
+            "slo_ms": args.slo_ms,
+            "frames": len(frames),
+            "gallery_faces": len(present)
+        },
+        "steps": steps,
+        "saturation_cameras": first_saturated["cameras"] if first_saturated else None,
+        "max_sustainable_cameras": sustainable[-1]["cameras"] if sustainable else None
+    }
+
+    print_steps(steps)
+    print(f"\nSaturation point: {results['saturation_cameras'] or 'not reached'} camera(s), "
+          f"max sustainable: {results['max_sustainable_cameras']} camera(s)")
+
+    output = args.output or f"loadtest_{results['label']}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    run_load_test()
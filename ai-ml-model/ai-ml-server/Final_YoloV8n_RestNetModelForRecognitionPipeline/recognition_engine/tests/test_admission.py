@@ -0,0 +1,163 @@
+"""
+Tests for admission control: weighted slots, frame replacement and shedding.
+"""
+import time
+import threading
+
+from core.admission import AdmissionController
+
+
+def acquire_in_thread(controller, client_key, weight=1):
+    """Start acquire() on a thread; returns a dict that receives the ticket"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(ticket=controller.acquire(client_key, weight)))
+    thread.start()
+    result["thread"] = thread
+    return result
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_batch_takes_one_slot_per_image():
+    controller = AdmissionController(max_concurrent=4, max_queue=4, queue_deadline=1.0)
+    batch = controller.acquire(("a", "recognize-batch"), controller.weight_for(3))
+    assert batch.admitted and controller.stats()["running"] == 3
+
+    single = controller.acquire(("b", "recognize"))
+    assert single.admitted and controller.stats()["running"] == 4
+
+    # Capacity is used up: the next frame has to wait for a release
+    waiting = acquire_in_thread(controller, ("c", "recognize"))
+    assert wait_until(lambda: controller.stats()["waiting"] == 1)
+    controller.release(batch)
+    waiting["thread"].join()
+    assert waiting["ticket"].admitted
+
+
+def test_oversized_batch_waits_for_the_whole_capacity():
+    controller = AdmissionController(max_concurrent=2, max_queue=4, queue_deadline=1.0)
+    assert controller.weight_for(16) == 2
+
+    single = controller.acquire(("a", "recognize"))
+    batch = acquire_in_thread(controller, ("b", "recognize-batch"), controller.weight_for(16))
+    assert wait_until(lambda: controller.stats()["waiting"] == 1)
+
+    # Arrival order holds: a later single frame does not overtake the batch
+    later = acquire_in_thread(controller, ("c", "recognize"))
+    assert wait_until(lambda: controller.stats()["waiting"] == 2)
+
+    controller.release(single)
+    batch["thread"].join()
+    assert batch["ticket"].admitted and controller.stats()["running"] == 2
+    assert "ticket" not in later
+
+    controller.release(batch["ticket"])
+    later["thread"].join()
+    assert later["ticket"].admitted
+
+
+def test_newest_frame_replaces_queued_frame():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_deadline=1.0)
+    running = controller.acquire(("a", "recognize"))
+
+    older = acquire_in_thread(controller, ("b", "recognize"))
+    assert wait_until(lambda: controller.stats()["waiting"] == 1)
+    other = acquire_in_thread(controller, ("c", "recognize"))
+    assert wait_until(lambda: controller.stats()["waiting"] == 2)
+    newer = acquire_in_thread(controller, ("b", "recognize"))
+
+    older["thread"].join()
+    assert not older["ticket"].admitted and older["ticket"].reason == "superseded"
+    assert controller.stats()["waiting"] == 2
+
+    # The newer frame kept the older frame's place, ahead of client c
+    controller.release(running)
+    newer["thread"].join()
+    assert newer["ticket"].admitted
+    assert "ticket" not in other
+
+    controller.release(newer["ticket"])
+    other["thread"].join()
+    assert other["ticket"].admitted
+    assert controller.stats()["rejected"]["superseded"] == 1
+
+
+def test_client_holds_one_slot_at_a_time():
+    controller = AdmissionController(max_concurrent=2, max_queue=4, queue_deadline=1.0)
+    first = controller.acquire(("a", "recognize"))
+    assert first.admitted
+
+    # A slot is free, but client a's second frame waits for its first to finish
+    second = acquire_in_thread(controller, ("a", "recognize"))
+    assert wait_until(lambda: controller.stats()["waiting"] == 1)
+    assert controller.stats()["running"] == 1
+
+    # Client b is passed ahead of a's waiting frame and gets the free slot
+    other = controller.acquire(("b", "recognize"))
+    assert other.admitted and controller.stats()["running_clients"] == 2
+    assert "ticket" not in second
+
+    controller.release(other)
+    assert controller.stats()["running"] == 1 and "ticket" not in second
+    controller.release(first)
+    second["thread"].join()
+    assert second["ticket"].admitted
+    controller.release(second["ticket"])
+    assert controller.stats()["running"] == 0 and controller.stats()["running_clients"] == 0
+
+
+def test_queue_full_and_deadline_rejections():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_deadline=0.05)
+    running = controller.acquire(("a", "recognize"))
+
+    queued = acquire_in_thread(controller, ("b", "recognize"))
+    assert wait_until(lambda: controller.stats()["waiting"] == 1)
+    full = controller.acquire(("c", "recognize"))
+    assert not full.admitted and full.reason == "queue_full"
+    assert full.retry_after > 0
+
+    queued["thread"].join()
+    assert not queued["ticket"].admitted and queued["ticket"].reason == "deadline"
+    assert controller.stats()["waiting"] == 0
+
+    controller.release(running)
+    assert controller.stats()["running"] == 0
+
+
+def test_async_acquire_waits_on_the_loop():
+    import asyncio
+
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_deadline=1.0)
+        running = await controller.acquire_async(("a", "recognize"))
+        waiter = asyncio.ensure_future(controller.acquire_async(("b", "recognize")))
+        await asyncio.sleep(0.01)
+        assert controller.stats()["waiting"] == 1
+
+        # Released from another thread, as the inference executor does
+        await asyncio.to_thread(controller.release, running)
+        ticket = await asyncio.wait_for(waiter, 1.0)
+        assert ticket.admitted
+
+        # A cancelled waiter leaves the queue and does not leak slots
+        cancelled = asyncio.ensure_future(controller.acquire_async(("c", "recognize")))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        assert controller.stats()["waiting"] == 0
+        controller.release(ticket)
+        assert controller.stats()["running"] == 0
+
+        # Deadline without a release
+        controller.queue_deadline = 0.05
+        held = await controller.acquire_async(("a", "recognize"))
+        late = await controller.acquire_async(("d", "recognize"))
+        assert not late.admitted and late.reason == "deadline"
+        controller.release(held)
+
+    asyncio.run(scenario())
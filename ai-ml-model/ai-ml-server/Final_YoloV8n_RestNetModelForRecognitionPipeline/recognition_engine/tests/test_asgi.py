@@ -0,0 +1,223 @@
+"""
+Tests for the ASGI app (asgi_app.py): /recognize, /enroll and /ready, checked
+against the Flask routes for the same admission and rejection behaviour,
+and the async MongoDB operations.
+
+The pipeline is the stub from test_recognition. MongoDB is mongomock, behind
+a thin awaitable wrapper shaped like PyMongo's async client, since mongomock
+has no async API.
+"""
+import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+import core.startup
+from config import STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION
+from core.admission import AdmissionController
+from db import async_operations
+from routes.recognition import recognition_bp
+from tests.test_recognition import StubStartup, ALICE, BOB, db, pipeline, png
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._docs = iter(cursor)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Awaitable view of a mongomock collection with the methods db/async_operations.py uses"""
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def update_one(self, *args, **kwargs):
+        return self._collection.update_one(*args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return self._collection.count_documents(*args, **kwargs)
+
+    async def estimated_document_count(self):
+        return self._collection.estimated_document_count()
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._database[name])
+
+    async def command(self, name):
+        return self._database.command(name)
+
+
+class ReadyStartup(StubStartup):
+    is_ready = True
+
+    def status(self):
+        return {"ready": True, "loading": False, "error": None}
+
+
+@pytest.fixture
+def async_db(db, monkeypatch):
+    database = AsyncDatabase(db)
+    monkeypatch.setattr(async_operations, "get_async_db", lambda: database)
+    return db
+
+
+@pytest.fixture
+def asgi(async_db, pipeline, monkeypatch):
+    # Importing asgi_app starts model loading; there are no models here
+    monkeypatch.setattr(core.startup.ServiceStartup, "start", lambda self: self)
+    import asgi_app
+
+    startup = ReadyStartup(pipeline)
+    monkeypatch.setattr(asgi_app, "startup", startup)
+    app = asgi_app.app
+    monkeypatch.setitem(app.config, 'SERVICE_STARTUP', startup)
+    monkeypatch.setitem(app.config, 'MOTION_GATE', None)
+    monkeypatch.setitem(app.config, 'ADMISSION_CONTROLLER',
+                        AdmissionController(max_concurrent=1, max_queue=4, queue_deadline=0.05))
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="inference")
+    monkeypatch.setitem(app.config, 'INFERENCE_EXECUTOR', executor)
+    yield app
+    executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def flask_app(db, pipeline):
+    app = Flask(__name__)
+    app.config['SERVICE_STARTUP'] = StubStartup(pipeline)
+    app.config['ADMISSION_CONTROLLER'] = AdmissionController(max_concurrent=1, max_queue=4, queue_deadline=0.05)
+    app.register_blueprint(recognition_bp)
+    return app
+
+
+def asgi_recognize(app, level, **form):
+    async def post():
+        response = await app.test_client().post(
+            "/recognize", files={"image": FileStorage(io.BytesIO(png(level)), "frame.png")}, form=form
+        )
+        return response.status_code, await response.get_json(), response.headers
+
+    return asyncio.run(post())
+
+
+def flask_recognize(app, level, **form):
+    response = app.test_client().post(
+        "/recognize", data={**form, "image": (io.BytesIO(png(level)), "frame.png")},
+        content_type="multipart/form-data"
+    )
+    return response.status_code, response.get_json(), response.headers
+
+
+# =========================================================
+# Routes
+# =========================================================
+def test_recognize_matches_like_the_flask_route(asgi, flask_app):
+    status, body, _ = asgi_recognize(asgi, 20, roll_nos="1,2")
+    flask_status, flask_body, _ = flask_recognize(flask_app, 20, roll_nos="1,2")
+
+    assert status == flask_status == 200
+    assert body == flask_body
+    assert body["faces_detected"] == 2 and body["cached"] is False
+    assert [r["student"]["roll_no"] for r in body["results"]] == [1, 2]
+    assert asgi.config['ADMISSION_CONTROLLER'].stats()["admitted"] == 1
+
+
+def test_busy_recognize_is_rejected_like_the_flask_route(asgi, flask_app, pipeline):
+    held = [app.config['ADMISSION_CONTROLLER'].acquire(("other", "recognize")) for app in (asgi, flask_app)]
+
+    status, body, headers = asgi_recognize(asgi, 10)
+    flask_status, flask_body, flask_headers = flask_recognize(flask_app, 10)
+
+    assert status == flask_status == 429
+    assert body["reason"] == flask_body["reason"] == "deadline"
+    assert body.keys() == flask_body.keys()
+    assert headers["Retry-After"] and flask_headers["Retry-After"]
+    assert pipeline.batch_sizes == []
+    for app, ticket in zip((asgi, flask_app), held):
+        app.config['ADMISSION_CONTROLLER'].release(ticket)
+
+
+def test_busy_enroll_is_rejected_before_inference(asgi, async_db, monkeypatch):
+    monkeypatch.setattr("routes.asgi.extract_enrollment_face",
+                        lambda pipe, img: pytest.fail("enrollment ran without a slot"))
+    controller = asgi.config['ADMISSION_CONTROLLER']
+    held = controller.acquire(("other", "recognize"))
+
+    async def post():
+        response = await asgi.test_client().post(
+            "/enroll", form={"roll_no": "3"},
+            files={"images": FileStorage(io.BytesIO(png(10)), "face.png")}
+        )
+        return response.status_code, await response.get_json()
+
+    async_db[STUDENTS_COLLECTION].insert_one({"_id": ObjectId(), "RollNo": 3, "FullName": "Carol"})
+    status, body = asyncio.run(post())
+
+    assert status == 429 and body["reason"] == "deadline"
+    controller.release(held)
+
+
+def test_ready_reports_database_and_gallery(asgi, monkeypatch):
+    async def get():
+        response = await asgi.test_client().get("/ready")
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(get())
+    assert status == 200 and body["status"] == "ready"
+    assert body["gallery"] == {"ready": True, "embeddings": 2}
+    assert body["admission"]["max_concurrent"] == 1
+
+    async def unreachable(name):
+        raise ConnectionError("no server")
+
+    monkeypatch.setattr(AsyncDatabase, "command", lambda self, name: unreachable(name))
+    status, body = asyncio.run(get())
+    assert status == 503 and body["database"] == {"ready": False}
+    assert body["gallery"]["embeddings"] is None
+
+
+# =========================================================
+# Async operations
+# =========================================================
+def test_async_operations_read_and_write_the_same_documents(async_db):
+    async def scenario():
+        student = await async_operations.get_student_by_roll_no("1")
+        assert student["FullName"] == "Alice"
+        assert await async_operations.check_student_enrollment(str(student["_id"]))
+
+        gallery = await async_operations.load_all_enroll_embeddings(roll_nos=["2", "x"])
+        assert [roll_no for roll_no, _ in gallery] == [2]
+        np.testing.assert_allclose(gallery[0][1], BOB, rtol=1e-6)
+
+        student_id = ObjectId()
+        assert not await async_operations.check_student_enrollment(student_id)
+        assert await async_operations.save_embedding_to_db(str(student_id), 3, ALICE, 2, 1)
+        assert await async_operations.check_student_enrollment(student_id)
+        assert await async_operations.count_enrolled_embeddings() == 3
+
+    asyncio.run(scenario())
+    saved = async_db[EMBEDDINGS_COLLECTION].find_one({"RollNo": 3})
+    assert saved["EmbeddingMetadata"]["ImagesProcessed"] == 2 and len(saved["Embedding"]) == 512
@@ -0,0 +1,176 @@
+"""
+Tests for the MongoDB layer: slow-query logging, index bootstrap and projections.
+
+Runs against mongomock. mongomock never emits command monitoring events,
+so SlowQueryLogger is driven with stub events instead.
+"""
+from types import SimpleNamespace
+
+import mongomock
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from config import DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION
+from db import operations
+from db.monitoring import SlowQueryLogger
+
+
+@pytest.fixture
+def db():
+    client = mongomock.MongoClient()
+    operations.set_mongo_client(client)
+    yield client[DB_NAME]
+    operations.set_mongo_client(None)
+
+
+def command_event(name, duration_ms, target=None, request_id=1, failure=None):
+    command = {name: target} if target is not None else {name: 1}
+    return SimpleNamespace(
+        command_name=name,
+        command=command,
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        database_name=DB_NAME,
+        duration_micros=int(duration_ms * 1000),
+        failure=failure
+    )
+
+
+# =========================================================
+# SlowQueryLogger
+# =========================================================
+def test_slow_command_is_logged_with_namespace(capsys):
+    logger = SlowQueryLogger(threshold_ms=100)
+    logger.started(command_event("find", 0, target=STUDENTS_COLLECTION))
+    logger.succeeded(command_event("find", 250, target=STUDENTS_COLLECTION))
+
+    out = capsys.readouterr().out
+    assert logger.slow_count == 1
+    assert f"find on {DB_NAME}.{STUDENTS_COLLECTION} took 250.0 ms" in out
+    assert "ok)" in out
+
+
+def test_fast_command_is_not_logged(capsys):
+    logger = SlowQueryLogger(threshold_ms=100)
+    logger.started(command_event("find", 0, target=STUDENTS_COLLECTION))
+    logger.succeeded(command_event("find", 20, target=STUDENTS_COLLECTION))
+
+    assert logger.slow_count == 0
+    assert capsys.readouterr().out == ""
+    # The started() bookkeeping is cleared even when nothing is logged
+    assert logger._targets == {}
+
+
+def test_slow_failed_command_reports_failure(capsys):
+    logger = SlowQueryLogger(threshold_ms=100)
+    logger.started(command_event("update", 0, target=EMBEDDINGS_COLLECTION, request_id=7))
+    logger.failed(command_event("update", 400, request_id=7, failure={"errmsg": "timeout"}))
+
+    out = capsys.readouterr().out
+    assert logger.slow_count == 1
+    assert f"update on {DB_NAME}.{EMBEDDINGS_COLLECTION}" in out
+    assert "failed: {'errmsg': 'timeout'}" in out
+
+
+def test_handshake_commands_are_ignored(capsys):
+    logger = SlowQueryLogger(threshold_ms=1)
+    logger.started(command_event("hello", 0))
+    logger.succeeded(command_event("hello", 500))
+
+    assert logger.slow_count == 0
+    assert capsys.readouterr().out == ""
+
+
+# =========================================================
+# Index bootstrap
+# =========================================================
+def index_fields(collection):
+    return {
+        list(info["key"])[0][0]: info.get("unique", False)
+        for name, info in collection.index_information().items() if name != "_id_"
+    }
+
+
+def test_ensure_indexes_creates_unique_lookup_indexes(db):
+    assert operations.ensure_indexes() is True
+
+    assert index_fields(db[STUDENTS_COLLECTION]) == {"RollNo": True}
+    assert index_fields(db[EMBEDDINGS_COLLECTION]) == {"RollNo": True, "StudentId": True}
+    # Idempotent on a database that already has them
+    assert operations.ensure_indexes() is True
+
+
+def conflicting_create_index(self, keys, **kwargs):
+    raise operations.OperationFailure("Index already exists with different options")
+
+
+def test_ensure_indexes_accepts_existing_non_unique_indexes(db, monkeypatch):
+    for collection_name, indexes in operations.REQUIRED_INDEXES.items():
+        for field, _ in indexes:
+            db[collection_name].create_index(field)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "create_index", conflicting_create_index)
+    # The existing indexes still serve the lookups
+    assert operations.ensure_indexes() is True
+
+
+def test_ensure_indexes_reports_missing_index(db, monkeypatch):
+    db[STUDENTS_COLLECTION].create_index("RollNo")
+
+    monkeypatch.setattr(mongomock.collection.Collection, "create_index", conflicting_create_index)
+    # The embeddings collection has no index on RollNo or StudentId
+    assert operations.ensure_indexes() is False
+
+
+# =========================================================
+# Projections
+# =========================================================
+def seed_student(db, roll_no=101):
+    student_id = ObjectId()
+    db[STUDENTS_COLLECTION].insert_one({
+        "_id": student_id,
+        "RollNo": roll_no,
+        "FullName": "Test Student",
+        "Email": "test@example.com",
+        "Department": "Computing",
+        "Faculty": ObjectId(),
+        "Password": "hash",
+        "Photo": "x" * 1000
+    })
+    embedding = np.ones(512, dtype=np.float32) / np.sqrt(512)
+    operations.save_embedding_to_db(student_id, roll_no, embedding, images_processed=3, images_failed=0)
+    return student_id
+
+
+def test_student_lookup_returns_only_projected_fields(db):
+    seed_student(db)
+    student = operations.get_student_by_roll_no("101")
+
+    assert set(student) == {"_id"} | set(operations.STUDENT_PROJECTION)
+
+
+def test_gallery_load_returns_only_roll_no_and_embedding(db, monkeypatch):
+    seed_student(db, 101)
+    seed_student(db, 102)
+
+    seen = {}
+    real_find = mongomock.collection.Collection.find
+
+    def recording_find(self, *args, **kwargs):
+        seen["projection"] = args[1] if len(args) > 1 else kwargs.get("projection")
+        return real_find(self, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "find", recording_find)
+    gallery = operations.load_all_enroll_embeddings(roll_nos=["102", "not-a-number"])
+
+    assert seen["projection"] == operations.EMBEDDING_PROJECTION
+    assert [roll_no for roll_no, _ in gallery] == [102]
+    assert gallery[0][1].dtype == np.float32 and gallery[0][1].shape == (512,)
+
+
+def test_enrollment_check(db):
+    student_id = seed_student(db)
+
+    assert operations.check_student_enrollment(str(student_id)) is True
+    assert operations.check_student_enrollment(ObjectId()) is False
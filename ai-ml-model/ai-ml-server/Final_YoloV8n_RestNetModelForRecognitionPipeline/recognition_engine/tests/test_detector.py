@@ -0,0 +1,117 @@
+"""
+Tests for tiled detection geometry and the tiling config parser.
+
+The detector is built without a model; a stub session returns canned outputs.
+"""
+import numpy as np
+import pytest
+
+import config
+from models.detector import FaceDetector
+
+
+class StubSession:
+    """Returns one detection per view, given in model-input pixels"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.blobs = []
+
+    def run(self, outputs, feeds):
+        blob = next(iter(feeds.values()))
+        self.blobs.append(blob)
+        out = np.zeros((blob.shape[0], 5, 1), dtype=np.float32)
+        for i, row in enumerate(self.rows(blob.shape[0])):
+            out[i, :, 0] = row
+        return [out]
+
+
+def make_detector(session, **options):
+    detector = FaceDetector.__new__(FaceDetector)
+    detector.session = session
+    detector.input_name = "images"
+    detector.input_size = (512, 512)
+    detector.conf_threshold = 0.5
+    detector.tiling = True
+    detector.tile_grid = None
+    detector.tile_overlap = 0.2
+    detector.tile_min_side = 1280
+    detector.nms_threshold = 0.45
+    detector.tile_warmup_frame = None
+    detector.batched = True
+    for key, value in options.items():
+        setattr(detector, key, value)
+    return detector
+
+
+def test_letterbox_keeps_aspect_ratio():
+    detector = make_detector(None)
+    tile = np.zeros((831, 1130, 3), dtype=np.uint8)
+    tile[:, :] = 255
+
+    blob, (scale, pad_x, pad_y) = detector.letterbox(tile)
+
+    assert blob.shape == (1, 3, 512, 512)
+    assert scale == pytest.approx(512 / 1130)
+    assert pad_x == 0 and pad_y == (512 - round(831 * scale)) // 2
+    # Padding rows are grey, image rows are white
+    assert blob[0, 0, 0, 0] == pytest.approx(114 / 255)
+    assert blob[0, 0, 256, 256] == pytest.approx(1.0)
+
+
+def test_grid_tile_boxes_map_back_to_frame():
+    frame_w, frame_h = 3840, 2160
+    probe = make_detector(None, tile_grid=(4, 3))
+    tiles = probe.make_tiles(frame_w, frame_h)
+    x, y, tile_w, tile_h = tiles[5]
+    assert tile_w != tile_h
+
+    # A 100x100 face centred in tile 5, as the model sees it after letterboxing
+    scale = min(512 / tile_w, 512 / tile_h)
+    pad_y = (512 - int(round(tile_h * scale))) // 2
+    cx, cy = tile_w / 2 * scale, tile_h / 2 * scale + pad_y
+    face = [cx, cy, 100 * scale, 100 * scale, 0.9]
+
+    session = StubSession(lambda n: [face if i == 5 else [0, 0, 0, 0, 0] for i in range(n)])
+    detector = make_detector(session, tile_grid=(4, 3))
+    faces = detector.detect(np.zeros((frame_h, frame_w, 3), dtype=np.uint8))
+
+    assert len(session.blobs[0]) == len(tiles) + 1
+    assert len(faces) == 1
+    expected = [x + tile_w / 2 - 50, y + tile_h / 2 - 50, x + tile_w / 2 + 50, y + tile_h / 2 + 50]
+    assert faces[0]["bbox"] == pytest.approx(expected, abs=2)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("4x3", (4, 3)),
+    ("4X3 ", (4, 3)),
+    (" 4 x 3", (4, 3)),
+    ("", None),
+])
+def test_env_pair_parses(monkeypatch, raw, expected):
+    monkeypatch.setenv("DETECTOR_TILE_GRID", raw)
+    assert config._env_pair("DETECTOR_TILE_GRID") == expected
+
+
+@pytest.mark.parametrize("raw", ["4", "0x3", "ax3", "4x3x2"])
+def test_env_pair_rejects_invalid(monkeypatch, raw):
+    monkeypatch.setenv("DETECTOR_TILE_GRID", raw)
+    with pytest.raises(ValueError, match="DETECTOR_TILE_GRID"):
+        config._env_pair("DETECTOR_TILE_GRID")
+
+
+@pytest.mark.parametrize("raw, expected", [("0.2", 0.2), ("0", 0.0), (" 0.5 ", 0.5)])
+def test_tile_overlap_parses(monkeypatch, raw, expected):
+    monkeypatch.setenv("DETECTOR_TILE_OVERLAP", raw)
+    assert config._env_fraction("DETECTOR_TILE_OVERLAP", "0.2") == expected
+
+
+@pytest.mark.parametrize("raw", ["1", "1.0", "1.5", "-0.5", "abc", ""])
+def test_tile_overlap_rejects_values_tiling_cannot_use(monkeypatch, raw):
+    monkeypatch.setenv("DETECTOR_TILE_OVERLAP", raw)
+    with pytest.raises(ValueError, match="DETECTOR_TILE_OVERLAP"):
+        config._env_fraction("DETECTOR_TILE_OVERLAP", "0.2")
+
+
+def test_detector_rejects_an_invalid_overlap():
+    with pytest.raises(ValueError, match="tile_overlap"):
+        FaceDetector("missing.onnx", tile_overlap=1.0)
@@ -0,0 +1,103 @@
+"""
+Tests for the content-addressed image store: paths, dedup, back-pressure and cleanup.
+"""
+import os
+import time
+import hashlib
+import threading
+
+import numpy as np
+import pytest
+
+from utils.image_store import ImageStore
+
+
+def crop(value):
+    return np.full((16, 16, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(str(tmp_path / "images"), max_workers=1, max_queue=4, queue_timeout=0.05)
+    yield store
+    store.close()
+
+
+def test_path_is_the_sharded_content_hash(store):
+    img = crop(7)
+    digest = hashlib.sha1(img.tobytes()).hexdigest()
+
+    path = store.save(img)
+
+    assert path == os.path.join(store.root_dir, digest[:2], digest[2:4], f"{digest}.jpg")
+    assert store.save(img.copy()) == path
+    assert store.wait([path], timeout=2.0) == {}
+    assert os.path.isfile(path)
+
+
+def test_identical_content_is_written_once(store, monkeypatch):
+    writes = []
+    write_file = store._write_file
+    monkeypatch.setattr(store, "_write_file", lambda img, path: (writes.append(path), write_file(img, path)))
+
+    paths = {store.save(crop(3)) for _ in range(5)}
+    assert store.wait(paths, timeout=2.0) == {}
+    store.save(crop(3))
+
+    assert len(paths) == 1
+    assert writes == list(paths)
+
+
+def test_full_queue_writes_on_the_caller_instead_of_dropping(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / "images"), max_workers=1, max_queue=1, queue_timeout=0.05)
+    release = threading.Event()
+    write_file = store._write_file
+
+    def slow_write(img, path):
+        if threading.current_thread().name.startswith("image-store"):
+            release.wait(2.0)
+        write_file(img, path)
+
+    monkeypatch.setattr(store, "_write_file", slow_write)
+    queued = store.save(crop(1))
+    # The only slot is held by the stalled background write
+    sync = store.save(crop(2))
+
+    assert os.path.isfile(sync)
+    assert store.stats()["sync_writes"] == 1
+    release.set()
+    assert store.wait([queued], timeout=2.0) == {}
+    store.close()
+
+
+def test_failed_background_write_is_reported(store, monkeypatch):
+    def broken(img, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_write_file", broken)
+    path = store.save(crop(9))
+
+    errors = store.wait([path], timeout=2.0)
+    assert isinstance(errors[path], OSError)
+    assert store.stats()["failed_writes"] == 1
+    # Still reported after the write has left the queue
+    assert path in store.wait([path])
+
+
+def test_cleanup_only_sweeps_the_sharded_tree(store):
+    path = store.save(crop(5))
+    assert store.wait([path], timeout=2.0) == {}
+    legacy = os.path.join(store.root_dir, "12_enroll_1.jpg")
+    stray = os.path.join(store.root_dir, "ab", "notes.txt")
+    os.makedirs(os.path.dirname(stray), exist_ok=True)
+    for name in (legacy, stray):
+        with open(name, "wb") as f:
+            f.write(b"x")
+
+    old = time.time() - 10 * 86400
+    for name in (path, legacy, stray):
+        os.utime(name, (old, old))
+
+    assert store.cleanup(retention_days=1) == 1
+    assert not os.path.exists(path)
+    assert os.path.exists(legacy) and os.path.exists(stray)
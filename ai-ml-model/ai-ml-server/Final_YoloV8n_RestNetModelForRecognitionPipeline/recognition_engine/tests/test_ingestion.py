@@ -0,0 +1,311 @@
+"""
+Tests for camera ingestion on a short generated video.
+
+The pipeline is a stub, so these run without the ONNX models.
+"""
+import time
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask
+
+import config
+import core.ingestion
+from core.admission import AdmissionController
+from core.ingestion import CameraStream, IngestionService
+from routes.ingestion import ingestion_bp
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 50.0, (160, 120))
+    if not writer.isOpened():
+        pytest.skip("OpenCV build cannot write MJPG video")
+    for i in range(10):
+        frame = np.full((120, 160, 3), i * 20, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class StubPipeline:
+    """One face per frame with a fixed unit embedding"""
+    def __init__(self, embedding):
+        self.embedding = embedding
+        self.batch_sizes = []
+
+    def process_batch(self, images):
+        self.batch_sizes.append(len(images))
+        return [[{"bbox": [10, 10, 50, 50], "embedding": self.embedding.copy()}] for _ in images]
+
+
+def unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_faces_from_video_are_matched_against_gallery(video_file):
+    embedding = unit(np.arange(1, 513))
+    gallery_loads = []
+
+    def gallery_loader():
+        gallery_loads.append(time.monotonic())
+        return [(101, embedding), (102, unit(np.ones(512)) * -1)]
+
+    service = IngestionService(StubPipeline(embedding), batch_size=2, gallery_loader=gallery_loader)
+    service.add_camera("cam0", video_file)
+    service.add_camera("cam1", video_file)
+    service.start()
+    try:
+        assert wait_for(lambda: service.latest_result("cam0") and service.latest_result("cam1"))
+    finally:
+        service.stop()
+
+    face = service.latest_result("cam0")["faces"][0]
+    assert face["match"] is True
+    assert face["roll_no"] == 101
+    assert face["similarity"] == pytest.approx(1.0, abs=1e-4)
+
+    stats = service.stats()
+    assert stats["gallery_size"] == 2
+    assert all(cam["frames_processed"] > 0 for cam in stats["cameras"])
+    # Default refresh interval: the gallery is loaded once, not per batch
+    assert len(gallery_loads) == 1
+
+
+def test_unmatched_face_has_no_roll_no(video_file):
+    service = IngestionService(StubPipeline(unit(np.ones(512))), gallery_loader=lambda: [(101, unit(-np.ones(512)))])
+    service.add_camera("cam0", video_file)
+    service.start()
+    try:
+        assert wait_for(lambda: service.latest_result("cam0"))
+    finally:
+        service.stop()
+
+    face = service.latest_result("cam0")["faces"][0]
+    assert face["match"] is False and face["roll_no"] is None
+
+
+def test_start_when_ready_waits_for_the_pipeline(video_file):
+    class Startup:
+        def __init__(self):
+            self.pipeline = None
+
+        def wait(self, timeout=None):
+            time.sleep(0.1)
+            self.pipeline = StubPipeline(unit(np.ones(512)))
+            return self.pipeline
+
+    service = IngestionService(None)
+    service.add_camera("cam0", video_file)
+    service.start_when_ready(Startup())
+    try:
+        assert service.stats()["running"] is False
+        assert wait_for(lambda: service.latest_result("cam0"))
+    finally:
+        service.stop()
+
+
+def test_unreadable_source_backs_off(monkeypatch):
+    class EmptyCapture:
+        def read(self):
+            return False, None
+
+        def release(self):
+            pass
+
+    opens = []
+
+    def open_empty(self):
+        opens.append(time.monotonic())
+        return EmptyCapture(), 0.0
+
+    monkeypatch.setattr(CameraStream, "_open", open_empty)
+    camera = CameraStream("cam0", "broken.mp4", reconnect_delay=0.05, max_reconnect_delay=1.0)
+    camera.is_file = True
+    camera.start()
+    time.sleep(0.5)
+    camera.stop()
+
+    # 0.05 + 0.1 + 0.2 s of backoff fit in 0.5 s; without it this spins thousands of times
+    assert 2 <= len(opens) <= 5
+    assert camera.frames_grabbed == 0
+
+
+class FakeStream:
+    """Camera that always has a fresh frame"""
+    def __init__(self, camera_id, source, priority=1.0, loop=True):
+        self.camera_id = camera_id
+        self.source = source
+        self.priority = priority
+        self.virtual_time = 0.0
+        self.frames_processed = 0
+        self.last_processed = 0.0
+        self.connected = True
+        self.rejoined = False
+        self.frame = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    @property
+    def has_new_frame(self):
+        return self.connected
+
+    def take(self):
+        return (self.frame, time.time()) if self.connected else None
+
+    def take_rejoined(self):
+        rejoined, self.rejoined = self.rejoined, False
+        return rejoined
+
+    def stats(self, elapsed):
+        return {"camera_id": self.camera_id, "frames_processed": self.frames_processed}
+
+
+@pytest.fixture
+def fake_streams(monkeypatch):
+    monkeypatch.setattr(core.ingestion, "CameraStream", FakeStream)
+
+
+def run_batches(service, count):
+    for _ in range(count):
+        assert service._process_next_batch() > 0
+    return {cam_id: cam.frames_processed for cam_id, cam in service.cameras.items()}
+
+
+@pytest.mark.parametrize("num_cameras", [2, 4, 8])
+def test_round_robin_shares_frames_evenly_as_cameras_are_added(fake_streams, num_cameras):
+    service = IngestionService(StubPipeline(unit(np.ones(512))), batch_size=3, scheduling="round_robin")
+    for i in range(num_cameras):
+        service.add_camera(f"cam{i}", "fake")
+
+    counts = run_batches(service, 240)
+
+    # One frame per camera per batch: once cameras outnumber the batch size,
+    # each camera's share degrades evenly as batch_size / num_cameras
+    expected = 240 * min(3, num_cameras) / num_cameras
+    assert all(abs(n - expected) <= 1 for n in counts.values()), counts
+
+
+def test_priority_share_is_proportional_to_priority(fake_streams):
+    service = IngestionService(StubPipeline(unit(np.ones(512))), batch_size=1, scheduling="priority")
+    priorities = {"low": 1.0, "mid": 2.0, "high": 4.0}
+    for camera_id, priority in priorities.items():
+        service.add_camera(camera_id, "fake", priority=priority)
+
+    counts = run_batches(service, 700)
+
+    total = sum(priorities.values())
+    for camera_id, priority in priorities.items():
+        assert counts[camera_id] == pytest.approx(700 * priority / total, abs=2), counts
+
+
+def test_reconnected_camera_does_not_monopolize_batches(fake_streams):
+    service = IngestionService(StubPipeline(unit(np.ones(512))), batch_size=1, scheduling="priority")
+    for camera_id in ("a", "b", "c"):
+        service.add_camera(camera_id, "fake")
+
+    service.cameras["a"].connected = False
+    run_batches(service, 300)
+    before = {cam_id: cam.frames_processed for cam_id, cam in service.cameras.items()}
+
+    service.cameras["a"].connected = True
+    service.cameras["a"].rejoined = True
+    counts = run_batches(service, 30)
+
+    # Back to an even three-way split instead of "a" taking the next 150 batches
+    gained = {cam_id: counts[cam_id] - before[cam_id] for cam_id in counts}
+    assert all(abs(n - 10) <= 1 for n in gained.values()), gained
+
+
+def test_batches_share_the_admission_budget(fake_streams):
+    admission = AdmissionController(max_concurrent=4, max_queue=4, queue_deadline=0.05)
+    pipeline = StubPipeline(unit(np.ones(512)))
+    service = IngestionService(pipeline, batch_size=3, admission=admission)
+    for camera_id in ("a", "b", "c"):
+        service.add_camera(camera_id, "fake")
+
+    run_batches(service, 2)
+    assert admission.stats()["admitted"] == 2 and admission.stats()["running"] == 0
+
+    # HTTP requests hold the capacity: the batch is shed, not run
+    held = [admission.acquire((client, "recognize")) for client in ("x", "y")]
+    assert service._process_next_batch() == 0
+    assert service.batches_shed == 1 and pipeline.batch_sizes == [3, 3]
+    for ticket in held:
+        admission.release(ticket)
+
+
+def test_priority_must_be_positive(fake_streams):
+    service = IngestionService(None)
+    for priority in (0, -1.0):
+        with pytest.raises(ValueError, match="priority"):
+            service.add_camera("cam0", "fake", priority=priority)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("", {}),
+    ("gate=2, hall=0.5", {"gate": 2.0, "hall": 0.5}),
+])
+def test_camera_priorities_parse(monkeypatch, raw, expected):
+    monkeypatch.setenv("INGESTION_CAMERA_PRIORITIES", raw)
+    assert config._env_priorities("INGESTION_CAMERA_PRIORITIES", {"gate", "hall"}) == expected
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("gate", "camera_id=positive_number"),
+    ("gate=x", "camera_id=positive_number"),
+    ("gate=0", "camera_id=positive_number"),
+    ("gate=-1", "camera_id=positive_number"),
+    ("=2", "camera_id=positive_number"),
+    ("lobby=2", "no camera 'lobby'"),
+])
+def test_camera_priorities_reject_invalid(monkeypatch, raw, message):
+    monkeypatch.setenv("INGESTION_CAMERA_PRIORITIES", raw)
+    with pytest.raises(ValueError, match=message):
+        config._env_priorities("INGESTION_CAMERA_PRIORITIES", {"gate", "hall"})
+
+
+def results_client(service):
+    app = Flask(__name__)
+    app.config['INGESTION_SERVICE'] = service
+    app.register_blueprint(ingestion_bp)
+    return app.test_client()
+
+
+def test_results_endpoint_serves_matched_faces(fake_streams):
+    embedding = unit(np.arange(1, 513))
+    service = IngestionService(StubPipeline(embedding), gallery_loader=lambda: [(101, embedding)])
+    service.add_camera("gate", "fake")
+    service.add_camera("hall", "fake")
+    service.cameras["hall"].connected = False
+    run_batches(service, 1)
+    client = results_client(service)
+
+    body = client.get("/ingestion/results").get_json()
+    gate, hall = body["cameras"]
+    assert gate["camera_id"] == "gate" and gate["faces_detected"] == 1
+    assert gate["results"][0] == {"bbox": [10, 10, 50, 50], "roll_no": 101, "similarity": 1.0, "match": True}
+    assert hall == {"camera_id": "hall", "captured_at": None, "age_ms": None, "faces_detected": 0, "results": []}
+
+    assert client.get("/ingestion/results/gate").get_json()["results"][0]["roll_no"] == 101
+    assert client.get("/ingestion/results/lobby").status_code == 404
+
+
+def test_results_endpoint_without_ingestion():
+    assert results_client(None).get("/ingestion/results").status_code == 404
@@ -0,0 +1,106 @@
+"""
+Tests for the load generator's database seeding, against mongomock, and its
+latency accounting.
+"""
+import io
+import json
+import time
+
+import mongomock
+import numpy as np
+import pytest
+
+from config import DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION
+from db.operations import REQUIRED_INDEXES
+import tests.load_generator
+from tests.load_generator import seed_database, cleanup_seed, face_identities, StepStats, VirtualCamera
+
+
+@pytest.fixture
+def client():
+    client = mongomock.MongoClient()
+    for db_name in (DB_NAME, f"{DB_NAME}_loadtest"):
+        for collection_name, indexes in REQUIRED_INDEXES.items():
+            for field, unique in indexes:
+                client[db_name][collection_name].create_index(field, unique=unique)
+    return client
+
+
+def unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_reseeding_upserts_instead_of_failing(client):
+    db = client[f"{DB_NAME}_loadtest"]
+    identities = [unit(np.arange(1, 513))]
+
+    seed_database(db, 5, identities)
+    roll_nos, present = seed_database(db, 5, identities)
+
+    assert db[STUDENTS_COLLECTION].count_documents({}) == 5
+    assert db[EMBEDDINGS_COLLECTION].count_documents({}) == 5
+    assert present == [1]
+    stored = db[EMBEDDINGS_COLLECTION].find_one({"RollNo": 1})
+    assert np.allclose(stored["Embedding"], identities[0])
+    student = db[STUDENTS_COLLECTION].find_one({"RollNo": 1})
+    assert stored["StudentId"] == student["_id"]
+
+
+def test_cleanup_drops_dedicated_database(client):
+    seed_database(client[f"{DB_NAME}_loadtest"], 3)
+    cleanup_seed(client, f"{DB_NAME}_loadtest", [1, 2, 3])
+
+    assert f"{DB_NAME}_loadtest" not in client.list_database_names()
+
+
+def test_cleanup_only_removes_seeded_students_from_shared_database(client):
+    db = client[DB_NAME]
+    db[STUDENTS_COLLECTION].insert_one({"RollNo": 42, "FullName": "Real Student"})
+    roll_nos, _ = seed_database(db, 3, first_roll_no=900000)
+    cleanup_seed(client, DB_NAME, roll_nos)
+
+    assert [doc["RollNo"] for doc in db[STUDENTS_COLLECTION].find()] == [42]
+    assert db[EMBEDDINGS_COLLECTION].count_documents({}) == 0
+
+
+def test_face_identities_groups_the_same_person():
+    person_a, person_b = unit(np.arange(1, 513)), unit(-np.arange(1, 513))
+
+    class Pipeline:
+        def __init__(self):
+            self.frames = iter([[person_a], [person_a, person_b], []])
+
+        def process_all_faces(self, img):
+            return [{"embedding": e, "bbox": [0, 0, 1, 1]} for e in next(self.frames)]
+
+    import cv2
+    frame = cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+    identities = face_identities([frame] * 3, Pipeline(), threshold=0.45)
+
+    assert len(identities) == 2
+    assert np.allclose(identities[0], person_a) and np.allclose(identities[1], person_b)
+
+
+class FakeResponse(io.BytesIO):
+    status = 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_latency_counts_from_the_scheduled_send_time(monkeypatch):
+    monkeypatch.setattr(tests.load_generator.urllib.request, "urlopen",
+                        lambda req, timeout: FakeResponse(json.dumps({"results": []}).encode()))
+    stats = StepStats()
+    camera = VirtualCamera("cam-1", "http://server", [b"frame"], [1, 2], fps=1, pool=None,
+                           stats=stats, timeout=1.0)
+
+    # The frame was due 200 ms ago but only now got a sender thread
+    camera._send(b"frame", time.monotonic() - 0.2)
+
+    assert stats.ok == 1
+    assert stats.latencies[0] >= 200
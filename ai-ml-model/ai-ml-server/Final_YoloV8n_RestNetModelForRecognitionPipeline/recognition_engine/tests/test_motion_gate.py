@@ -0,0 +1,127 @@
+"""
+Tests for the motion gate and the client key it is scoped by.
+"""
+import time
+
+import numpy as np
+from flask import Flask
+
+import utils.request
+from core.motion_gate import MotionGate
+from utils.request import get_client_id
+
+
+FRAME_SHAPE = (240, 320, 3)
+
+
+def frame(value=100):
+    return np.full(FRAME_SHAPE, value, dtype=np.uint8)
+
+
+def with_patch(img, value, size=40):
+    """img with a size x size square set to value (one student walking in)"""
+    img = img.copy()
+    img[:size, :size] = value
+    return img
+
+
+def gated(gate, key, img, result="previous"):
+    gate.update(key, img.shape, gate.thumbnail(img), result)
+
+
+def test_unchanged_frame_reuses_the_result():
+    gate = MotionGate(threshold=3.0, max_age=5.0)
+    gated(gate, "a", frame())
+
+    hit = gate.lookup("a", FRAME_SHAPE, gate.thumbnail(frame(101)))
+    assert hit is not None and hit[0] == "previous"
+
+
+def test_localized_motion_above_threshold_misses():
+    gate = MotionGate(threshold=3.0, max_age=5.0)
+    base = frame()
+    gated(gate, "a", base)
+
+    changed = with_patch(base, 255)
+    # Most of the frame is identical, but one block changed a lot
+    assert gate.change(gate.thumbnail(changed), gate.thumbnail(base)) >= 3.0
+    assert gate.lookup("a", FRAME_SHAPE, gate.thumbnail(changed)) is None
+
+
+def test_change_just_below_threshold_hits_and_above_misses():
+    base = frame()
+    changed = with_patch(base, 140)
+    probe = MotionGate()
+    change = probe.change(probe.thumbnail(changed), probe.thumbnail(base))
+
+    below = MotionGate(threshold=change + 0.5)
+    gated(below, "a", base)
+    assert below.lookup("a", FRAME_SHAPE, below.thumbnail(changed)) is not None
+
+    at = MotionGate(threshold=change)
+    gated(at, "a", base)
+    assert at.lookup("a", FRAME_SHAPE, at.thumbnail(changed)) is None
+
+
+def test_stale_result_expires():
+    gate = MotionGate(max_age=0.05)
+    gated(gate, "a", frame())
+    assert gate.lookup("a", FRAME_SHAPE, gate.thumbnail(frame())) is not None
+
+    time.sleep(0.1)
+    assert gate.lookup("a", FRAME_SHAPE, gate.thumbnail(frame())) is None
+
+
+def test_resolution_change_misses():
+    gate = MotionGate()
+    gated(gate, "a", frame())
+    small = np.full((120, 160, 3), 100, dtype=np.uint8)
+    assert gate.lookup("a", small.shape, gate.thumbnail(small)) is None
+
+
+def test_results_are_isolated_by_client_and_roster():
+    gate = MotionGate()
+    img = frame()
+    # Keys as built by /recognize: (client, endpoint, sorted roster)
+    gated(gate, ("10.0.0.1|tab-1", "recognize", (1, 2)), img, "tab-1 roster 1,2")
+
+    thumb = gate.thumbnail(img)
+    assert gate.lookup(("10.0.0.1|tab-1", "recognize", (1, 2)), FRAME_SHAPE, thumb)[0] == "tab-1 roster 1,2"
+    assert gate.lookup(("10.0.0.1|tab-2", "recognize", (1, 2)), FRAME_SHAPE, thumb) is None
+    assert gate.lookup(("10.0.0.1|tab-1", "recognize", (1, 3)), FRAME_SHAPE, thumb) is None
+    assert gate.lookup(("10.0.0.1|tab-1", "detect"), FRAME_SHAPE, thumb) is None
+
+
+def test_least_recent_clients_are_evicted():
+    gate = MotionGate(max_clients=2)
+    for key in ("a", "b", "c"):
+        gated(gate, key, frame())
+    assert gate.lookup("a", FRAME_SHAPE, gate.thumbnail(frame())) is None
+    assert gate.lookup("c", FRAME_SHAPE, gate.thumbnail(frame())) is not None
+
+
+def client_id_for(remote_addr, headers):
+    app = Flask(__name__)
+    with app.test_request_context("/recognize", method="POST", headers=headers,
+                                  environ_base={"REMOTE_ADDR": remote_addr}):
+        return get_client_id()
+
+
+def test_forwarded_for_is_ignored_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(utils.request, "TRUSTED_PROXIES", {"10.0.0.254"})
+    headers = {"X-Forwarded-For": "203.0.113.9", "X-Client-Id": "tab-1"}
+
+    assert client_id_for("198.51.100.7", headers) == "198.51.100.7|tab-1"
+
+
+def test_forwarded_for_is_used_behind_a_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(utils.request, "TRUSTED_PROXIES", {"10.0.0.254"})
+    headers = {"X-Forwarded-For": "1.2.3.4, 203.0.113.9, 10.0.0.254", "X-Client-Id": "tab-1"}
+
+    # Right-most address not added by a trusted proxy
+    assert client_id_for("10.0.0.254", headers) == "203.0.113.9|tab-1"
+
+
+def test_client_id_is_truncated_and_scoped_to_the_address():
+    assert client_id_for("198.51.100.7", {"X-Client-Id": "x" * 500}) == "198.51.100.7|" + "x" * 64
+    assert client_id_for("198.51.100.7", {}) == "198.51.100.7"
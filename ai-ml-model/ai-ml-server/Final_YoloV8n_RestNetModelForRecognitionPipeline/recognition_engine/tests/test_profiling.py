@@ -0,0 +1,198 @@
+"""
+Tests for on-demand request profiling.
+
+Stub sessions mimic ONNX Runtime's profiling API: events are timed in
+microseconds from the session's profiling start, and end_profiling() writes
+them to a JSON file and stops recording.
+"""
+import json
+import time
+import cProfile
+import threading
+
+import pytest
+
+from core.profiling import RequestProfiler
+
+
+class StubSession:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.start_ns = time.time_ns()  # system clock, as in current onnxruntime builds
+        self.events = []
+        self.recording = True
+
+    def run(self, name):
+        if self.recording:
+            ts = (time.time_ns() - self.start_ns) / 1000
+            self.events.append({"name": name, "ph": "X", "ts": ts, "dur": 1, "pid": 0})
+        time.sleep(0.002)
+
+    def end_profiling(self):
+        self.recording = False
+        path = f"{self.prefix}.json"
+        with open(path, "w") as f:
+            json.dump(self.events, f)
+        return path
+
+    def get_profiling_start_time_ns(self):
+        return self.start_ns
+
+
+class StubModel:
+    def __init__(self, session):
+        self.session = session
+
+
+class StubPipeline:
+    clones = 0
+
+    def __init__(self, prefix=None):
+        self.detector = StubModel(StubSession(f"{prefix}_detector") if prefix else None)
+        self.embedder = StubModel(StubSession(f"{prefix}_embedder") if prefix else None)
+
+    def profiling_clone(self, prefix):
+        StubPipeline.clones += 1
+        return StubPipeline(prefix)
+
+    def warmup(self, batch_sizes=(1,)):
+        for _ in batch_sizes:
+            self.detector.session.run("warmup")
+            self.embedder.session.run("warmup")
+
+    def process(self):
+        self.detector.session.run("request")
+        self.embedder.session.run("request")
+
+
+def settle(profiler):
+    """Wait for a background build of the profiling copy, if one is running"""
+    builder = profiler._builder
+    if builder is not None:
+        builder.join()
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    StubPipeline.clones = 0
+    profiler = RequestProfiler(str(tmp_path), warmup_batch_sizes=(1, 4))
+    yield profiler
+    # Builds started by this test must not count towards the next one's clones
+    settle(profiler)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def prepared(profiler, pipeline):
+    """Build the profiling copy and wait for it, as an admin would before profiling"""
+    profiler.prepare(pipeline)
+    settle(profiler)
+    return pipeline
+
+
+def test_trace_holds_only_the_request_window(profiler):
+    state = profiler.begin(prepared(profiler, StubPipeline()))
+    state["pipeline"].process()
+    profile = load(profiler.end(state, {"method": "POST", "path": "/recognize"}))
+
+    names = [e["name"] for e in profile["traceEvents"] if e["ph"] == "X"]
+    assert names == ["request", "request"]
+    assert all(e["ts"] >= 0 for e in profile["traceEvents"] if e["ph"] == "X")
+    assert {e["pid"] for e in profile["traceEvents"]} == {1, 2}
+    assert profile["onnxTrace"] == "recorded"
+    assert profile["pythonProfile"]
+
+
+def test_flagged_request_never_builds_the_copy_on_the_request_thread(profiler, monkeypatch):
+    pipeline = StubPipeline()
+    build_threads = []
+    clone = StubPipeline.profiling_clone
+    monkeypatch.setattr(StubPipeline, "profiling_clone",
+                        lambda self, prefix: (build_threads.append(threading.current_thread()), clone(self, prefix))[1])
+
+    state = profiler.begin(pipeline)
+    profile = load(profiler.end(state, {"path": "/recognize"}))
+
+    # Profiled with cProfile only; the copy is built in the background
+    assert state["pipeline"] is None
+    assert profile["onnxTrace"] == "preparing" and profile["traceEvents"] == []
+    settle(profiler)
+    assert build_threads and threading.current_thread() not in build_threads
+
+    # The next flagged request gets the warmed copy
+    state = profiler.begin(pipeline)
+    state["pipeline"].process()
+    assert load(profiler.end(state, {"path": "/recognize"}))["onnxTrace"] == "recorded"
+
+
+def test_armed_inference_request_waits_for_the_copy(profiler, monkeypatch):
+    pipeline = StubPipeline()
+    monkeypatch.setattr(profiler, "prepare", lambda p: None)
+    profiler.arm(1, pipeline)
+
+    # Copy not ready: the request runs unprofiled and keeps the armed slot
+    assert profiler.begin(pipeline, consume_armed=True) is None
+    assert profiler.remaining == 1
+
+
+def test_one_request_profiled_at_a_time(profiler):
+    first = profiler.begin(prepared(profiler, StubPipeline()))
+    assert first is not None
+    assert profiler.begin(StubPipeline()) is None
+
+    profiler.end(first, {"path": "/recognize"})
+    second = profiler.begin(StubPipeline())
+    assert second is not None
+    profiler.end(second, {"path": "/recognize"})
+
+
+def test_busy_profiler_does_not_consume_armed_slot(profiler):
+    profiler.arm(1)
+    first = profiler.begin(StubPipeline())
+    assert profiler.begin(StubPipeline(), consume_armed=True) is None
+    assert profiler.remaining == 1
+    profiler.end(first, {"path": "/recognize"})
+
+
+def test_non_inference_route_gets_no_profiling_copy(profiler):
+    state = profiler.begin(StubPipeline(), inference=False)
+    profile = load(profiler.end(state, {"path": "/find-student"}))
+
+    assert state["pipeline"] is None
+    assert StubPipeline.clones == 0
+    assert profile["traceEvents"] == []
+
+
+def test_armed_profiling_prepares_one_copy_per_request(profiler):
+    pipeline = StubPipeline()
+    profiler.arm(2, pipeline)
+    settle(profiler)
+    assert StubPipeline.clones == 1
+
+    for _ in range(2):
+        state = profiler.begin(pipeline, consume_armed=True)
+        state["pipeline"].process()
+        profiler.end(state, {"path": "/recognize"})
+        settle(profiler)
+
+    # One copy per armed request, none left over once disarmed
+    assert StubPipeline.clones == 2
+    assert profiler.remaining == 0
+    assert profiler._profiled is None
+    assert profiler.begin(pipeline, consume_armed=True) is None
+
+
+def test_python_profiler_conflict_is_not_fatal(profiler, monkeypatch):
+    def already_active(self):
+        raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile.Profile, "enable", already_active)
+    state = profiler.begin(prepared(profiler, StubPipeline()))
+    state["pipeline"].process()
+    profile = load(profiler.end(state, {"path": "/recognize"}))
+
+    assert profile["pythonProfile"] == []
+    assert [e["name"] for e in profile["traceEvents"] if e["ph"] == "X"] == ["request", "request"]
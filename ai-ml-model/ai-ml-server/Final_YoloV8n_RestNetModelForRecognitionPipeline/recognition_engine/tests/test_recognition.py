@@ -0,0 +1,232 @@
+"""
+Tests for /recognize-batch: packed-body parsing, cross-image voting and
+the multipart and octet-stream request paths.
+
+The pipeline is a stub that "detects" faces by the grey level of the
+image, and MongoDB is mongomock, so these run without models or a server.
+"""
+import io
+import struct
+
+import cv2
+import mongomock
+import numpy as np
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from config import DB_NAME, STUDENTS_COLLECTION, EMBEDDINGS_COLLECTION
+from core.admission import AdmissionController
+from db import operations
+from routes.recognition import recognition_bp, vote_across_images
+from utils.image import unpack_images
+
+
+def unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+ALICE = unit(np.arange(1, 513))
+BOB = unit(np.arange(512, 0, -1) * np.tile([1, -1], 256))
+STRANGER = unit(np.tile([1, -1, -1, 1], 128))
+
+# Grey level of a test image -> faces the stub pipeline finds in it
+FACES_BY_LEVEL = {
+    10: [ALICE],
+    20: [ALICE, BOB],
+    30: [],
+    40: [STRANGER],
+}
+
+
+class StubPipeline:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def _faces(self, image):
+        embeddings = FACES_BY_LEVEL[int(image[0, 0, 0])]
+        return [{"embedding": e, "bbox": [i * 10, 0, i * 10 + 8, 8]} for i, e in enumerate(embeddings)]
+
+    def process_all_faces(self, image):
+        return self._faces(image)
+
+    def process_batch(self, images):
+        self.batch_sizes.append(len(images))
+        return [self._faces(image) for image in images]
+
+
+class StubStartup:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def wait(self, timeout=None):
+        return self.pipeline
+
+
+def png(level):
+    ok, buf = cv2.imencode(".png", np.full((16, 16, 3), level, dtype=np.uint8))
+    return buf.tobytes()
+
+
+def pack(*images):
+    return b"".join(struct.pack(">I", len(data)) + data for data in images)
+
+
+@pytest.fixture
+def db():
+    client = mongomock.MongoClient()
+    operations.set_mongo_client(client)
+    database = client[DB_NAME]
+    for roll_no, name, embedding in ((1, "Alice", ALICE), (2, "Bob", BOB)):
+        student_id = ObjectId()
+        database[STUDENTS_COLLECTION].insert_one({
+            "_id": student_id, "RollNo": roll_no, "FullName": name, "Faculty": "Science", "Email": f"{name}@x.edu"
+        })
+        database[EMBEDDINGS_COLLECTION].insert_one(
+            operations.embedding_document(str(student_id), roll_no, embedding, 1, 0)
+        )
+    yield database
+    operations.set_mongo_client(None)
+
+
+@pytest.fixture
+def pipeline():
+    return StubPipeline()
+
+
+@pytest.fixture
+def app(db, pipeline):
+    app = Flask(__name__)
+    app.config['SERVICE_STARTUP'] = StubStartup(pipeline)
+    app.config['ADMISSION_CONTROLLER'] = AdmissionController(max_concurrent=4, max_queue=4, queue_deadline=0.05)
+    app.register_blueprint(recognition_bp)
+    return app
+
+
+def post_files(client, levels, **form):
+    data = {**form, "images": [(io.BytesIO(png(level)), f"{i}.png") for i, level in enumerate(levels)]}
+    return client.post("/recognize-batch", data=data, content_type="multipart/form-data")
+
+
+# =========================================================
+# Packed bodies
+# =========================================================
+def test_unpack_images_splits_a_packed_body():
+    assert unpack_images(pack(b"abc", b"de")) == [b"abc", b"de"]
+    assert unpack_images(b"") == []
+
+
+@pytest.mark.parametrize("body, message", [
+    (pack(b"abc") + b"\x00\x00", "Truncated length prefix"),
+    (struct.pack(">I", 10) + b"short", "Invalid image length 10"),
+    (pack(b"abc") + struct.pack(">I", 0), "Invalid image length 0"),
+])
+def test_unpack_images_rejects_malformed_bodies(body, message):
+    with pytest.raises(ValueError, match=message):
+        unpack_images(body)
+
+
+# =========================================================
+# Voting
+# =========================================================
+def result(roll_no, similarity, match=True):
+    student = {"roll_no": roll_no, "name": f"s{roll_no}"} if roll_no is not None else None
+    return {"match": match, "student": student if match else None, "similarity": similarity}
+
+
+def test_vote_counts_each_student_once_per_image_with_the_best_score():
+    images = [
+        {"results": [result(1, 0.6), result(1, 0.9), result(2, 0.7)]},
+        {"results": [result(1, 0.5), result(None, 0.2, match=False)]},
+        {"results": []},
+    ]
+
+    votes = vote_across_images(images, min_votes=2)
+
+    assert [v["student"]["roll_no"] for v in votes] == [1, 2]
+    alice, bob = votes
+    assert alice["images_matched"] == 2
+    assert alice["best_similarity"] == 0.9 and alice["mean_similarity"] == pytest.approx(0.7)
+    assert alice["present"] is True
+    assert bob["images_matched"] == 1 and bob["present"] is False
+
+
+def test_vote_min_votes_bounds():
+    images = [{"results": [result(1, 0.8)]}, {"results": [result(1, 0.8)]}]
+    assert vote_across_images(images, min_votes=1)[0]["present"] is True
+    assert vote_across_images(images, min_votes=2)[0]["present"] is True
+    assert vote_across_images(images, min_votes=3)[0]["present"] is False
+    assert vote_across_images([{"results": []}], min_votes=1) == []
+
+
+# =========================================================
+# Routes
+# =========================================================
+def test_multipart_batch_matches_and_votes(app, pipeline):
+    response = post_files(app.test_client(), [10, 20, 30, 40], vote="1", roll_nos="1,2")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert pipeline.batch_sizes == [4]
+    assert body["images_processed"] == 4 and body["faces_detected"] == 4
+    assert [image["faces_detected"] for image in body["images"]] == [1, 2, 0, 1]
+    assert body["images"][3]["results"][0]["match"] is False
+
+    votes = {v["student"]["roll_no"]: v for v in body["votes"]}
+    # Default min_votes is half the images, rounded up
+    assert votes[1]["images_matched"] == 2 and votes[1]["present"] is True
+    assert votes[2]["images_matched"] == 1 and votes[2]["present"] is False
+    assert votes[1]["student"]["name"] == "Alice"
+
+
+def test_roster_filters_the_gallery(app):
+    body = post_files(app.test_client(), [20], roll_nos="2").get_json()
+    alice, bob = body["images"][0]["results"]
+    assert alice["match"] is False
+    assert bob["match"] is True and bob["student"]["roll_no"] == 2
+
+
+def test_octet_stream_batch_takes_parameters_from_the_query(app, pipeline):
+    response = app.test_client().post(
+        "/recognize-batch?vote=1&min_votes=1&roll_nos=1",
+        data=pack(png(10), png(30)),
+        content_type="application/octet-stream"
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert pipeline.batch_sizes == [2]
+    assert body["votes"][0]["student"]["roll_no"] == 1 and body["votes"][0]["present"] is True
+
+
+@pytest.mark.parametrize("min_votes", ["0", "3", "two"])
+def test_min_votes_outside_the_batch_is_rejected(app, pipeline, min_votes):
+    response = post_files(app.test_client(), [10, 20], vote="1", min_votes=min_votes)
+    assert response.status_code == 400
+    assert pipeline.batch_sizes == []
+
+
+def test_malformed_requests_are_rejected_before_inference(app, pipeline, monkeypatch):
+    client = app.test_client()
+    monkeypatch.setattr("routes.recognition.BATCH_MAX_IMAGES", 2)
+
+    assert post_files(client, [10, 10, 10]).status_code == 413
+    assert client.post("/recognize-batch", data={}, content_type="multipart/form-data").status_code == 400
+    bad = client.post("/recognize-batch", data=pack(png(10), b"not an image"), content_type="application/octet-stream")
+    assert bad.status_code == 400 and "image 2" in bad.get_json()["error"]
+    truncated = client.post("/recognize-batch", data=pack(png(10))[:-1], content_type="application/octet-stream")
+    assert truncated.status_code == 400
+    assert pipeline.batch_sizes == []
+
+
+def test_batch_is_rejected_when_its_images_do_not_fit(app, pipeline):
+    controller = app.config['ADMISSION_CONTROLLER']
+    held = controller.acquire(("other", "recognize"), controller.weight_for(3))
+
+    response = post_files(app.test_client(), [10, 10])
+
+    assert response.status_code == 429
+    assert response.get_json()["reason"] == "deadline"
+    assert pipeline.batch_sizes == []
+    controller.release(held)
@@ -0,0 +1,216 @@
+"""
+Tests for model startup: the optimized-graph cache, warm-up batch fallback
+and the /ready state transitions of ServiceStartup.
+
+A tiny generated ONNX model stands in for the detector and embedder.
+"""
+import os
+import threading
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+import pytest
+from onnx import helper, TensorProto
+
+import core.startup
+import models.session
+from core.startup import ServiceStartup
+from models.embedder import FaceEmbedder
+from models.session import create_session, run_batch
+
+PROVIDERS = ["CPUExecutionProvider"]
+
+
+def write_model(path, batch="N"):
+    """y = x * 2 + 1 over a (batch, 4) input"""
+    graph = helper.make_graph(
+        [
+            helper.make_node("Mul", ["x", "two"], ["m"]),
+            helper.make_node("Add", ["m", "one"], ["y"]),
+        ],
+        "tiny",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [batch, 4])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [batch, 4])],
+        initializer=[
+            helper.make_tensor("two", TensorProto.FLOAT, [1], [2.0]),
+            helper.make_tensor("one", TensorProto.FLOAT, [1], [1.0]),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return path
+
+
+@pytest.fixture
+def session_count(monkeypatch):
+    """Counts InferenceSession constructions, by source path"""
+    built = []
+    real = ort.InferenceSession
+
+    def counting(path, *args, **kwargs):
+        built.append(path)
+        return real(path, *args, **kwargs)
+
+    monkeypatch.setattr(models.session.ort, "InferenceSession", counting)
+    return built
+
+
+def run(session, x):
+    return session.run(None, {"x": np.asarray(x, dtype=np.float32)})[0]
+
+
+def test_cache_miss_builds_one_session_and_writes_the_cache(tmp_path, session_count):
+    model = write_model(str(tmp_path / "tiny.onnx"))
+    cache_dir = str(tmp_path / "cache")
+
+    session = create_session(model, PROVIDERS, cache_dir=cache_dir)
+
+    assert session_count == [model]
+    assert len(os.listdir(cache_dir)) == 1
+    np.testing.assert_allclose(run(session, np.ones((2, 4))), np.full((2, 4), 3.0))
+
+
+def test_cache_hit_loads_the_cached_graph(tmp_path, session_count):
+    model = write_model(str(tmp_path / "tiny.onnx"))
+    cache_dir = str(tmp_path / "cache")
+    create_session(model, PROVIDERS, cache_dir=cache_dir)
+    session_count.clear()
+
+    session = create_session(model, PROVIDERS, cache_dir=cache_dir)
+
+    cached = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+    assert session_count == [cached]
+    np.testing.assert_allclose(run(session, np.zeros((1, 4))), np.ones((1, 4)))
+
+
+def test_caller_options_are_restored_after_writing_the_cache(tmp_path):
+    model = write_model(str(tmp_path / "tiny.onnx"))
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    create_session(model, PROVIDERS, options=options, cache_dir=str(tmp_path / "cache"))
+
+    assert options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    assert options.optimized_model_filepath == ""
+
+
+def test_corrupt_cache_falls_back_to_the_source(tmp_path, session_count):
+    model = write_model(str(tmp_path / "tiny.onnx"))
+    cache_dir = str(tmp_path / "cache")
+    create_session(model, PROVIDERS, cache_dir=cache_dir)
+    cached = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+    with open(cached, "wb") as f:
+        f.write(b"not a model")
+    session_count.clear()
+
+    session = create_session(model, PROVIDERS, cache_dir=cache_dir)
+
+    assert session_count == [cached, model]
+    assert not os.path.exists(cached)
+    np.testing.assert_allclose(run(session, np.zeros((1, 4))), np.ones((1, 4)))
+
+
+def test_run_batch_splits_rows_for_a_fixed_batch_model(tmp_path):
+    session = create_session(write_model(str(tmp_path / "fixed.onnx"), batch=1), PROVIDERS)
+    blob = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    with pytest.raises(Exception):
+        run_batch(session, "x", blob)
+    np.testing.assert_allclose(run_batch(session, "x", blob, batched=False)[0], blob * 2 + 1)
+
+
+class FixedBatchSession:
+    """Embedder session exported with batch dimension 1"""
+    def __init__(self):
+        self.batch_sizes = []
+
+    def run(self, outputs, feeds):
+        blob = next(iter(feeds.values()))
+        self.batch_sizes.append(blob.shape[0])
+        if blob.shape[0] != 1:
+            raise ValueError("Got invalid dimensions for input: index 0 Got: %d Expected: 1" % blob.shape[0])
+        return [np.ones((1, 512), dtype=np.float32)]
+
+
+def make_embedder(session):
+    embedder = FaceEmbedder.__new__(FaceEmbedder)
+    embedder.session = session
+    embedder.input_name = "input"
+    embedder.input_shape = (112, 112)
+    embedder.batched = True
+    return embedder
+
+
+def test_warmup_falls_back_to_single_crops_when_batches_are_rejected():
+    session = FixedBatchSession()
+    embedder = make_embedder(session)
+
+    embedder.warmup((1, 4, 8))
+    assert not embedder.batched
+
+    session.batch_sizes.clear()
+    crops = [np.zeros((112, 112, 3), dtype=np.uint8)] * 3
+    assert embedder.get_embeddings(crops).shape == (3, 512)
+    assert session.batch_sizes == [1, 1, 1]
+
+
+def test_warmup_failing_at_batch_one_is_an_error():
+    class Broken:
+        def run(self, outputs, feeds):
+            raise RuntimeError("bad model")
+
+    with pytest.raises(RuntimeError):
+        make_embedder(Broken()).warmup((1, 4))
+
+
+class StubPipeline:
+    """Loads once `release` is set; fails when `error` is set"""
+    release = threading.Event()
+    error = None
+
+    def __init__(self, *args, **kwargs):
+        StubPipeline.release.wait(5.0)
+        if StubPipeline.error:
+            raise RuntimeError(StubPipeline.error)
+        self.detector = make_embedder(None)
+        self.embedder = make_embedder(None)
+
+    def warmup(self, batch_sizes):
+        self.embedder.batched = False
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    monkeypatch.setattr(core.startup, "RecognitionPipeline", StubPipeline)
+    StubPipeline.release = threading.Event()
+    StubPipeline.error = None
+    yield StubPipeline
+    StubPipeline.release.set()
+
+
+def test_startup_reports_loading_then_ready(stub_pipeline):
+    startup = ServiceStartup("det.onnx", "emb.onnx").start()
+
+    status = startup.status()
+    assert status["loading"] and not status["ready"]
+    assert startup.wait(0.05) is None
+
+    stub_pipeline.release.set()
+    assert startup.wait(5.0) is not None
+    status = startup.status()
+    assert status["ready"] and not status["loading"] and status["error"] is None
+    assert status["batched"] == {"detector": True, "embedder": False}
+    assert {"models_ms", "warmup_ms", "total_ms"} <= set(status["timings"])
+
+
+def test_startup_failure_is_reported_not_ready(stub_pipeline):
+    stub_pipeline.error = "model file missing"
+    stub_pipeline.release.set()
+    startup = ServiceStartup("det.onnx", "emb.onnx").start()
+
+    assert startup.wait(5.0) is None
+    status = startup.status()
+    assert not status["ready"] and not status["loading"]
+    assert status["error"] == "model file missing"
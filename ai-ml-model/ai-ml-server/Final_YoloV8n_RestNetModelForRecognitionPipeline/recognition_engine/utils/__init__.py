@@ -1,8 +1,21 @@
 """
 Utilities package.
-Contains image processing utilities.
+Contains image processing and request helpers.
 """
 
-from .image import decode_image, save_image
+from .image import decode_image, decode_image_bytes, unpack_images, save_image
+from .image_store import ImageStore, get_image_store
+from .request import get_client_id, get_pipeline, inference_slot, rejection_response
 
-__all__ = ['decode_image', 'save_image']
+__all__ = [
+    'decode_image',
+    'decode_image_bytes',
+    'unpack_images',
+    'save_image',
+    'ImageStore',
+    'get_image_store',
+    'get_client_id',
+    'get_pipeline',
+    'inference_slot',
+    'rejection_response'
+]
@@ -0,0 +1,83 @@
+"""
+Request helpers for the ASGI app (asgi_app.py).
+
+Same behaviour as utils/request.py, but nothing here blocks the event loop:
+waiting for an admission slot is awaited on the loop, waiting for the models
+happens on a helper thread, and pipeline calls run on the app's bounded
+INFERENCE_EXECUTOR.
+
+Not re-exported from utils/__init__.py so the Flask app does not need Quart.
+"""
+
+import asyncio
+from quart import request, current_app, jsonify
+from core.admission import AdmissionController, Ticket
+from utils.request import client_address, client_key
+
+
+def get_client_id(form=None):
+    """
+    Identify the calling client for per-client state.
+
+    Same key as utils.request.get_client_id; pass the awaited form so the
+    client_id form field is honoured as well.
+    """
+    client_id = request.headers.get("X-Client-Id") or (form.get("client_id") if form is not None else None)
+    address = client_address(request.remote_addr, request.headers.get("X-Forwarded-For"))
+    return client_key(address, client_id)
+
+
+async def get_pipeline():
+    """
+    Return the recognition pipeline, waiting for startup to finish if needed.
+
+    Returns None when the models are still loading after STARTUP_WAIT_TIMEOUT
+    or failed to load; callers should answer with 503.
+    """
+    startup = current_app.config['SERVICE_STARTUP']
+    if startup.is_ready:
+        return startup.pipeline
+    return await asyncio.to_thread(startup.wait, current_app.config.get('STARTUP_WAIT_TIMEOUT'))
+
+
+async def run_pipeline(fn, *args):
+    """Run a RecognitionPipeline call on the bounded inference executor, without admission control"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(current_app.config['INFERENCE_EXECUTOR'], fn, *args)
+
+
+async def run_inference(client_key, fn, *args, images=1):
+    """
+    Run fn(*args) on the inference executor under admission control.
+
+    images is how many images fn runs (see AdmissionController.weight_for).
+
+    Returns (ticket, result); when ticket.admitted is False, fn did not run
+    and the caller should return rejection_response(ticket). The slot is
+    released when fn finishes, even if the client disconnects first.
+    """
+    controller = current_app.config.get('ADMISSION_CONTROLLER')
+    if controller is None:
+        return Ticket(None, True), await run_pipeline(fn, *args)
+
+    # Waits on the event loop itself; no helper thread is held while queued
+    ticket = await controller.acquire_async(client_key, controller.weight_for(images))
+    if not ticket.admitted:
+        return ticket, None
+
+    loop = asyncio.get_running_loop()
+    job = loop.run_in_executor(current_app.config['INFERENCE_EXECUTOR'], fn, *args)
+    job.add_done_callback(lambda _: controller.release(ticket))
+    return ticket, await asyncio.shield(job)
+
+
+def rejection_response(ticket):
+    """429 response with a retry-after hint for a rejected ticket"""
+    response = jsonify({
+        "error": "server busy, frame dropped",
+        "reason": ticket.reason,
+        "retry_after_ms": int(ticket.retry_after * 1000)
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = AdmissionController.retry_after_header(ticket)
+    return response
@@ -1,15 +1,19 @@
+import os
+import struct
 import cv2
 import numpy as np
-import os
-from datetime import datetime
-from config import IMAGES_DIR
+from utils.image_store import get_image_store
 
 def decode_image(file):
     """Decode image from file upload"""
     file_bytes = file.read()
     file.seek(0)
     
-    nparr = np.frombuffer(file_bytes, np.uint8)
+    return decode_image_bytes(file_bytes)
+
+def decode_image_bytes(data):
+    """Decode image from raw encoded bytes (JPEG/PNG/...)"""
+    nparr = np.frombuffer(data, np.uint8)
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
     
     if img is None:
@@ -17,13 +21,51 @@ def decode_image(file):
     
     return img
 
-def save_image(img, roll_no, operation, index=None):
-    """Save image to disk with timestamped filename"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    if index is not None:
-        filename = f"{roll_no}_{operation}_{index}_{timestamp}.jpg"
-    else:
-        filename = f"{roll_no}_{operation}_{timestamp}.jpg"
-    path = os.path.join(IMAGES_DIR, filename)
-    cv2.imwrite(path, img)
+def unpack_images(body):
+    """
+    Split a binary-packed request body into encoded images.
+
+    Format: repeated [4-byte big-endian length][encoded image bytes]
+    """
+    images = []
+    offset = 0
+    while offset < len(body):
+        if offset + 4 > len(body):
+            raise ValueError("Truncated length prefix in packed body")
+        (length,) = struct.unpack_from(">I", body, offset)
+        offset += 4
+        if length == 0 or offset + length > len(body):
+            raise ValueError(f"Invalid image length {length} in packed body")
+        images.append(body[offset:offset + length])
+        offset += length
+    return images
+
+def save_image(img, roll_no=None, operation=None, index=None):
+    """
+    Queue image for writing to the sharded image store and return its path.
+
+    File names are content hashes, so the roll number / operation the image
+    belongs to is logged here instead of being encoded in the name.
+    """
+    path = get_image_store().save(img)
+    print(f"[IMAGE] {operation or 'image'} roll_no={roll_no} index={index} -> {os.path.basename(path)}")
     return path
+
+def confirm_saved_images(saved_images, timeout=5.0):
+    """
+    Wait for the queued writes of saved_images entries ({"path": ...}).
+
+    Entries whose write failed get path None and an error, so no caller
+    reports a path that is not on disk.
+
+    Returns:
+        int: Number of entries whose image could not be stored
+    """
+    errors = get_image_store().wait([entry["path"] for entry in saved_images], timeout)
+    for entry in saved_images:
+        error = errors.get(entry["path"])
+        if error is not None:
+            print(f"[IMAGE] Enrollment image {entry.get('index')} not stored: {str(error)}")
+            entry["path"] = None
+            entry["error"] = f"image not stored: {str(error)}"
+    return len(errors)
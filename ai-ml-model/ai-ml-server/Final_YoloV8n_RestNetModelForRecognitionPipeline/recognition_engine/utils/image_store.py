@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+
+import cv2
+
+from config import (
+    IMAGES_DIR,
+    IMAGE_STORE_FORMAT,
+    IMAGE_STORE_QUALITY,
+    IMAGE_STORE_WORKERS,
+    IMAGE_STORE_QUEUE_SIZE,
+    IMAGE_STORE_QUEUE_TIMEOUT,
+    IMAGE_RETENTION_DAYS
+)
+
+
+class ImageStore:
+    """
+    Asynchronous, content-addressed image store.
+
+    Images are hashed on the caller's thread and the final path is returned
+    immediately; encoding and disk writes happen on a small background pool.
+    Files land in a two-level sharded tree (root/ab/cd/<sha1>.<ext>) so
+    identical crops are stored once and no directory grows without bound.
+    """
+
+    ENCODE_PARAMS = {
+        "jpg": cv2.IMWRITE_JPEG_QUALITY,
+        "webp": cv2.IMWRITE_WEBP_QUALITY,
+    }
+
+    # Failed background writes remembered for wait()
+    MAX_FAILED = 256
+
+    def __init__(self, root_dir, image_format="jpg", quality=85,
+                 max_workers=2, max_queue=64, retention_days=0, queue_timeout=1.0):
+        if image_format not in self.ENCODE_PARAMS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+
+        self.root_dir = root_dir
+        self.image_format = image_format
+        self.quality = quality
+        self.retention_days = retention_days
+        self.queue_timeout = queue_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-store")
+        # Bounds the number of queued + running writes
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._pending = {}  # path -> Future of its queued write
+        self._failed = OrderedDict()  # path -> error of its last failed write
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self.sync_writes = 0
+        self.failed_writes = 0
+
+    def path_for(self, digest):
+        """Sharded path for a content hash"""
+        return os.path.join(self.root_dir, digest[:2], digest[2:4], f"{digest}.{self.image_format}")
+
+    def save(self, img):
+        """
+        Queue an image for writing and return its final path.
+
+        When the queue stays full for queue_timeout seconds the image is
+        written on the caller's thread instead (counted in sync_writes), so
+        a burst slows the caller down rather than losing the image. Only that
+        synchronous write can raise, and only on a real encode/I/O error;
+        background write failures are reported through wait().
+        """
+        digest = hashlib.sha1(img.tobytes()).hexdigest()
+        path = self.path_for(digest)
+
+        with self._lock:
+            if path in self._pending:
+                return path
+            if os.path.exists(path):
+                # Re-saved crop: refresh its age so the retention sweep keeps it
+                try:
+                    os.utime(path)
+                    self._failed.pop(path, None)
+                    return path
+                except FileNotFoundError:
+                    pass  # removed by the sweep just now; write it again
+            future = Future()
+            self._pending[path] = future
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.sync_writes += 1
+            try:
+                self._write_file(img, path)
+            except Exception as e:
+                self._finish(path, future, e)
+                raise
+            self._finish(path, future, None)
+            return path
+
+        # Copy so the caller can reuse its buffer while the write is queued
+        job = self._executor.submit(self._write, img.copy(), path, future)
+        job.add_done_callback(lambda _: self._slots.release())
+
+        self._maybe_cleanup()
+        return path
+
+    def _write_file(self, img, path):
+        ok, buf = cv2.imencode(
+            f".{self.image_format}", img,
+            [self.ENCODE_PARAMS[self.image_format], self.quality]
+        )
+        if not ok:
+            raise ValueError("Failed to encode image")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial image
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buf.tobytes())
+        os.replace(tmp_path, path)
+
+    def _write(self, img, path, future):
+        try:
+            self._write_file(img, path)
+        except Exception as e:
+            print(f"[IMAGE] Error writing image {path}: {str(e)}")
+            self._finish(path, future, e)
+        else:
+            self._finish(path, future, None)
+
+    def _finish(self, path, future, error):
+        with self._lock:
+            self._pending.pop(path, None)
+            if error is None:
+                self._failed.pop(path, None)
+            else:
+                self.failed_writes += 1
+                self._failed[path] = error
+                while len(self._failed) > self.MAX_FAILED:
+                    self._failed.popitem(last=False)
+        if error is None:
+            future.set_result(path)
+        else:
+            future.set_exception(error)
+
+    def wait(self, paths, timeout=None):
+        """
+        Wait for the writes behind paths returned by save().
+
+        Returns:
+            dict: path -> error for every path whose write failed or did not
+            finish within timeout; empty when all of them are on disk
+        """
+        with self._lock:
+            futures = {path: self._pending.get(path) for path in paths}
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        errors = {}
+        for path, future in futures.items():
+            if future is not None:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    future.result(remaining)
+                except FutureTimeoutError:
+                    errors[path] = TimeoutError(f"write of {path} still pending")
+                except Exception as e:
+                    errors[path] = e
+                continue
+            with self._lock:
+                error = self._failed.get(path)
+            if error is not None:
+                errors[path] = error
+        return errors
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_writes": len(self._pending),
+                "sync_writes": self.sync_writes,
+                "failed_writes": self.failed_writes
+            }
+
+    def _maybe_cleanup(self):
+        """Start a retention sweep on its own thread at most once an hour"""
+        if self.retention_days <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < 3600:
+                return
+            self._last_cleanup = now
+        # Not on the write pool, so queued writes never wait behind a directory scan
+        threading.Thread(target=self.cleanup, name="image-store-cleanup", daemon=True).start()
+
+    def _stored_files(self):
+        """Files in the sharded tree (root/ab/cd/<sha1>.<ext>); anything else under root is left alone"""
+        for shard in _list_dir(self.root_dir):
+            shard_dir = os.path.join(self.root_dir, shard)
+            if not _SHARD_RE.match(shard) or not os.path.isdir(shard_dir):
+                continue
+            for sub in _list_dir(shard_dir):
+                sub_dir = os.path.join(shard_dir, sub)
+                if not _SHARD_RE.match(sub) or not os.path.isdir(sub_dir):
+                    continue
+                for name in _list_dir(sub_dir):
+                    match = _STORED_RE.match(name)
+                    if match and match.group(1).startswith(shard + sub):
+                        yield os.path.join(sub_dir, name)
+
+    def cleanup(self, retention_days=None):
+        """
+        Delete stored images older than the retention period.
+
+        Only the sharded tree is swept; other files under root_dir (such as
+        images saved by older versions) are never removed.
+
+        Returns:
+            int: Number of files removed
+        """
+        retention_days = self.retention_days if retention_days is None else retention_days
+        if retention_days <= 0:
+            return 0
+
+        cutoff = time.time() - retention_days * 86400
+        removed = 0
+        for path in self._stored_files():
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+
+        if removed:
+            print(f"Image store cleanup removed {removed} file(s) older than {retention_days} day(s)")
+        return removed
+
+    def close(self, wait=True):
+        """Flush pending writes and stop the worker pool"""
+        self._executor.shutdown(wait=wait)
+
+
+_SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+_STORED_RE = re.compile(r"^([0-9a-f]{40})\.(?:" + "|".join(ImageStore.ENCODE_PARAMS) + r")$")
+
+
+def _list_dir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """Return the process-wide image store, creating it on first use"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = ImageStore(
+                    IMAGES_DIR,
+                    image_format=IMAGE_STORE_FORMAT,
+                    quality=IMAGE_STORE_QUALITY,
+                    max_workers=IMAGE_STORE_WORKERS,
+                    max_queue=IMAGE_STORE_QUEUE_SIZE,
+                    retention_days=IMAGE_RETENTION_DAYS,
+                    queue_timeout=IMAGE_STORE_QUEUE_TIMEOUT
+                )
+    return _default_store
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from flask import request, current_app, g, jsonify
+from core.admission import AdmissionController, Ticket
+from config import TRUSTED_PROXIES
+
+
+# Longest X-Client-Id accepted; ids only need to be unique per tab
+MAX_CLIENT_ID_LENGTH = 64
+
+
+def client_address(remote_addr, forwarded_for):
+    """
+    Address of the caller.
+
+    X-Forwarded-For is only honoured when the request comes from one of
+    TRUSTED_PROXIES; the client is then the right-most address not added by
+    a trusted proxy. Otherwise the header is ignored, so it cannot be forged.
+    """
+    addr = remote_addr or "unknown"
+    if addr not in TRUSTED_PROXIES or not forwarded_for:
+        return addr
+    for hop in reversed([h.strip() for h in forwarded_for.split(",") if h.strip()]):
+        if hop not in TRUSTED_PROXIES:
+            return hop
+    return addr
+
+
+def client_key(address, client_id):
+    """
+    Combine the caller's address with its self-chosen client id.
+
+    The id separates tabs and classrooms behind one NAT; scoping it to the
+    address keeps a client from reading or blocking another address's state
+    by sending its id.
+    """
+    if not client_id:
+        return address
+    return f"{address}|{client_id[:MAX_CLIENT_ID_LENGTH]}"
+
+
+def get_client_id():
+    """
+    Identify the calling client for per-client state.
+
+    The frontend sends a per-tab X-Client-Id header (or client_id form
+    field); it is combined with the caller's address, see client_key().
+    """
+    client_id = request.headers.get("X-Client-Id") or request.form.get("client_id")
+    address = client_address(request.remote_addr, request.headers.get("X-Forwarded-For"))
+    return client_key(address, client_id)
+
+
+def get_pipeline():
+    """
+    Return the recognition pipeline, waiting for startup to finish if needed.
+
+    Returns None when the models are still loading after STARTUP_WAIT_TIMEOUT
+    or failed to load; callers should answer with 503. Profiled inference
+    requests get the profiler's copy of the pipeline.
+    """
+    profiled = g.get('profiling_pipeline')
+    if profiled is not None:
+        return profiled
+    startup = current_app.config['SERVICE_STARTUP']
+    return startup.wait(current_app.config.get('STARTUP_WAIT_TIMEOUT'))
+
+
+@contextmanager
+def inference_slot(endpoint, images=1):
+    """
+    Hold inference slots from the admission controller for the block.
+
+    images is how many images the block runs (see AdmissionController.weight_for).
+    Yields a Ticket; when ticket.admitted is False the caller should return
+    rejection_response(ticket). Without a controller every request is admitted.
+    """
+    controller = current_app.config.get('ADMISSION_CONTROLLER')
+    if controller is None:
+        yield Ticket(None, True)
+        return
+
+    ticket = controller.acquire((get_client_id(), endpoint), controller.weight_for(images))
+    try:
+        yield ticket
+    finally:
+        controller.release(ticket)
+
+
+def rejection_response(ticket):
+    """429 response with a retry-after hint for a rejected ticket"""
+    response = jsonify({
+        "error": "server busy, frame dropped",
+        "reason": ticket.reason,
+        "retry_after_ms": int(ticket.retry_after * 1000)
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = AdmissionController.retry_after_header(ticket)
+    return response